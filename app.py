@@ -1,9 +1,14 @@
 import streamlit as st
 import pandas as pd
-import joblib
 import os
 from datetime import datetime
-import pandas.errors
+
+from prediction_store import get_prediction_store
+from dashboard_view import get_dashboard_view
+from cohort_quiz import generate_cohort_quizzes
+from model_registry import get_model_manager
+from prediction_cache import get_prediction_cache
+from metrics import get_metrics, summary_rows
 
 
 api_key = st.secrets["GEMINI_API_KEY"]
@@ -11,43 +16,36 @@ api_key = st.secrets["GEMINI_API_KEY"]
 # Import helper functions
 try:
     from helper_functions import (
-        categorize_student_performance,
-        recommend_learning_material,
-        generate_feedback_message,
-        generate_learner_profile,
-        generate_combined_recommendation,
         map_difficulty,
-        generate_quiz,
-        test_api_connection
+        generate_quiz_stream,
+        cached_api_status
     )
     
-    # Test API connection at startup
-    api_working, api_message = test_api_connection()
-    api_status = "✅" if api_working else "❌"
-    
 except ImportError as e:
     st.error(f"❌ Error importing helper functions: {e}")
     st.stop()
 
-# Load trained model
-try:
-    model = joblib.load('student_model.pkl')
-    if hasattr(model, 'feature_names_in_'):
-        model_features = list(model.feature_names_in_)
-    else:
-        model_features = None
-except FileNotFoundError:
+# One manager per process; every session and rerun shares it, and it swaps in a newly
+# activated registry version without a restart (see model_registry.py). The model itself
+# is loaded by the first prediction, on the script thread: unpickling it imports xgboost and
+# sklearn, and doing that on a background thread while this script imports the chart
+# libraries can deadlock on the import locks.
+@st.cache_resource(show_spinner=False)
+def load_model_manager():
+    return get_model_manager()
+
+# History queries are cached until the prediction log changes
+@st.cache_data(show_spinner=False, max_entries=256)
+def load_student_history(student_id, log_version):
+    return get_prediction_store().student_history(student_id)
+
+model_manager = load_model_manager()
+if model_manager.registry.pointer()["active"] is None and not os.path.exists(model_manager.fallback_path):
     st.error("❌ Model file 'student_model.pkl' not found. Please ensure the model file is in the correct directory.")
     st.stop()
 
 # Define input feature names (must match training)
-features = [
-    'hint_count', 'bottom_hint', 'attempt_count', 'ms_first_response', 'duration',
-    'Average_confidence(FRUSTRATED)', 'Average_confidence(CONFUSED)',
-    'Average_confidence(CONCENTRATING)', 'Average_confidence(BORED)', 'action_count',
-    'hint_dependency', 'response_speed', 'confidence_balance', 'engagement_ratio',
-    'efficiency_indicator'
-]
+from student_rules import features, grade_options, subject_options
 
 # Initialize session state for quiz
 if 'quiz_generated' not in st.session_state:
@@ -59,12 +57,17 @@ if 'quiz_generated' not in st.session_state:
 # 🌐 Streamlit App Interface
 st.title("🎓 AI Tutor: Student Performance Predictor")
 
-# API Status in header
-st.markdown(f"**API Status:** {api_status} {api_message}")
+# API Status in header; the API is only tested when a quiz first has to be generated
+api_state = cached_api_status()
+if api_state is None:
+    st.markdown("**API Status:** ⏳ Checked when the first quiz has to be generated")
+else:
+    st.markdown(f"**API Status:** {'✅' if api_state[0] else '❌'} {api_state[1]}")
+st.caption(f"Model version: {model_manager.version or 'loaded with the first prediction'}")
 
 student_id = st.text_input("Enter Student ID", "")
-grade = st.selectbox("Select Grade", ["Grade 1", "Grade 2", "Grade 3", "Grade 4", "Grade 5", "Grade 6", "Grade 7", "Grade 8", "Grade 9", "Grade 10", "Grade 11", "Grade 12"])
-subject = st.selectbox("Select Subject", ["Math", "Science", "English", "History"])
+grade = st.selectbox("Select Grade", grade_options)
+subject = st.selectbox("Select Subject", subject_options)
 
 st.markdown("### Enter student behavior data:")
 
@@ -93,23 +96,14 @@ with col2:
     user_input['efficiency_indicator'] = st.slider("Efficiency Indicator", 0.0, 1.0, 0.5)
 
 # Function to prepare data for model prediction
-def prepare_model_input(user_data):
-    expected_features = model_features if model_features else features
-    input_data = []
-    missing_features = []
-    
-    for feature in expected_features:
-        if feature in user_data:
-            input_data.append(user_data[feature])
-        else:
-            missing_features.append(feature)
-            input_data.append(0.0)
+def prepare_model_input(user_data, loaded_model):
+    # Predict straight from the booster with a float32 row, without building a DataFrame
+    input_row, missing_features = loaded_model.predictor.prepare_row(user_data)
     
     if missing_features:
         st.warning(f"⚠️ Missing features filled with default values: {missing_features}")
     
-    input_df = pd.DataFrame([input_data], columns=expected_features)
-    return input_df
+    return input_row
 
 # 🧠 Predict button logic
 if st.button("🔮 Predict Performance"):
@@ -118,15 +112,19 @@ if st.button("🔮 Predict Performance"):
     else:
         with st.spinner("Analyzing student performance..."):
             try:
-                input_df = prepare_model_input(user_input)
-                predicted_score = model.predict(input_df)[0]
-                learner_profile = generate_learner_profile(user_input)
-
-                # Categorize student
-                cat_num, cat_name, desc, emoji = categorize_student_performance(predicted_score)
-                combined_recommendation = generate_combined_recommendation(cat_name, learner_profile)
-                rec = recommend_learning_material(cat_num)
-                fb = generate_feedback_message(cat_num)
+                # This run predicts and logs with one version, even if another is activated meanwhile.
+                # The first prediction of the process loads the model here
+                loaded_model = model_manager.current()
+                with get_metrics().span("predict"):
+                    input_row = prepare_model_input(user_input, loaded_model)
+                    # Score and rule results for a feature vector seen before are memoized
+                    # per model version; a shadow model, if set, scores misses in the background
+                    result, cache_hit = get_prediction_cache().predict(user_input, input_row, model_manager, loaded_model)
+                predicted_score = result['predicted_score']
+                learner_profile = result['learner_profile']
+                cat_num, cat_name, desc, emoji = result['cat_num'], result['cat_name'], result['description'], result['emoji']
+                combined_recommendation = result['combined_recommendation']
+                fb = result['feedback']
 
                 # Store prediction data for quiz generation
                 st.session_state.prediction_data = {
@@ -156,49 +154,26 @@ if st.button("🔮 Predict Performance"):
                     st.write(f"**Feedback:** {fb}")
                     st.write(f"**Combined Recommendation:** {combined_recommendation}")
 
-                # Create CSV with headers if it doesn't exist or is empty
-                log_path = "prediction_log.csv"
-                required_columns = ["student_id", "timestamp", "grade", "subject", *features, "predicted_score", "category", "learner_profile"]
-
-                # Better CSV file handling
-                if not os.path.exists(log_path) or os.path.getsize(log_path) == 0:
-                    # Create new file with proper headers
-                    pd.DataFrame(columns=required_columns).to_csv(log_path, index=False)
-                    file_exists = False
-                else:
-                    file_exists = True
-
                 # Prepare log row with all required columns
-                log_row = {}
-                for col in required_columns:
-                    if col == "student_id":
-                        log_row[col] = student_id
-                    elif col == "timestamp":
-                        log_row[col] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    elif col == "grade":
-                        log_row[col] = grade
-                    elif col == "subject":
-                        log_row[col] = subject
-                    elif col == "predicted_score":
-                        log_row[col] = predicted_score
-                    elif col == "category":
-                        log_row[col] = cat_name
-                    elif col == "learner_profile":
-                        log_row[col] = learner_profile
-                    elif col in user_input:
-                        log_row[col] = user_input[col]
-                    else:
-                        log_row[col] = 0.0  # Default value for missing features
-
-                # Append to CSV file with consistent structure
-                log_df = pd.DataFrame([log_row])
-                
+                log_row = {
+                    "student_id": student_id,
+                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    "grade": grade,
+                    "subject": subject,
+                    **user_input,
+                    "predicted_score": predicted_score,
+                    "category": cat_name,
+                    "learner_profile": learner_profile,
+                    "model_version": loaded_model.version
+                }
+
                 try:
-                    log_df.to_csv(log_path, mode='a', header=not file_exists, index=False)
+                    # Wait for the write, so success is only reported once the row is on disk
+                    get_prediction_store().append(log_row, wait=True)
                     st.success("✅ Prediction saved to history!")
-                except Exception as csv_error:
-                    st.warning(f"⚠️ Could not save to history: {csv_error}")
-                    # Continue without saving to CSV
+                except Exception as store_error:
+                    st.warning(f"⚠️ Could not save to history: {store_error}")
+                    # Continue without saving to history
 
             except Exception as e:
                 st.error(f"❌ Error during prediction: {e}")
@@ -212,30 +187,28 @@ if st.session_state.prediction_made:
     quiz_col1, quiz_col2 = st.columns([1, 3])
     
     with quiz_col1:
-        if st.button("🎯 Generate Quiz"):
-            if not api_working:
-                st.error(f"❌ Cannot generate quiz: {api_message}")
-            else:
-                with st.spinner("Generating personalized quiz..."):
-                    try:
-                        pred_data = st.session_state.prediction_data
-                        difficulty = map_difficulty(pred_data['predicted_score'], pred_data['cat_name'])
-                        
-                        quiz_text = generate_quiz(grade, subject, difficulty, num_q=5)
-                        st.session_state.quiz_text = quiz_text
-                        st.session_state.quiz_generated = True
-                        
-                    except Exception as e:
-                        st.error(f"❌ Error generating quiz: {e}")
-                        st.session_state.quiz_generated = False
+        generate_clicked = st.button("🎯 Generate Quiz")
     
     with quiz_col2:
         pred_data = st.session_state.prediction_data
         difficulty = map_difficulty(pred_data['predicted_score'], pred_data['cat_name'])
         st.info(f"📊 Quiz will be generated at **{difficulty}** difficulty level based on your performance prediction.")
 
+    if generate_clicked:
+        # Stream the quiz into the page as the model writes it. Cached and banked quizzes are
+        # served without the API; it is only tested when the quiz has to be generated, and
+        # any error comes back as a "❌" line of the stream
+        st.subheader(f"📋 {subject} Quiz for {grade} - {difficulty.title()} Level")
+        try:
+            quiz_text = st.write_stream(generate_quiz_stream(grade, subject, difficulty, num_q=5))
+            st.session_state.quiz_text = quiz_text
+            st.session_state.quiz_generated = "❌" not in quiz_text
+        except Exception as e:
+            st.error(f"❌ Error generating quiz: {e}")
+            st.session_state.quiz_generated = False
+
     # Display generated quiz
-    if st.session_state.quiz_generated and st.session_state.quiz_text:
+    elif st.session_state.quiz_generated and st.session_state.quiz_text:
         st.subheader(f"📋 {subject} Quiz for {grade} - {difficulty.title()} Level")
         
         if st.session_state.quiz_text.startswith("❌"):
@@ -253,187 +226,157 @@ if student_id:
     st.markdown("---")
     st.subheader("📊 Student Progress Over Time")
     
-    if os.path.exists("prediction_log.csv"):
-        try:
-            # Robust CSV reading with error handling
-            log_data = pd.read_csv("prediction_log.csv", on_bad_lines='skip', encoding='utf-8')
+    try:
+        # Indexed lookup of this student's rows only, reused until a new prediction is logged
+        student_history = load_student_history(student_id, get_prediction_store().version())
+        
+        if not student_history.empty:
+            st.subheader(f"📈 Progress for Student: {student_id}")
+            
+            # Remove rows with invalid timestamps or scores
+            valid_history = student_history.dropna(subset=['timestamp', 'predicted_score'])
             
-            # Check if the dataframe is empty after skipping bad lines
-            if log_data.empty:
-                st.warning("📁 CSV file exists but contains no valid data.")
+            if not valid_history.empty:
+                st.line_chart(valid_history.set_index("timestamp")["predicted_score"])
+                
+                # Show full prediction history for this student
+                st.subheader("📋 Prediction History Table")
+                history_cols = ["timestamp", "grade", "subject", "predicted_score", "category", "learner_profile", "model_version"]
+                display_data = student_history[history_cols].sort_values(by="timestamp", ascending=False).reset_index(drop=True)
+                st.dataframe(display_data, use_container_width=True)
             else:
-                # Ensure timestamp column exists and convert
-                if 'timestamp' in log_data.columns:
-                    log_data['timestamp'] = pd.to_datetime(log_data['timestamp'], errors='coerce')
-                    
-                    # Filter student history
-                    student_history = log_data[log_data['student_id'] == student_id]
-                    
-                    if not student_history.empty:
-                        st.subheader(f"📈 Progress for Student: {student_id}")
-                        
-                        # Check if predicted_score column exists
-                        if 'predicted_score' in student_history.columns:
-                            # Remove rows with invalid timestamps or scores
-                            valid_history = student_history.dropna(subset=['timestamp', 'predicted_score'])
-                            
-                            if not valid_history.empty:
-                                st.line_chart(valid_history.set_index("timestamp")["predicted_score"])
-                                
-                                # Show full prediction history for this student
-                                st.subheader("📋 Prediction History Table")
-                                available_cols = [col for col in ["timestamp", "grade", "subject", "predicted_score", "category", "learner_profile"] if col in student_history.columns]
-                                display_data = student_history[available_cols].sort_values(by="timestamp", ascending=False).reset_index(drop=True)
-                                st.dataframe(display_data, use_container_width=True)
-                            else:
-                                st.warning("No valid prediction data found for this student.")
-                        else:
-                            st.warning("Predicted score column not found in history data.")
-                            
-                    elif st.session_state.prediction_made:
-                        st.subheader(f"📈 First-time Progress for Student: {student_id}")
-                        # Create a single-point chart to start the graph
-                        new_entry = pd.DataFrame({
-                            "timestamp": [pd.Timestamp.now()],
-                            "predicted_score": [st.session_state.prediction_data['predicted_score']]
-                        }).set_index("timestamp")
-                        st.line_chart(new_entry["predicted_score"])
-                    else:
-                        st.info("No prediction history found for this student yet.")
-                else:
-                    st.error("Timestamp column not found in CSV file.")
-                    
-        except pd.errors.ParserError as e:
-            st.error(f"❌ CSV file is corrupted. Error: {e}")
-            st.info("💡 **Solution**: Delete 'prediction_log.csv' file and make a new prediction to recreate it.")
-            if st.button("🗑️ Reset CSV File"):
-                try:
-                    os.remove("prediction_log.csv")
-                    st.success("✅ CSV file deleted. Make a new prediction to start fresh.")
-                    st.rerun()
-                except Exception as del_error:
-                    st.error(f"Error deleting file: {del_error}")
-                    
-        except pandas.errors.EmptyDataError:
-            st.warning("📁 prediction_log.csv exists but is empty. A new log entry will be added after this prediction.")
-        except Exception as e:
-            st.error(f"❌ Unexpected error reading CSV: {e}")
+                st.warning("No valid prediction data found for this student.")
+                
+        elif st.session_state.prediction_made:
+            st.subheader(f"📈 First-time Progress for Student: {student_id}")
+            # Create a single-point chart to start the graph
+            new_entry = pd.DataFrame({
+                "timestamp": [pd.Timestamp.now()],
+                "predicted_score": [st.session_state.prediction_data['predicted_score']]
+            }).set_index("timestamp")
+            st.line_chart(new_entry["predicted_score"])
+        else:
+            st.info("No prediction history found for this student yet.")
             
-    else:
-        st.info("No prediction history found yet.")
+    except Exception as e:
+        st.error(f"❌ Unexpected error reading prediction history: {e}")
 
 # Teacher Dashboard
 st.markdown("---")
 st.markdown("---")
 st.subheader("🧑‍🏫 Teacher Dashboard: Class Overview")
 
-if os.path.exists("prediction_log.csv"):
-    try:
-        # Robust CSV reading for teacher dashboard
-        log_data = pd.read_csv("prediction_log.csv", on_bad_lines='skip', encoding='utf-8')
+try:
+    # Latest record per student, updated with only the rows written since the last rerun
+    dashboard = get_dashboard_view(get_prediction_store())
+    
+    if not dashboard.latest:
+        st.info("No prediction history available yet.")
+    else:
+        # Optional filters - only show options that exist in data
+        col1, col2, col3 = st.columns(3)
         
-        if log_data.empty:
-            st.warning("📁 CSV file exists but contains no valid data.")
-        elif 'timestamp' not in log_data.columns:
-            st.error("❌ CSV file format is incorrect. Missing required columns.")
-        else:
-            log_data['timestamp'] = pd.to_datetime(log_data['timestamp'], errors='coerce')
-            
-            # Remove rows with invalid timestamps
-            log_data = log_data.dropna(subset=['timestamp'])
-
-            if not log_data.empty:
-                # Keep only the latest record per student
-                latest_by_student = log_data.sort_values("timestamp", ascending=False).drop_duplicates("student_id", keep='first')
-
-                # Optional filters - only show options that exist in data
-                col1, col2, col3 = st.columns(3)
-                
-                with col1:
-                    if 'category' in latest_by_student.columns:
-                        categories = ["All"] + sorted(latest_by_student["category"].dropna().unique())
-                        selected_category = st.selectbox("Filter by Category", categories)
-                    else:
-                        selected_category = "All"
-                        
-                with col2:
-                    if 'learner_profile' in latest_by_student.columns:
-                        profiles = ["All"] + sorted(latest_by_student["learner_profile"].dropna().unique())
-                        selected_profile = st.selectbox("Filter by Profile", profiles)
-                    else:
-                        selected_profile = "All"
-                        
-                with col3:
-                    if 'subject' in latest_by_student.columns:
-                        subjects = ["All"] + sorted(latest_by_student["subject"].dropna().unique())
-                        selected_subject = st.selectbox("Filter by Subject", subjects)
-                    else:
-                        selected_subject = "All"
-
-                filtered_data = latest_by_student.copy()
+        with col1:
+            selected_category = st.selectbox("Filter by Category", ["All"] + dashboard.filter_options("category"))
                 
-                # Apply filters only if columns exist
-                if selected_category != "All" and 'category' in filtered_data.columns:
-                    filtered_data = filtered_data[filtered_data["category"] == selected_category]
-                if selected_profile != "All" and 'learner_profile' in filtered_data.columns:
-                    filtered_data = filtered_data[filtered_data["learner_profile"] == selected_profile]
-                if selected_subject != "All" and 'subject' in filtered_data.columns:
-                    filtered_data = filtered_data[filtered_data["subject"] == selected_subject]
-
-                # Display columns - only show what exists
-                potential_cols = ["student_id", "timestamp", "grade", "subject", "predicted_score", "category", "learner_profile"]
-                display_cols = [col for col in potential_cols if col in filtered_data.columns]
+        with col2:
+            selected_profile = st.selectbox("Filter by Profile", ["All"] + dashboard.filter_options("learner_profile"))
                 
-                if display_cols:
-                    st.dataframe(filtered_data[display_cols].sort_values("timestamp", ascending=False), use_container_width=True)
-
-                    # Summary statistics
-                    st.markdown("### 📈 Class Summary")
-                    summary_col1, summary_col2, summary_col3, summary_col4 = st.columns(4)
-                    
-                    with summary_col1:
-                        st.metric("Total Students", len(filtered_data))
-                    with summary_col2:
-                        if 'predicted_score' in filtered_data.columns:
-                            avg_score = filtered_data['predicted_score'].mean()
-                            st.metric("Average Score", f"{avg_score:.3f}" if not pd.isna(avg_score) else "N/A")
-                        else:
-                            st.metric("Average Score", "N/A")
-                    with summary_col3:
-                        if 'category' in filtered_data.columns:
-                            top_category = filtered_data['category'].mode()
-                            st.metric("Most Common Category", top_category[0] if len(top_category) > 0 else "N/A")
-                        else:
-                            st.metric("Most Common Category", "N/A")
-                    with summary_col4:
-                        if 'learner_profile' in filtered_data.columns:
-                            top_profile = filtered_data['learner_profile'].mode()
-                            st.metric("Most Common Profile", top_profile[0] if len(top_profile) > 0 else "N/A")
-                        else:
-                            st.metric("Most Common Profile", "N/A")
-                else:
-                    st.error("No valid columns found for display.")
-            else:
-                st.warning("No valid data found after cleaning.")
+        with col3:
+            selected_subject = st.selectbox("Filter by Subject", ["All"] + dashboard.filter_options("subject"))
 
-    except pd.errors.ParserError as e:
-        st.error(f"❌ CSV file is corrupted. Error: {e}")
-        st.info("💡 **Solution**: Delete 'prediction_log.csv' file and make new predictions to recreate it.")
-        if st.button("🗑️ Reset CSV File (Dashboard)"):
-            try:
-                os.remove("prediction_log.csv")
-                st.success("✅ CSV file deleted. Make new predictions to start fresh.")
-                st.rerun()
-            except Exception as del_error:
-                st.error(f"Error deleting file: {del_error}")
-                
-    except Exception as e:
-        st.error(f"Error loading dashboard data: {e}")
-        st.info("💡 Try refreshing the page or resetting the CSV file.")
-else:
-    st.info("No prediction history available yet.")
+        filtered_data = dashboard.filtered_frame(selected_category, selected_profile, selected_subject)
+        st.dataframe(filtered_data, use_container_width=True)
+
+        # Summary statistics
+        summary = dashboard.summary(selected_category, selected_profile, selected_subject)
+        st.markdown("### 📈 Class Summary")
+        summary_col1, summary_col2, summary_col3, summary_col4 = st.columns(4)
+        
+        with summary_col1:
+            st.metric("Total Students", summary["total_students"])
+        with summary_col2:
+            avg_score = summary["average_score"]
+            st.metric("Average Score", f"{avg_score:.3f}" if avg_score is not None else "N/A")
+        with summary_col3:
+            st.metric("Most Common Category", summary["top_category"] or "N/A")
+        with summary_col4:
+            st.metric("Most Common Profile", summary["top_profile"] or "N/A")
+
+        # One quiz per student in the filtered cohort; students who would get the same
+        # prompt (grade, subject, difficulty) share a single LLM request
+        st.markdown("### 📝 Cohort Quizzes")
+        cohort_col1, cohort_col2 = st.columns([1, 2])
+        with cohort_col1:
+            cohort_variants = st.number_input("Quiz variants per group", min_value=1, max_value=5, value=1)
+        with cohort_col2:
+            cohort_clicked = st.button(f"🎯 Generate quizzes for {len(filtered_data)} students")
+        cohort_filters = (selected_category, selected_profile, selected_subject)
+        if cohort_clicked:
+            # Cached quizzes are served without the API; the service tests it on the first miss
+            with st.spinner("Generating cohort quizzes..."):
+                st.session_state.cohort_report = generate_cohort_quizzes(
+                    filtered_data.to_dict("records"), variants=int(cohort_variants))
+                st.session_state.cohort_filters = cohort_filters
+
+        # A report belongs to the cohort it was generated for; drop it once the filters change
+        if st.session_state.get("cohort_filters") != cohort_filters:
+            st.session_state.pop("cohort_report", None)
+        cohort_report = st.session_state.get("cohort_report")
+        if cohort_report is not None:
+            report_col1, report_col2, report_col3, report_col4 = st.columns(4)
+            with report_col1:
+                st.metric("Quizzes", cohort_report.students)
+            with report_col2:
+                st.metric("LLM Calls", cohort_report.llm_calls)
+            with report_col3:
+                st.metric("Calls Saved", cohort_report.calls_saved)
+            with report_col4:
+                st.metric("Total Time", f"{cohort_report.seconds:.1f}s")
+            if cohort_report.skipped:
+                st.warning(f"⚠️ {len(cohort_report.skipped)} students have no grade, subject or prediction and were skipped.")
+            if cohort_report.failed and cohort_report.failed == cohort_report.requests:
+                first_error = next(result.error for group in cohort_report.groups for result in group.results)
+                st.error(f"❌ Cannot generate quizzes: {first_error}")
+            elif cohort_report.failed:
+                st.warning(f"⚠️ {cohort_report.failed} of {cohort_report.requests} quiz requests failed.")
+
+            assignments = pd.DataFrame(cohort_report.assignment_rows())
+            if not assignments.empty:
+                st.dataframe(assignments.drop(columns=["quiz_text", "error"]), use_container_width=True)
+                for group in cohort_report.groups:
+                    with st.expander(f"📋 {group.subject} Quiz for {group.grade} - {group.difficulty.title()} Level "
+                                     f"({len(group.student_ids)} students)"):
+                        for result in group.results:
+                            if result.ok:
+                                st.markdown(result.quiz_text)
+                            else:
+                                st.error(f"❌ {result.error}")
+                st.download_button("⬇️ Download quizzes (CSV)", assignments.to_csv(index=False),
+                                   file_name="cohort_quizzes.csv", mime="text/csv")
+
+except Exception as e:
+    st.error(f"Error loading dashboard data: {e}")
+    st.info("💡 Try refreshing the page.")
 
 # Footer
 st.markdown("---")
 st.markdown("💡 **Tip:** Enter a Student ID and make predictions to track progress over time.")
+
+# Timing metrics for this process (enable with METRICS_DEBUG_PANEL=1)
+if os.getenv("METRICS_DEBUG_PANEL") == "1":
+    with st.expander("🛠️ Performance metrics"):
+        metric_rows = summary_rows(get_metrics().snapshot())
+        if metric_rows:
+            st.dataframe(pd.DataFrame(metric_rows), use_container_width=True)
+        else:
+            st.info("No metrics recorded yet.")
+        cache_stats = get_prediction_cache().stats()
+        st.caption(f"Prediction cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                   f"({cache_stats['hit_rate']:.0%}), {cache_stats['entries']}/{cache_stats['max_entries']} entries")
+        if st.button("Reset metrics"):
+            get_metrics().reset()
+            st.rerun()
+
+get_metrics().flush()
 # st.markdown("📧 For technical support, please contact your system administrator.")
\ No newline at end of file
@@ -0,0 +1,355 @@
+# backfill.py
+# Re-score a large history export after a model update, spread over a pool of processes.
+# The input is split into chunks (line-aligned byte ranges of a CSV, row ranges of a
+# Parquet file) that the workers read themselves. Each worker loads the pinned model
+# version once, scores its chunks with FastPredictor and the vectorized rules, and writes
+# the result to its own file in the work directory: CSV text when the output is CSV, an
+# Arrow IPC file when it is Parquet. Only (chunk number, row count) goes back to the
+# parent, which appends finished chunks to the output strictly in input order, reading
+# the Arrow files through a memory map.
+#
+# The work directory (<output>.backfill/ by default) doubles as the checkpoint. Chunks are
+# renamed into place once complete, so an interrupted run started again with the same
+# arguments only scores the chunks that are missing. The directory is removed when the
+# output is complete and until then needs about as much disk space as the output.
+# CSV input must hold one record per line, as the prediction log and batch_scoring output do.
+#
+# Usage:
+#   python backfill.py prediction_history.csv rescored.csv
+#   python backfill.py history.parquet rescored.parquet --workers 8 --chunk-size 50000
+#   python backfill.py history.csv rescored.csv --model-version v003
+#   python backfill.py history.csv rescored.csv --restart       # discard an earlier checkpoint
+
+import argparse
+import itertools
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_EXCEPTION, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from batch_scoring import DEFAULT_MODEL_PATH, output_columns
+from metrics import get_metrics
+from model_registry import DEFAULT_REGISTRY_PATH, ModelRegistry, fallback_version, load_version
+from student_rules import features
+from vectorized_rules import apply_rules
+
+DEFAULT_CHUNK_SIZE = int(os.getenv("BACKFILL_CHUNK_SIZE", "50000"))
+DEFAULT_WORKERS = int(os.getenv("BACKFILL_WORKERS", str(os.cpu_count() or 1)))
+CHECKPOINT_FILE = "checkpoint.json"
+
+# Columns (re)computed for every row; other input columns are passed through unchanged
+score_columns = [*output_columns, "model_version"]
+
+
+def _extension(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in (".csv", ".parquet"):
+        raise ValueError(f"Unsupported format '{extension}'. Use .csv or .parquet")
+    return extension
+
+
+def plan_chunks(input_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Split the input into (start, stop) ranges of about chunk_size rows.
+
+    Ranges are row numbers for Parquet and line-aligned byte offsets for CSV (estimated
+    from the length of the first 1000 lines, so CSV chunks are only roughly chunk_size).
+    """
+    if _extension(input_path) == ".parquet":
+        import pyarrow.parquet as pq
+
+        num_rows = pq.ParquetFile(input_path).metadata.num_rows
+        return [(start, min(start + chunk_size, num_rows)) for start in range(0, num_rows, chunk_size)]
+
+    size = os.path.getsize(input_path)
+    chunks = []
+    with open(input_path, "rb") as f:
+        f.readline()  # Header
+        start = f.tell()
+        sample = list(itertools.islice(f, 1000))
+        step = max(int(sum(map(len, sample)) / max(len(sample), 1) * chunk_size), 1)
+        while start < size:
+            stop = start + step
+            if stop < size:
+                # Move to the end of the line that byte stop - 1 belongs to
+                f.seek(stop - 1)
+                f.readline()
+                stop = f.tell()
+            chunks.append((start, min(stop, size)))
+            start = stop
+    return chunks
+
+
+def input_schema(input_path):
+    """Arrow schema the workers read with. CSV features are read as float64, other CSV columns as text."""
+    import pyarrow as pa
+
+    if _extension(input_path) == ".parquet":
+        import pyarrow.parquet as pq
+
+        return pq.read_schema(input_path).remove_metadata()
+    import csv
+
+    with open(input_path, newline="", encoding="utf-8") as f:
+        columns = next(csv.reader(f), [])
+    return pa.schema([(column, pa.float64() if column in features else pa.string()) for column in columns])
+
+
+def output_schema(schema):
+    """The input schema with the score columns (re)placed at the end."""
+    import pyarrow as pa
+
+    kept = [field for field in schema if field.name not in score_columns]
+    added = [pa.field(column, pa.float32() if column == "predicted_score" else pa.string()) for column in score_columns]
+    return pa.schema(kept + added)
+
+
+def read_chunk(input_path, schema, start, stop):
+    """Read one planned chunk as an Arrow table."""
+    import pyarrow as pa
+
+    if _extension(input_path) == ".parquet":
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(input_path)
+        groups, first_row, row = [], None, 0
+        for i in range(parquet_file.num_row_groups):
+            group_rows = parquet_file.metadata.row_group(i).num_rows
+            if row < stop and row + group_rows > start:
+                first_row = row if first_row is None else first_row
+                groups.append(i)
+            row += group_rows
+        table = parquet_file.read_row_groups(groups, use_threads=False)
+        return table.slice(start - first_row, stop - start)
+
+    import pyarrow.csv as pa_csv
+
+    with open(input_path, "rb") as f:
+        f.seek(start)
+        data = f.read(stop - start)
+    return pa_csv.read_csv(
+        pa.BufferReader(data),
+        read_options=pa_csv.ReadOptions(column_names=schema.names, use_threads=False),
+        parse_options=pa_csv.ParseOptions(invalid_row_handler=lambda row: "skip"),
+        convert_options=pa_csv.ConvertOptions(column_types=schema, strings_can_be_null=True))
+
+
+def score_table(table, loaded, schema):
+    """Predict and apply the rules to an Arrow table of input rows; returns a table in `schema`."""
+    import pyarrow as pa
+
+    feature_names = loaded.predictor.feature_names
+    # Missing feature columns are 0.0 like in batch_scoring; missing values stay NaN for the model
+    inputs = np.zeros((table.num_rows, len(feature_names)), dtype=np.float32)
+    for i, name in enumerate(feature_names):
+        if name in table.column_names:
+            inputs[:, i] = table.column(name).cast(pa.float32()).to_numpy(zero_copy_only=False)
+    scores = loaded.predictor.predict(inputs)
+    input_df = pd.DataFrame(inputs, columns=feature_names).reindex(columns=features, fill_value=0.0)
+    rules = apply_rules(input_df, scores)
+
+    computed = {"predicted_score": pa.array(scores, pa.float32()),
+                "model_version": pa.array([loaded.version] * table.num_rows, pa.string())}
+    for column in output_columns[1:]:
+        computed[column] = pa.array(rules[column].to_numpy(), pa.string())
+    arrays = [computed[field.name] if field.name in computed else table.column(field.name).cast(field.type)
+              for field in schema]
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def chunk_path(work_dir, number, output_format):
+    return os.path.join(work_dir, f"chunk-{number:06d}{'.csv' if output_format == '.csv' else '.arrow'}")
+
+
+# Per-process state, set once by _init_worker
+_worker = {}
+
+
+def _init_worker(input_path, schema, version, registry_path, fallback_path, work_dir, output_format):
+    import pyarrow as pa
+
+    # Parallelism comes from the processes; keep each one on a single core
+    pa.set_cpu_count(1)
+    loaded = load_version(version, ModelRegistry(registry_path), fallback_path)
+    loaded.predictor.booster.set_param({"nthread": 1})
+    _worker.update(input_path=input_path, schema=schema, loaded=loaded, work_dir=work_dir,
+                   output_format=output_format)
+
+
+def _score_chunk(number, start, stop):
+    """Worker task: score one chunk into its file in the work directory. Returns (number, rows)."""
+    import pyarrow as pa
+
+    table = read_chunk(_worker["input_path"], _worker["schema"], start, stop)
+    table = score_table(table, _worker["loaded"], output_schema(_worker["schema"]))
+    path = chunk_path(_worker["work_dir"], number, _worker["output_format"])
+    temp_path = f"{path}.tmp"
+    if _worker["output_format"] == ".csv":
+        # Formatting CSV text is the costly part of writing it, so it happens here in parallel
+        table.to_pandas().to_csv(temp_path, header=number == 0, index=False)
+    else:
+        with pa.OSFile(temp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(temp_path, path)
+    return number, table.num_rows
+
+
+class _OrderedOutput:
+    """Appends finished chunk files to the output in chunk order."""
+
+    def __init__(self, path, output_format, schema):
+        self.path = path
+        self.output_format = output_format
+        self.schema = schema
+        self.next_chunk = 0
+        if output_format == ".csv":
+            self._file = open(path, "wb")
+        else:
+            import pyarrow.parquet as pq
+
+            self._file = pq.ParquetWriter(path, schema)
+
+    def append(self, chunk_file):
+        if self.output_format == ".csv":
+            with open(chunk_file, "rb") as source:
+                shutil.copyfileobj(source, self._file, 1 << 20)
+        else:
+            import pyarrow as pa
+
+            with pa.memory_map(chunk_file) as source:
+                self._file.write_table(pa.ipc.open_file(source).read_all())
+        self.next_chunk += 1
+
+    def write_header(self):
+        """Column names only, for an input without rows (Parquet files always carry their schema)."""
+        if self.output_format == ".csv":
+            pd.DataFrame(columns=self.schema.names).to_csv(self._file, index=False)
+
+    def close(self):
+        self._file.close()
+
+
+def backfill(input_path, output_path, workers=DEFAULT_WORKERS, chunk_size=DEFAULT_CHUNK_SIZE, version=None,
+             registry_path=DEFAULT_REGISTRY_PATH, fallback_path=DEFAULT_MODEL_PATH, work_dir=None,
+             restart=False, progress=None):
+    """Score input_path into output_path with a process pool, resuming from an earlier checkpoint.
+
+    version pins the model (default: the registry's active version, else the fallback
+    file). progress(chunks written, total chunks) is called as the output grows.
+    Returns a stats dict: chunks, resumed, rows_scored, workers, model_version, seconds.
+    """
+    started = time.monotonic()
+    _extension(input_path)
+    output_format = _extension(output_path)
+    registry = ModelRegistry(registry_path)
+    if version is None:
+        version = registry.pointer()["active"] or fallback_version(fallback_path)
+    elif "@" not in version and not os.path.exists(registry.model_path(version)):
+        raise ValueError(f"Model version '{version}' is not registered")
+
+    work_dir = work_dir or f"{output_path}.backfill"
+    if restart:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    stat = os.stat(input_path)
+    settings = {"input": os.path.abspath(input_path), "input_size": stat.st_size,
+                "input_mtime_ns": stat.st_mtime_ns, "output_format": output_format,
+                "chunk_size": chunk_size, "model_version": version}
+    checkpoint_path = os.path.join(work_dir, CHECKPOINT_FILE)
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        if checkpoint["settings"] != settings:
+            raise ValueError(f"'{work_dir}' holds the checkpoint of a different run; pass --restart to discard it")
+        chunks = [tuple(chunk) for chunk in checkpoint["chunks"]]
+    else:
+        os.makedirs(work_dir, exist_ok=True)
+        chunks = plan_chunks(input_path, chunk_size)
+        with open(f"{checkpoint_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"settings": settings, "chunks": chunks}, f)
+        os.replace(f"{checkpoint_path}.tmp", checkpoint_path)
+
+    schema = input_schema(input_path)
+    finished = {number for number in range(len(chunks))
+                if os.path.exists(chunk_path(work_dir, number, output_format))}
+    pending = [number for number in range(len(chunks)) if number not in finished]
+    stats = {"chunks": len(chunks), "resumed": len(finished), "rows_scored": 0,
+             "workers": min(workers, len(pending)), "model_version": version}
+
+    # The output is assembled next to the chunks and moved into place once complete
+    partial_path = os.path.join(work_dir, f"output{output_format}")
+    output = _OrderedOutput(partial_path, output_format, output_schema(schema))
+
+    def write_finished():
+        while output.next_chunk in finished:
+            output.append(chunk_path(work_dir, output.next_chunk, output_format))
+            if progress is not None:
+                progress(output.next_chunk, len(chunks))
+
+    try:
+        with get_metrics().span("backfill.run", model_version=version):
+            write_finished()
+            if pending:
+                with ProcessPoolExecutor(max_workers=stats["workers"], initializer=_init_worker,
+                                         initargs=(input_path, schema, version, registry_path, fallback_path,
+                                                   work_dir, output_format)) as pool:
+                    futures = {pool.submit(_score_chunk, number, *chunks[number]) for number in pending}
+                    try:
+                        while futures:
+                            done, futures = wait(futures, return_when=FIRST_EXCEPTION)
+                            for future in done:
+                                number, rows = future.result()
+                                finished.add(number)
+                                stats["rows_scored"] += rows
+                            write_finished()
+                    except BaseException:
+                        # Chunks finished so far stay in the work directory for the next run
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        raise
+            if not chunks:
+                output.write_header()
+    finally:
+        output.close()
+
+    os.replace(partial_path, output_path)
+    shutil.rmtree(work_dir, ignore_errors=True)
+    get_metrics().increment("backfill.rows", stats["rows_scored"], model_version=version)
+    stats["seconds"] = time.monotonic() - started
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-score a large CSV/Parquet history file with a pool of processes.")
+    parser.add_argument("input", help="Input .csv or .parquet file with the 15 behavior feature columns")
+    parser.add_argument("output", help="Output .csv or .parquet file")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Worker processes")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per chunk")
+    parser.add_argument("--model-version", help="Registry version to score with (default: the active one)")
+    parser.add_argument("--registry", default=DEFAULT_REGISTRY_PATH, help="Model registry directory")
+    parser.add_argument("--model", default=os.getenv("MODEL_PATH", DEFAULT_MODEL_PATH),
+                        help="Model pickle used when the registry has no active version")
+    parser.add_argument("--work-dir", help="Checkpoint directory (default: <output>.backfill)")
+    parser.add_argument("--restart", action="store_true", help="Discard an earlier checkpoint and start over")
+    args = parser.parse_args(argv)
+
+    def progress(written, total):
+        print(f"[{written}/{total}] chunks written")
+
+    try:
+        stats = backfill(args.input, args.output, args.workers, args.chunk_size, args.model_version,
+                         args.registry, args.model, args.work_dir, args.restart, progress)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+
+    resumed = f", {stats['resumed']} chunks reused from the checkpoint" if stats["resumed"] else ""
+    print(f"✅ Scored {stats['rows_scored']} rows with {stats['model_version']} on {stats['workers']} workers "
+          f"in {stats['seconds']:.1f}s{resumed} → {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
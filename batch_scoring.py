@@ -0,0 +1,152 @@
+# batch_scoring.py
+# Score many students at once with the trained model, without Streamlit or Gemini.
+#
+# Usage:
+#   python batch_scoring.py students.csv scored.csv
+#   python batch_scoring.py term_export.parquet scored.parquet --chunk-size 50000
+
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+from student_rules import features
+from vectorized_rules import apply_rules
+
+DEFAULT_MODEL_PATH = "student_model.pkl"
+DEFAULT_CHUNK_SIZE = 10000
+
+# Columns added to every scored row
+output_columns = [
+    "predicted_score", "category", "learner_profile",
+    "combined_recommendation", "learning_material"
+]
+
+
+def load_model(model_path=DEFAULT_MODEL_PATH):
+    """Load the trained model from disk."""
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model file '{model_path}' not found.")
+    import joblib  # Only needed once a model is actually loaded
+
+    return joblib.load(model_path)
+
+
+def get_model_features(model):
+    """Return the feature order the model was trained with."""
+    if hasattr(model, 'feature_names_in_'):
+        return [str(name) for name in model.feature_names_in_]
+    return list(features)
+
+
+def prepare_batch_input(df, expected_features):
+    """Build the model input frame, filling missing features with 0.0 like the app does."""
+    missing_features = [feature for feature in expected_features if feature not in df.columns]
+    if missing_features:
+        print(f"⚠️ Missing features filled with default values: {missing_features}")
+
+    input_df = df.reindex(columns=expected_features, fill_value=0.0)
+    return input_df.astype("float32")
+
+
+def add_rule_columns(scored_df, input_df):
+    """Attach category, learner profile and recommendation columns to scored rows."""
+    rules = apply_rules(input_df.reindex(columns=features, fill_value=0.0), scored_df["predicted_score"].to_numpy())
+    for column in output_columns[1:]:
+        scored_df[column] = rules[column].to_numpy()
+    return scored_df
+
+
+def score_dataframe(df, model=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Score every row of df and return a copy with the output columns added."""
+    if model is None:
+        model = load_model()
+    expected_features = get_model_features(model)
+
+    scored_chunks = []
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        scored_chunks.append(score_chunk(chunk, model, expected_features))
+
+    if not scored_chunks:
+        return df.reindex(columns=[*df.columns, *output_columns])
+    return pd.concat(scored_chunks)
+
+
+def score_chunk(chunk, model, expected_features):
+    """Run one vectorized predict call over a chunk and apply the rules."""
+    input_df = prepare_batch_input(chunk, expected_features)
+    scored = chunk.copy()
+    scored["predicted_score"] = model.predict(input_df)
+    return add_rule_columns(scored, input_df)
+
+
+def iter_input_chunks(input_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield DataFrame chunks from a CSV or Parquet file without loading it all at once."""
+    extension = os.path.splitext(input_path)[1].lower()
+    if extension == ".parquet":
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(input_path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    elif extension == ".csv":
+        for chunk in pd.read_csv(input_path, chunksize=chunk_size, on_bad_lines='skip', encoding='utf-8'):
+            yield chunk
+    else:
+        raise ValueError(f"Unsupported input format '{extension}'. Use .csv or .parquet")
+
+
+def score_file(input_path, output_path, model_path=DEFAULT_MODEL_PATH, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Score a CSV/Parquet file chunk by chunk and write the results. Returns the row count."""
+    model = load_model(model_path)
+    expected_features = get_model_features(model)
+    extension = os.path.splitext(output_path)[1].lower()
+    if extension not in (".csv", ".parquet"):
+        raise ValueError(f"Unsupported output format '{extension}'. Use .csv or .parquet")
+
+    total_rows = 0
+    parquet_writer = None
+    try:
+        for chunk in iter_input_chunks(input_path, chunk_size):
+            scored = score_chunk(chunk, model, expected_features)
+            if extension == ".csv":
+                scored.to_csv(output_path, mode='w' if total_rows == 0 else 'a',
+                              header=total_rows == 0, index=False)
+            else:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                table = pa.Table.from_pandas(scored, preserve_index=False)
+                if parquet_writer is None:
+                    parquet_writer = pq.ParquetWriter(output_path, table.schema)
+                parquet_writer.write_table(table)
+            total_rows += len(scored)
+    finally:
+        if parquet_writer is not None:
+            parquet_writer.close()
+
+    return total_rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-score students from a CSV or Parquet file of behavior features.")
+    parser.add_argument("input", help="Input .csv or .parquet file with the 15 behavior feature columns")
+    parser.add_argument("output", help="Output .csv or .parquet file")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="Path to the trained model pickle")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per predict call")
+    args = parser.parse_args(argv)
+
+    try:
+        total_rows = score_file(args.input, args.output, args.model, args.chunk_size)
+    except (FileNotFoundError, ValueError, pd.errors.ParserError) as e:
+        print(f"❌ {e}")
+        return 1
+
+    print(f"✅ Scored {total_rows} rows → {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
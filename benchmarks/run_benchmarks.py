@@ -0,0 +1,335 @@
+# benchmarks/run_benchmarks.py
+# Performance benchmarks for the prediction, rule, logging, dashboard, quiz, event
+# ingestion and backfill paths.
+# All data is synthetic (generated from the `features` list) and written to a temporary
+# directory; the LLM is replaced by FakeLLMClient, so nothing leaves the machine.
+#
+# Usage (from the repository root):
+#   python benchmarks/run_benchmarks.py                      # all benchmarks, 10k/100k/1M log rows
+#   python benchmarks/run_benchmarks.py --sizes 10000        # quicker run
+#   python benchmarks/run_benchmarks.py --only predict rules
+#   python benchmarks/run_benchmarks.py --compare benchmarks/results/<old>.json
+#
+# Results are written to benchmarks/results/<commit>.json and can be compared across commits.
+# The app's cold start is checked separately by benchmarks/startup_benchmark.py.
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# Keep quiz benchmarks away from the on-disk caches
+os.environ.setdefault("QUIZ_CACHE_PATH", ":memory:")
+os.environ.setdefault("QUESTION_BANK_PATH", "off")
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+
+def measure(fn, repeat=5, setup=None):
+    """Run fn `repeat` times (setup before each run is not timed). Returns timing stats in seconds."""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {"median_s": statistics.median(times), "min_s": min(times), "runs": repeat}
+
+
+def synthetic_history(n_rows, n_students=2000, seed=0):
+    """A prediction log with the app's columns (header equal to history_columns), spread over n_students and 90 days."""
+    from history_schema import history_columns
+    from vectorized_rules import apply_rules, sample_features
+    from student_rules import subject_options, grade_options
+
+    rng = np.random.default_rng(seed)
+    feature_df = sample_features(n_rows, rng)
+    scores = rng.random(n_rows).astype("float32")
+    rules = apply_rules(feature_df, scores)
+    start = pd.Timestamp("2025-01-01")
+    history = pd.DataFrame({
+        "student_id": [f"S{n:05d}" for n in rng.integers(0, n_students, n_rows)],
+        "timestamp": (start + pd.to_timedelta(np.sort(rng.integers(0, 90 * 86400, n_rows)), unit="s")).strftime("%Y-%m-%d %H:%M:%S"),
+        "grade": rng.choice(grade_options, n_rows),
+        "subject": rng.choice(subject_options, n_rows),
+    })
+    history = pd.concat([history, feature_df], axis=1)
+    history["predicted_score"] = scores
+    history["category"] = rules["category"].to_numpy()
+    history["learner_profile"] = rules["learner_profile"].to_numpy()
+    history["model_version"] = "student_model.pkl@bench"
+    return history[history_columns]
+
+
+def bench_predict(results, sizes, workdir):
+    from batch_scoring import load_model, score_dataframe
+    from fast_inference import FastPredictor
+    from vectorized_rules import sample_features
+
+    model = load_model(os.path.join(REPO_ROOT, "student_model.pkl"))
+    predictor = FastPredictor(model)
+    feature_names = predictor.feature_names
+    row = {feature: 0.5 for feature in feature_names}
+
+    # The app's original path: one-row DataFrame, then the sklearn wrapper
+    results["predict.single.dataframe"] = measure(
+        lambda: model.predict(pd.DataFrame([[row[f] for f in feature_names]], columns=feature_names))[0], repeat=200)
+    results["predict.single.fast"] = measure(lambda: predictor.predict_one(row), repeat=200)
+
+    # The app's full predict + rule chain for one student, computed and then memoized
+    from model_registry import ModelManager, ModelRegistry
+    from prediction_cache import PredictionCache, score_student
+
+    manager = ModelManager(ModelRegistry(os.path.join(workdir, "no_registry")),
+                           fallback_path=os.path.join(REPO_ROOT, "student_model.pkl"))
+    loaded = manager.current()
+    input_row, _ = loaded.predictor.prepare_row(row)
+    results["predict.single.rules"] = measure(lambda: score_student(row, input_row, manager, loaded), repeat=200)
+    cache = PredictionCache()
+    results["predict.single.cached"] = measure(lambda: cache.predict(row, input_row, manager, loaded), repeat=200)
+
+    for size in sizes:
+        batch = sample_features(size, np.random.default_rng(1))[feature_names]
+        results[f"predict.batch.dataframe.{size}"] = measure(lambda: model.predict(batch), repeat=3)
+        array = batch.to_numpy(dtype=np.float32)
+        results[f"predict.batch.fast.{size}"] = measure(lambda: predictor.predict(array), repeat=3)
+        results[f"score_dataframe.{size}"] = measure(lambda: score_dataframe(batch, model, chunk_size=50_000), repeat=3)
+
+
+def bench_rules(results, sizes, workdir):
+    from student_rules import (categorize_student_performance, generate_combined_recommendation,
+                               generate_learner_profile, map_difficulty)
+    from vectorized_rules import apply_rules, sample_features
+
+    for size in sizes:
+        if size > 100_000:
+            continue  # The scalar loop alone would take minutes
+        feature_df = sample_features(size, np.random.default_rng(2))
+        scores = np.random.default_rng(3).random(size).astype("float32")
+        records = feature_df.to_dict("records")
+
+        def scalar_rules():
+            for feature_row, score in zip(records, scores):
+                _, category, _, _ = categorize_student_performance(score)
+                profile = generate_learner_profile(feature_row)
+                generate_combined_recommendation(category, profile)
+                map_difficulty(score, category)
+
+        results[f"rules.scalar.{size}"] = measure(scalar_rules, repeat=3)
+        results[f"rules.vectorized.{size}"] = measure(lambda: apply_rules(feature_df, scores), repeat=3)
+
+
+def bench_log(results, sizes, workdir):
+    from prediction_log_writer import list_segments
+    from prediction_store import CSVPredictionStore, SQLitePredictionStore
+
+    for size in sizes:
+        history = synthetic_history(size)
+        csv_path = os.path.join(workdir, f"log_{size}.csv")
+        history.to_csv(csv_path, index=False)
+        new_row = history.iloc[0].to_dict()
+
+        # Appending one prediction the way app.py originally did
+        results[f"log.csv.append_dataframe.{size}"] = measure(
+            lambda: pd.DataFrame([new_row]).to_csv(csv_path, mode="a", header=False, index=False), repeat=20)
+        csv_store = CSVPredictionStore(csv_path)
+
+        def store_append():
+            csv_store.append(new_row)
+            csv_store.flush()
+
+        results[f"log.csv.append_store.{size}"] = measure(store_append, repeat=20)
+        # A header mismatch would have rotated the log into a segment, leaving reads nothing to time
+        with open(csv_path, encoding="utf-8") as f:
+            csv_rows = sum(1 for _ in f) - 1
+        assert not list_segments(csv_path) and csv_rows == size + 40, \
+            f"{csv_path} holds {csv_rows} rows instead of {size + 40}; was it rotated?"
+        results[f"log.csv.read_full.{size}"] = measure(
+            lambda: pd.read_csv(csv_path, on_bad_lines="skip", encoding="utf-8"), repeat=3)
+
+        db_path = os.path.join(workdir, f"log_{size}.sqlite3")
+        store = SQLitePredictionStore(db_path)
+        store.append_many(history.to_dict("records"))
+        results[f"log.sqlite.append.{size}"] = measure(lambda: store.append(new_row), repeat=20)
+        results[f"log.sqlite.student_history.{size}"] = measure(lambda: store.student_history("S00042"), repeat=20)
+
+
+def bench_dashboard(results, sizes, workdir):
+    from dashboard_view import DashboardView
+    from prediction_store import SQLitePredictionStore
+
+    for size in sizes:
+        db_path = os.path.join(workdir, f"log_{size}.sqlite3")
+        history = synthetic_history(size)
+        if not os.path.exists(db_path):
+            SQLitePredictionStore(db_path).append_many(history.to_dict("records"))
+        store = SQLitePredictionStore(db_path)
+
+        def pandas_latest():
+            log_data = history.copy()
+            log_data["timestamp"] = pd.to_datetime(log_data["timestamp"], errors="coerce")
+            log_data.sort_values("timestamp", ascending=False).drop_duplicates("student_id", keep="first")
+
+        results[f"dashboard.pandas_latest.{size}"] = measure(pandas_latest, repeat=3)
+        results[f"dashboard.sql_latest.{size}"] = measure(store.latest_by_student, repeat=3)
+
+        view = DashboardView()
+        results[f"dashboard.view_initial.{size}"] = measure(lambda: view.refresh(store), setup=view.reset, repeat=3)
+        new_row = history.iloc[0].to_dict()
+
+        def incremental():
+            store.append(new_row)
+            view.refresh(store)
+            view.summary()
+
+        results[f"dashboard.view_incremental.{size}"] = measure(incremental, repeat=20)
+
+
+def bench_quiz(results, sizes, workdir):
+    import llm_client
+    from quiz_cache import MemoryQuizCacheBackend, QuizCache, set_quiz_cache
+
+    llm_client.set_llm_client(llm_client.FakeLLMClient())
+    import helper_functions
+
+    results["quiz.generate.uncached"] = measure(
+        lambda: helper_functions.generate_quiz("Grade 5", "Math", "easy", num_q=5, use_cache=False), repeat=50)
+    set_quiz_cache(QuizCache(MemoryQuizCacheBackend()))
+    helper_functions.generate_quiz("Grade 5", "Math", "easy", num_q=5)
+    results["quiz.generate.cached"] = measure(
+        lambda: helper_functions.generate_quiz("Grade 5", "Math", "easy", num_q=5), repeat=50)
+
+    # A 200-student cohort: one request per student vs one per prompt group, 20 ms per LLM call
+    from cohort_quiz import generate_cohort_quizzes
+    from quiz_service import QuizGenerationService, QuizJob
+    from student_rules import map_difficulty
+
+    def slow_response(prompt, model_name):
+        time.sleep(0.02)
+        return llm_client.FakeLLMClient().response
+
+    manager = llm_client.set_llm_client(llm_client.FakeLLMClient(response=slow_response))
+    cohort = synthetic_history(200, n_students=200).to_dict("records")
+    with QuizGenerationService(manager, max_workers=4, use_cache=False) as service:
+        per_student = [QuizJob(row["grade"], row["subject"], map_difficulty(row["predicted_score"], row["category"]))
+                       for row in cohort]
+        results["quiz.cohort.per_student.200"] = measure(lambda: service.generate_many(per_student), repeat=1)
+        results["quiz.cohort.grouped.200"] = measure(lambda: generate_cohort_quizzes(cohort, service=service), repeat=1)
+
+
+def bench_ingest(results, sizes, workdir):
+    from event_ingestion import WindowTracker, closed_windows, ingest_events, read_events, sample_events
+
+    for size in sizes:
+        # `size` raw events: 250 per student over one school day
+        events_path = os.path.join(workdir, f"events_{size}.jsonl")
+        with open(events_path, "w", encoding="utf-8") as f:
+            for event in sample_events(n_students=max(size // 250, 1), events_per_student=250):
+                f.write(json.dumps(event) + "\n")
+        results[f"ingest.features.{size}"] = measure(
+            lambda: sum(1 for _ in closed_windows(read_events(events_path), WindowTracker())), repeat=1)
+        results[f"ingest.scored.{size}"] = measure(
+            lambda: ingest_events(read_events(events_path), os.path.join(workdir, "scored_windows.csv")), repeat=1)
+
+
+def bench_backfill(results, sizes, workdir):
+    from backfill import backfill
+    from batch_scoring import score_file
+
+    model_path = os.path.join(REPO_ROOT, "student_model.pkl")
+    cores = os.cpu_count() or 1
+    for size in sizes:
+        history_path = os.path.join(workdir, f"backfill_history_{size}.csv")
+        synthetic_history(size).to_csv(history_path, index=False)
+        output_path = os.path.join(workdir, "rescored.csv")
+        # Single process, as batch_scoring does it
+        results[f"backfill.serial.{size}"] = measure(
+            lambda: score_file(history_path, output_path, model_path), repeat=1)
+        for workers in sorted({1, cores}):
+            results[f"backfill.workers_{workers}.{size}"] = measure(
+                lambda: backfill(history_path, output_path, workers, registry_path=os.path.join(workdir, "no_registry"),
+                                 fallback_path=model_path, restart=True), repeat=1)
+
+
+benchmarks = {
+    "predict": bench_predict,
+    "rules": bench_rules,
+    "log": bench_log,
+    "dashboard": bench_dashboard,
+    "quiz": bench_quiz,
+    "ingest": bench_ingest,
+    "backfill": bench_backfill,
+}
+
+
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(old_path, new_results):
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    print(f"\nComparison with {old.get('commit')} ({old_path}):")
+    for name, stats in new_results.items():
+        if name in old["results"]:
+            ratio = stats["median_s"] / old["results"][name]["median_s"]
+            flag = "🔺" if ratio > 1.1 else ("🔻" if ratio < 0.9 else "  ")
+            print(f"{flag} {name:45s} {ratio:6.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the performance benchmarks and save the results.")
+    parser.add_argument("--sizes", nargs="*", type=int, default=DEFAULT_SIZES, help="Row counts for size-dependent benchmarks")
+    parser.add_argument("--only", nargs="*", choices=sorted(benchmarks), help="Run only these groups")
+    parser.add_argument("--output", help="Results file (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in args.only or benchmarks:
+            print(f"Running {name} benchmarks...")
+            benchmarks[name](results, args.sizes, workdir)
+
+    commit = current_commit()
+    output_path = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "commit": commit,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "sizes": args.sizes,
+            "results": results
+        }, f, indent=2)
+
+    for name, stats in results.items():
+        print(f"{name:45s} {stats['median_s'] * 1000:10.3f} ms")
+    print(f"✅ Results saved to {output_path}")
+
+    if args.compare:
+        compare(args.compare, results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
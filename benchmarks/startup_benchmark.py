@@ -0,0 +1,235 @@
+# benchmarks/startup_benchmark.py
+# Cold-start check for the Streamlit app. Every measurement runs in a fresh interpreter:
+#   startup.import        python -X importtime over everything app.py imports
+#   startup.first_render  AppTest runs app.py once (importing Streamlit included), offline
+# Each render run then carries on as a user would: it enters the ID of a student with
+# history (drawing the progress chart) and predicts (loading the model).
+# The check fails (exit code 1) if the first render imports a module that must stay lazy
+# (google.generativeai, xgboost, joblib, sklearn), loads the model, opens a network
+# connection, raises, or takes longer than its budget: --max-import-ms / --max-render-ms,
+# or the --baseline results times (1 + --tolerance). It also fails if the later runs
+# raise or show an error.
+#
+# Usage (from the repository root):
+#   python benchmarks/startup_benchmark.py
+#   python benchmarks/startup_benchmark.py --output benchmarks/results/startup-<commit>.json
+#   python benchmarks/startup_benchmark.py --baseline benchmarks/results/startup-<old>.json --tolerance 0.2
+
+import argparse
+import ast
+import csv
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(REPO_ROOT, "app.py")
+
+# Imported only once a prediction or a quiz actually needs them
+lazy_modules = ["google.generativeai", "xgboost", "joblib", "sklearn"]
+
+DEFAULT_MAX_IMPORT_MS = float(os.getenv("STARTUP_MAX_IMPORT_MS", "2500"))
+DEFAULT_MAX_RENDER_MS = float(os.getenv("STARTUP_MAX_RENDER_MS", "2500"))
+
+# Runs in the child interpreter; prints one JSON line
+RENDER_SCRIPT = """
+import json, socket, sys, time
+connections = []
+
+def refuse_connection(sock, address):
+    connections.append(str(address))
+    raise OSError("network access is disabled during the startup benchmark")
+
+socket.socket.connect = refuse_connection
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+at.secrets["GEMINI_API_KEY"] = "startup-benchmark"
+at.run()
+seconds = time.perf_counter() - started
+from model_registry import get_model_manager
+report = {"seconds": seconds, "exceptions": [str(e.value) for e in at.exception],
+          "lazy_modules_loaded": [name for name in sys.argv[3:] if name in sys.modules],
+          "model_loaded": get_model_manager().version is not None, "connections": list(connections)}
+
+report["second_run_errors"] = []
+next(field for field in at.text_input if field.label == "Enter Student ID").input(sys.argv[2])
+for step in range(2):
+    if step:
+        next(button for button in at.button if "Predict" in button.label).click()
+    at.run()
+    report["second_run_errors"] += [str(e.value) for e in at.exception] + [e.value for e in at.error]
+print(json.dumps(report))
+"""
+
+
+def app_imports(app_path=APP_PATH):
+    """Every module app.py imports, at any nesting level, in source order."""
+    with open(app_path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        else:
+            continue
+        modules.extend(name for name in names if name not in modules)
+    return modules
+
+
+def parse_importtime(stderr):
+    """Top-level modules of a -X importtime report as {name: cumulative seconds}."""
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith(" ") or name.startswith("  "):
+            continue  # Nested import, already counted in its parent
+        totals[name.strip()] = int(cumulative) / 1e6
+    return totals
+
+
+def sample_student_id(log_path):
+    """The first student in the prediction log, so the app has a progress chart to draw."""
+    if os.path.exists(log_path):
+        with open(log_path, encoding="utf-8") as f:
+            rows = csv.reader(f)
+            next(rows, None)
+            for row in rows:
+                if row and row[0]:
+                    return row[0]
+    return "startup-benchmark"
+
+
+def child_env(workdir):
+    env = dict(os.environ)
+    log_path = os.path.join(workdir, "prediction_log.csv")
+    if os.path.exists(os.path.join(REPO_ROOT, "prediction_log.csv")):
+        shutil.copy(os.path.join(REPO_ROOT, "prediction_log.csv"), log_path)
+    env.update({
+        "PYTHONPATH": REPO_ROOT, "PREDICTION_STORE": "csv", "PREDICTION_LOG_PATH": log_path,
+        "QUIZ_CACHE_PATH": ":memory:", "QUESTION_BANK_PATH": "off", "METRICS_SINKS": "",
+    })
+    return env
+
+
+def measure_imports(env, repeat):
+    """Median import time over `repeat` fresh interpreters, plus the heaviest modules of the last run."""
+    code = "; ".join(f"import {name}" for name in app_imports())
+    times = []
+    for _ in range(repeat):
+        completed = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=REPO_ROOT, env=env,
+                                   capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise RuntimeError(f"Importing the app's modules failed:\n{completed.stderr[-2000:]}")
+        modules = parse_importtime(completed.stderr)
+        times.append(sum(modules.values()))
+    heaviest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:8]
+    return {"median_s": statistics.median(times), "min_s": min(times), "runs": repeat}, heaviest
+
+
+def measure_first_render(env, repeat):
+    """Median first-render time over `repeat` fresh interpreters, plus the findings of the worst run."""
+    student_id = sample_student_id(env["PREDICTION_LOG_PATH"])
+    times = []
+    worst = None
+    for _ in range(repeat):
+        completed = subprocess.run([sys.executable, "-c", RENDER_SCRIPT, APP_PATH, student_id, *lazy_modules],
+                                   cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+        lines = [line for line in completed.stdout.splitlines() if line.startswith("{")]
+        if completed.returncode != 0 or not lines:
+            raise RuntimeError(f"Rendering the app failed:\n{completed.stderr[-2000:]}")
+        report = json.loads(lines[-1])
+        times.append(report["seconds"])
+        # Problems such as import deadlocks show up in some runs only, so keep any run that had one
+        if worst is None or render_problems(report) and not render_problems(worst):
+            worst = report
+    return {"median_s": statistics.median(times), "min_s": min(times), "runs": repeat}, worst
+
+
+def render_problems(render_report):
+    """What went wrong in one render run; empty if nothing did."""
+    problems = []
+    if render_report["exceptions"]:
+        problems.append(f"app.py raised during the first render: {render_report['exceptions']}")
+    if render_report["lazy_modules_loaded"]:
+        problems.append(f"first render imported {', '.join(render_report['lazy_modules_loaded'])}")
+    if render_report["model_loaded"]:
+        problems.append("first render loaded the model")
+    if render_report["connections"]:
+        problems.append(f"first render opened network connections: {render_report['connections']}")
+    if render_report["second_run_errors"]:
+        problems.append(f"entering a student ID or predicting failed: {render_report['second_run_errors']}")
+    return problems
+
+
+def find_regressions(results, render_report, max_import_ms, max_render_ms, baseline=None, tolerance=0.2):
+    """Human-readable reasons the startup check fails; empty if it passes."""
+    problems = render_problems(render_report)
+    budgets = {"startup.import": max_import_ms / 1000, "startup.first_render": max_render_ms / 1000}
+    for name, budget in budgets.items():
+        if results[name]["median_s"] > budget:
+            problems.append(f"{name} took {results[name]['median_s'] * 1000:.0f} ms (budget {budget * 1000:.0f} ms)")
+    for name, stats in (baseline or {}).items():
+        if name in results and results[name]["median_s"] > stats["median_s"] * (1 + tolerance):
+            problems.append(f"{name} took {results[name]['median_s'] * 1000:.0f} ms, more than "
+                            f"{tolerance:.0%} over the baseline {stats['median_s'] * 1000:.0f} ms")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the app's cold start and fail if it regressed.")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per measurement")
+    parser.add_argument("--max-import-ms", type=float, default=DEFAULT_MAX_IMPORT_MS)
+    parser.add_argument("--max-render-ms", type=float, default=DEFAULT_MAX_RENDER_MS)
+    parser.add_argument("--baseline", help="Earlier startup results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown against --baseline")
+    parser.add_argument("--output", help="Write the results to this file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        env = child_env(workdir)
+        try:
+            import_stats, heaviest = measure_imports(env, args.repeat)
+            render_stats, render_report = measure_first_render(env, args.repeat)
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            return 1
+    results = {"startup.import": import_stats, "startup.first_render": render_stats}
+
+    print(f"{'startup.import':45s} {import_stats['median_s'] * 1000:10.1f} ms")
+    for name, seconds in heaviest:
+        print(f"    {name:41s} {seconds * 1000:10.1f} ms")
+    print(f"{'startup.first_render':45s} {render_stats['median_s'] * 1000:10.1f} ms")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"created": datetime.now().isoformat(timespec="seconds"), "results": results}, f, indent=2)
+        print(f"✅ Results saved to {args.output}")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    problems = find_regressions(results, render_report, args.max_import_ms, args.max_render_ms,
+                                baseline, args.tolerance)
+    for problem in problems:
+        print(f"❌ {problem}")
+    if problems:
+        return 1
+    print("✅ Startup is within budget: no API call, no model load and no lazy module on the first render; "
+          "a student lookup and a prediction afterwards work")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
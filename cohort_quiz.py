@@ -0,0 +1,196 @@
+# cohort_quiz.py
+# One quiz per student for a Teacher Dashboard cohort, with one LLM request per distinct prompt.
+# A student's quiz prompt depends only on grade, subject, map_difficulty(score, category)
+# and the syllabus topics for that grade and subject, so many students share it. Students
+# are grouped by the prompt itself, each group is generated once through
+# QuizGenerationService (rate limits, retries and model fallback apply), and the quiz is
+# handed to every student in the group. With variants=N a group gets up to N different
+# quizzes that its students take in turn.
+#
+# Usage:
+#   python cohort_quiz.py                                   # latest prediction of every student
+#   python cohort_quiz.py --category Poor --subject Math --variants 2
+#   python cohort_quiz.py --fake                            # offline run against FakeLLMClient
+
+import argparse
+import sys
+import time
+
+from metrics import get_metrics
+from quiz_service import DEFAULT_MAX_WORKERS, QuizGenerationService, QuizJob
+from student_rules import map_difficulty
+
+DEFAULT_NUM_Q = 5
+
+
+def _is_missing(value):
+    # value != value catches NaN of any float type, including the float32 scores of the dashboard
+    return value is None or value != value
+
+
+class CohortGroup:
+    """Students who would all be sent the same quiz prompt."""
+
+    def __init__(self, grade, subject, difficulty, prompt):
+        self.grade = grade
+        self.subject = subject
+        self.difficulty = difficulty
+        self.prompt = prompt
+        self.student_ids = []
+        self.results = []  # QuizResult per variant
+
+
+class CohortQuizReport:
+    def __init__(self, groups, skipped, quizzes, llm_calls, failed, seconds):
+        self.groups = groups
+        self.skipped = skipped  # student_ids without grade, subject or prediction
+        self.quizzes = quizzes  # student_id -> assignment dict
+        self.llm_calls = llm_calls
+        self.failed = failed
+        self.seconds = seconds
+
+    @property
+    def students(self):
+        return len(self.quizzes)
+
+    @property
+    def requests(self):
+        return sum(len(group.results) for group in self.groups)
+
+    @property
+    def calls_saved(self):
+        """LLM calls avoided compared with one generate_quiz call per student."""
+        return self.students - self.llm_calls
+
+    @property
+    def llm_seconds(self):
+        """Time spent in LLM requests, summed over requests (they run concurrently)."""
+        return sum(result.latency_seconds for group in self.groups for result in group.results
+                   if not result.from_cache)
+
+    def assignment_rows(self):
+        """One row per student: student_id, grade, subject, difficulty, group, variant, quiz_text, error."""
+        return [{"student_id": student_id, **assignment} for student_id, assignment in self.quizzes.items()]
+
+
+def plan_cohort(students, num_q=DEFAULT_NUM_Q):
+    """Group students by the quiz prompt generate_quiz would send for them.
+
+    students are dicts (or dashboard rows) with student_id, grade, subject, predicted_score
+    and category. Returns (groups, skipped student_ids).
+    """
+    from helper_functions import build_quiz_prompt, get_topics_for
+
+    prompts = {}  # (grade, subject, difficulty) -> prompt
+    groups = {}  # prompt -> CohortGroup
+    skipped = []
+    for student in students:
+        grade, subject = student.get("grade"), student.get("subject")
+        score, category = student.get("predicted_score"), student.get("category")
+        if any(_is_missing(value) for value in (grade, subject, score, category)):
+            skipped.append(student.get("student_id"))
+            continue
+        grade, subject = str(grade), str(subject)
+        difficulty = map_difficulty(float(score), str(category))
+        context = (grade, subject, difficulty)
+        if context not in prompts:
+            prompts[context] = build_quiz_prompt(grade, subject, difficulty, num_q, get_topics_for(grade, subject))
+        prompt = prompts[context]
+        if prompt not in groups:
+            groups[prompt] = CohortGroup(grade, subject, difficulty, prompt)
+        groups[prompt].student_ids.append(student["student_id"])
+    return list(groups.values()), skipped
+
+
+def generate_cohort_quizzes(students, num_q=DEFAULT_NUM_Q, variants=1, service=None, use_cache=True,
+                            max_workers=DEFAULT_MAX_WORKERS):
+    """Generate quizzes for a cohort with one request per prompt group and variant.
+
+    The quiz cache is only consulted for single-variant runs; with variants > 1 every
+    variant is freshly generated so they differ. Pass a QuizGenerationService built on
+    a stub manager (llm_client.FakeLLMClient) to run without Gemini.
+    Returns a CohortQuizReport.
+    """
+    started = time.monotonic()
+    groups, skipped = plan_cohort(students, num_q)
+    jobs = [QuizJob(group.grade, group.subject, group.difficulty, num_q, job_id=(index, variant))
+            for index, group in enumerate(groups)
+            for variant in range(max(1, min(variants, len(group.student_ids))))]
+
+    owns_service = service is None
+    if owns_service:
+        service = QuizGenerationService(max_workers=max_workers, use_cache=use_cache and variants == 1)
+    try:
+        with get_metrics().span("quiz.cohort"):
+            results = service.generate_many(jobs)
+    finally:
+        if owns_service:
+            service.close()
+
+    for result in results:
+        groups[result.job.job_id[0]].results.append(result)
+
+    quizzes = {}
+    for index, group in enumerate(groups):
+        # Students whose variant failed take one of the group's successful variants instead
+        succeeded = [result for result in group.results if result.ok] or group.results
+        for position, student_id in enumerate(group.student_ids):
+            result = succeeded[position % len(succeeded)]
+            quizzes[student_id] = {"grade": group.grade, "subject": group.subject, "difficulty": group.difficulty,
+                                   "group": index, "variant": result.job.job_id[1],
+                                   "quiz_text": result.quiz_text, "error": result.error}
+
+    llm_calls = sum(not result.from_cache for result in results)
+    failed = sum(not result.ok for result in results)
+    report = CohortQuizReport(groups, skipped, quizzes, llm_calls, failed, time.monotonic() - started)
+    get_metrics().increment("quiz.cohort.calls_saved", report.calls_saved)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate one quiz per student for a dashboard cohort.")
+    parser.add_argument("--category", default="All", help="Only students in this performance category")
+    parser.add_argument("--profile", default="All", help="Only students with this learner profile")
+    parser.add_argument("--subject", default="All", help="Only students of this subject")
+    parser.add_argument("--num-q", type=int, default=DEFAULT_NUM_Q, help="Questions per quiz")
+    parser.add_argument("--variants", type=int, default=1, help="Different quizzes per prompt group")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_MAX_WORKERS, help="Parallel LLM requests")
+    parser.add_argument("--fake", action="store_true", help="Use the offline FakeLLMClient instead of Gemini")
+    args = parser.parse_args(argv)
+
+    import llm_client
+    from dashboard_view import get_dashboard_view
+    from helper_functions import api_key
+    from prediction_store import get_prediction_store
+
+    if args.fake:
+        manager = llm_client.set_llm_client(llm_client.FakeLLMClient())
+    else:
+        manager = llm_client.get_connection_manager(api_key_configured=bool(api_key))
+    is_working, message = manager.check_connection()
+    if not is_working:
+        print(f"❌ API not working: {message}")
+        return 1
+
+    cohort = get_dashboard_view(get_prediction_store()).filtered_frame(args.category, args.profile, args.subject)
+    if cohort.empty:
+        print("⚠️ No students match these filters")
+        return 1
+
+    with QuizGenerationService(manager, max_workers=args.concurrency, use_cache=args.variants == 1) as service:
+        report = generate_cohort_quizzes(cohort.to_dict("records"), args.num_q, args.variants, service)
+
+    for index, group in enumerate(report.groups):
+        failed = sum(not result.ok for result in group.results)
+        status = f"❌ {failed} failed" if failed else "✅"
+        print(f"{status} group {index}: {group.grade} / {group.subject} / {group.difficulty} - "
+              f"{len(group.student_ids)} students, {len(group.results)} variant(s)")
+    if report.skipped:
+        print(f"⚠️ Skipped {len(report.skipped)} students without grade, subject or prediction")
+    print(f"✅ {report.students} quizzes from {report.requests} requests ({report.llm_calls} LLM calls, "
+          f"{report.calls_saved} saved) in {report.seconds:.1f}s")
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
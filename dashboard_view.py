@@ -0,0 +1,173 @@
+# dashboard_view.py
+# Materialized "latest prediction per student" view for the Teacher Dashboard.
+# The view keeps a cursor into the prediction store and only reads rows written since
+# the last refresh. Summary statistics are kept as per-(category, profile, subject)
+# aggregates, so filtering and summarizing cost the same however long the history is.
+
+import threading
+from collections import Counter
+from datetime import datetime
+
+import pandas as pd
+
+from history_schema import TIMESTAMP_FORMAT, apply_history_schema
+
+dashboard_columns = ["student_id", "timestamp", "grade", "subject", "predicted_score", "category", "learner_profile"]
+
+
+def _parse_timestamp(value):
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(str(value), TIMESTAMP_FORMAT)
+    except ValueError:
+        parsed = pd.to_datetime(value, errors="coerce")
+        return None if pd.isna(parsed) else parsed.to_pydatetime()
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def _mode(counter):
+    """Most common label; ties go to the smallest label, like pandas Series.mode()[0]."""
+    counts = {label: count for label, count in counter.items() if count > 0}
+    if not counts:
+        return None
+    top_count = max(counts.values())
+    return min(label for label, count in counts.items() if count == top_count)
+
+
+class DashboardView:
+    """Latest row per student plus grouped aggregates, updated from the store incrementally."""
+
+    def __init__(self):
+        self.cursor = None
+        self.latest = {}  # student_id -> (timestamp, row)
+        self.groups = {}  # (category, profile, subject) -> [students, score_count, score_sum]
+        self.rows_seen = 0
+        self.version = 0
+        self._frame = None
+        self._frame_version = -1
+        self._lock = threading.Lock()
+
+    def reset(self):
+        self.cursor = None
+        self.latest.clear()
+        self.groups.clear()
+        self.rows_seen = 0
+        self.version += 1
+
+    def refresh(self, store):
+        """Apply rows written since the last refresh. Returns the number of new rows read."""
+        with self._lock:
+            rows, cursor, reset = store.rows_since(self.cursor)
+            if reset:
+                self.reset()
+            for row in rows:
+                self._apply_row(row)
+            self.cursor = cursor
+            self.rows_seen += len(rows)
+            if rows:
+                self.version += 1
+            return len(rows)
+
+    def _group_key(self, row):
+        return (row.get("category"), row.get("learner_profile"), row.get("subject"))
+
+    def _add_to_group(self, row, sign):
+        group = self.groups.setdefault(self._group_key(row), [0, 0, 0.0])
+        group[0] += sign
+        score = row.get("predicted_score")
+        if not _is_missing(score):
+            group[1] += sign
+            group[2] += sign * float(score)
+        if group[0] == 0:
+            del self.groups[self._group_key(row)]
+
+    def _apply_row(self, row):
+        timestamp = _parse_timestamp(row.get("timestamp"))
+        if timestamp is None:
+            return  # The dashboard ignores rows without a valid timestamp
+        student_id = row.get("student_id")
+        current = self.latest.get(student_id)
+        # Rows arrive in write order, so an equal timestamp means this row is newer
+        if current is not None and timestamp < current[0]:
+            return
+        if current is not None:
+            self._add_to_group(current[1], -1)
+        self.latest[student_id] = (timestamp, row)
+        self._add_to_group(row, +1)
+
+    def _matching_groups(self, category="All", profile="All", subject="All"):
+        for (group_category, group_profile, group_subject), group in self.groups.items():
+            if category != "All" and group_category != category:
+                continue
+            if profile != "All" and group_profile != profile:
+                continue
+            if subject != "All" and group_subject != subject:
+                continue
+            yield (group_category, group_profile, group_subject), group
+
+    def filter_options(self, column):
+        """Sorted distinct values of category, learner_profile or subject among latest rows."""
+        index = {"category": 0, "learner_profile": 1, "subject": 2}[column]
+        with self._lock:
+            return sorted({key[index] for key in self.groups if not _is_missing(key[index])})
+
+    def summary(self, category="All", profile="All", subject="All"):
+        """Total students, average score and most common category/profile for a filter."""
+        with self._lock:
+            total_students = score_count = 0
+            score_sum = 0.0
+            category_counts = Counter()
+            profile_counts = Counter()
+            for (group_category, group_profile, _), group in self._matching_groups(category, profile, subject):
+                total_students += group[0]
+                score_count += group[1]
+                score_sum += group[2]
+                if not _is_missing(group_category):
+                    category_counts[group_category] += group[0]
+                if not _is_missing(group_profile):
+                    profile_counts[group_profile] += group[0]
+        return {
+            "total_students": total_students,
+            "average_score": score_sum / score_count if score_count else None,
+            "top_category": _mode(category_counts),
+            "top_profile": _mode(profile_counts)
+        }
+
+    def latest_frame(self):
+        """Latest row per student as a DataFrame, newest first. Rebuilt only after changes."""
+        with self._lock:
+            if self._frame_version != self.version:
+                rows = [row for _, row in self.latest.values()]
+                frame = apply_history_schema(pd.DataFrame(rows, columns=dashboard_columns))[dashboard_columns]
+                self._frame = frame.sort_values("timestamp", ascending=False).reset_index(drop=True)
+                self._frame_version = self.version
+            return self._frame
+
+    def filtered_frame(self, category="All", profile="All", subject="All"):
+        frame = self.latest_frame()
+        if category != "All":
+            frame = frame[frame["category"] == category]
+        if profile != "All":
+            frame = frame[frame["learner_profile"] == profile]
+        if subject != "All":
+            frame = frame[frame["subject"] == subject]
+        return frame
+
+
+_dashboard_view = None
+_view_lock = threading.Lock()
+
+
+def get_dashboard_view(store):
+    """Return the process-wide view for store, refreshed with any rows written since last time."""
+    global _dashboard_view
+    with _view_lock:
+        if _dashboard_view is None or _dashboard_view[0] is not store:
+            _dashboard_view = (store, DashboardView())
+        view = _dashboard_view[1]
+    view.refresh(store)
+    return view
@@ -0,0 +1,463 @@
+# event_ingestion.py
+# Score students straight from raw per-action event logs (JSONL or CSV), as a stream.
+# Events are read one line at a time and folded into a small running aggregate per
+# student. When a student's window closes, the aggregate becomes the 15 model features,
+# and closed windows are scored in batches through the active model. Memory holds one
+# fixed-size aggregate per open window (at most max_open) plus one batch, so a whole
+# school day of telemetry is never loaded at once.
+#
+# Event fields (one JSON object per line, or CSV columns):
+#   student_id, timestamp    required; "YYYY-MM-DD HH:MM:SS" / ISO 8601, or epoch seconds
+#   action                   "start" (problem shown), "attempt" or "hint"; anything else
+#                            only counts as an action
+#   problem_id               a new id (or a "start" event) begins a new problem
+#   correct                  attempts: 1/0 or true/false
+#   bottom_hint              hints: 1/true for the bottom-out hint
+#   grade, subject           optional; the last value seen in the window is kept
+#   frustrated, confused, concentrating, bored   optional affect detector confidences (0-1)
+#
+# Features of a window:
+#   hint_count, bottom_hint, attempt_count   totals
+#   ms_first_response        mean ms from a problem's start to the first attempt or hint
+#   duration                 active seconds (gaps longer than idle_seconds are not counted)
+#   Average_confidence(...)  mean detector confidence (0 when the log has none)
+#   action_count             events / ACTION_COUNT_MAX, capped at 1 (the model's 0-1 range)
+#   hint_dependency          hints / (hints + attempts)
+#   response_speed           mean ms between consecutive active events
+#   confidence_balance       concentrating / sum of the four confidences (0.5 when none)
+#   engagement_ratio         active seconds / window span (1 for a single event)
+#   efficiency_indicator     problems solved on the first attempt, without hints / problems attempted
+#
+# A window closes after session_gap seconds without events (--window session, the default)
+# or when the calendar day ends (--window day); when max_open windows are open, the least
+# recently active one is closed early. Everything still open is closed at the end of the input.
+#
+# Usage:
+#   python event_ingestion.py events.jsonl scored.csv
+#   python event_ingestion.py school_day.csv scored.parquet --window day --batch-size 5000 --log
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from metrics import get_metrics
+from student_rules import features
+from vectorized_rules import apply_rules
+
+DEFAULT_SESSION_GAP = 30 * 60
+DEFAULT_IDLE_SECONDS = 120
+DEFAULT_MAX_OPEN = 100_000
+DEFAULT_BATCH_SIZE = 1000
+ACTION_COUNT_MAX = 200
+
+# Event field -> feature averaged from it
+affect_fields = {
+    "frustrated": "Average_confidence(FRUSTRATED)",
+    "confused": "Average_confidence(CONFUSED)",
+    "concentrating": "Average_confidence(CONCENTRATING)",
+    "bored": "Average_confidence(BORED)"
+}
+
+window_columns = ["student_id", "grade", "subject", "window_start", "window_end", "events"]
+score_columns = ["predicted_score", "category", "learner_profile", "combined_recommendation",
+                 "learning_material", "model_version"]
+
+
+def parse_timestamp(value):
+    """Epoch seconds from a number, a numeric string or an ISO 8601 / 'YYYY-MM-DD HH:MM:SS' string."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    text = str(value).strip()
+    try:
+        return float(text)
+    except ValueError:
+        return datetime.fromisoformat(text.replace("Z", "+00:00")).timestamp()
+
+
+def _format_timestamp(seconds):
+    return datetime.fromtimestamp(seconds).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _flag(value):
+    return str(value).strip().lower() in ("1", "1.0", "true", "yes")
+
+
+def read_events(path):
+    """Yield event dicts from a .csv or JSON-lines file, one line at a time.
+
+    Lines that are not valid JSON are yielded as empty dicts, which the tracker skips.
+    """
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield {}
+
+
+class StudentWindow:
+    """Running aggregates of one student's events in the current window (fixed size)."""
+
+    __slots__ = ("student_id", "grade", "subject", "start", "end", "events", "attempts", "hints",
+                 "bottom_hints", "problems", "first_try_correct", "first_response_ms", "first_responses",
+                 "active_seconds", "active_gaps", "affect_totals", "affect_counts", "problem_id",
+                 "problem_start", "problem_responded", "problem_attempted", "problem_hinted")
+
+    def __init__(self, student_id, timestamp):
+        self.student_id = student_id
+        self.grade = self.subject = None
+        self.start = self.end = timestamp
+        self.events = self.attempts = self.hints = self.bottom_hints = 0
+        self.problems = self.first_try_correct = self.first_responses = self.active_gaps = 0
+        self.first_response_ms = self.active_seconds = 0.0
+        self.affect_totals = [0.0] * len(affect_fields)
+        self.affect_counts = [0] * len(affect_fields)
+        self.problem_id = None
+        self.problem_start = None
+        self.problem_responded = self.problem_attempted = self.problem_hinted = False
+
+    def _begin_problem(self, problem_id, start):
+        self.problem_id = problem_id
+        self.problem_start = start
+        self.problem_responded = self.problem_attempted = self.problem_hinted = False
+
+    def add(self, event, timestamp, idle_seconds):
+        previous = self.end
+        if self.events:
+            gap = timestamp - previous
+            if 0 < gap <= idle_seconds:
+                self.active_seconds += gap
+                self.active_gaps += 1
+        self.events += 1
+        self.end = max(previous, timestamp)
+        if event.get("grade"):
+            self.grade = event["grade"]
+        if event.get("subject"):
+            self.subject = event["subject"]
+        for i, field in enumerate(affect_fields):
+            try:
+                value = float(event.get(field))
+            except (TypeError, ValueError):
+                continue  # Missing or unreadable
+            if value == value:
+                self.affect_totals[i] += value
+                self.affect_counts[i] += 1
+
+        action = event.get("action")
+        problem_id = event.get("problem_id")
+        if action == "start":
+            self._begin_problem(problem_id, timestamp)
+            return
+        if problem_id not in (None, "") and problem_id != self.problem_id:
+            # No start event: the problem began when the previous one ended
+            self._begin_problem(problem_id, previous if self.events > 1 else None)
+        if action not in ("attempt", "hint"):
+            return
+        if not self.problem_responded:
+            self.problem_responded = True
+            if self.problem_start is not None:
+                self.first_response_ms += (timestamp - self.problem_start) * 1000
+                self.first_responses += 1
+        if action == "hint":
+            self.hints += 1
+            self.problem_hinted = True
+            if _flag(event.get("bottom_hint")):
+                self.bottom_hints += 1
+        else:
+            self.attempts += 1
+            if not self.problem_attempted:
+                self.problem_attempted = True
+                self.problems += 1
+                if _flag(event.get("correct")) and not self.problem_hinted:
+                    self.first_try_correct += 1
+
+    def feature_values(self):
+        """The 15 model features, in student_rules.features order."""
+        affect = [total / count if count else 0.0 for total, count in zip(self.affect_totals, self.affect_counts)]
+        affect_sum = sum(affect)
+        span = self.end - self.start
+        values = {
+            "hint_count": float(self.hints),
+            "bottom_hint": float(self.bottom_hints),
+            "attempt_count": float(self.attempts),
+            "ms_first_response": self.first_response_ms / self.first_responses if self.first_responses else 0.0,
+            "duration": self.active_seconds,
+            **dict(zip(affect_fields.values(), affect)),
+            "action_count": min(self.events / ACTION_COUNT_MAX, 1.0),
+            "hint_dependency": self.hints / (self.hints + self.attempts) if self.hints + self.attempts else 0.0,
+            "response_speed": self.active_seconds * 1000 / self.active_gaps if self.active_gaps else 0.0,
+            "confidence_balance": affect[2] / affect_sum if affect_sum else 0.5,
+            "engagement_ratio": min(self.active_seconds / span, 1.0) if span > 0 else 1.0,
+            "efficiency_indicator": self.first_try_correct / self.problems if self.problems else 0.0
+        }
+        return {feature: values[feature] for feature in features}
+
+    def row(self):
+        return {"student_id": self.student_id, "grade": self.grade, "subject": self.subject,
+                "window_start": _format_timestamp(self.start), "window_end": _format_timestamp(self.end),
+                "events": self.events, **self.feature_values()}
+
+
+class WindowTracker:
+    """Open windows by student, least recently active first. process() returns the windows an event closed."""
+
+    def __init__(self, window="session", session_gap=DEFAULT_SESSION_GAP, idle_seconds=DEFAULT_IDLE_SECONDS,
+                 max_open=DEFAULT_MAX_OPEN):
+        if window not in ("session", "day"):
+            raise ValueError("window must be 'session' or 'day'")
+        self.window = window
+        self.session_gap = session_gap
+        self.idle_seconds = idle_seconds
+        self.max_open = max_open
+        self.open = OrderedDict()
+        self.watermark = float("-inf")  # Latest event time seen
+        self.events_read = 0
+        self.events_skipped = 0
+        self.windows_closed = 0
+        self.peak_open = 0
+
+    def _day(self, timestamp):
+        return datetime.fromtimestamp(timestamp).date()
+
+    def _closes_before(self, window, timestamp):
+        """True if an event at timestamp no longer belongs to window."""
+        if self.window == "day":
+            return self._day(timestamp) != self._day(window.start)
+        return timestamp - window.end > self.session_gap
+
+    def _close(self, student_id):
+        self.windows_closed += 1
+        return self.open.pop(student_id)
+
+    def process(self, event):
+        try:
+            student_id = event.get("student_id")
+            timestamp = parse_timestamp(event["timestamp"])
+        except (AttributeError, KeyError, TypeError, ValueError):
+            student_id = None
+        if student_id in (None, ""):
+            self.events_skipped += 1
+            return []
+
+        closed = []
+        window = self.open.get(student_id)
+        if window is not None and self._closes_before(window, timestamp):
+            closed.append(self._close(student_id))
+            window = None
+        if window is None:
+            if len(self.open) >= self.max_open:
+                closed.append(self._close(next(iter(self.open))))
+            window = self.open[student_id] = StudentWindow(student_id, timestamp)
+            self.peak_open = max(self.peak_open, len(self.open))
+        else:
+            self.open.move_to_end(student_id)
+        window.add(event, timestamp, self.idle_seconds)
+        self.events_read += 1
+
+        if timestamp > self.watermark:
+            self.watermark = timestamp
+            closed.extend(self._expire())
+        return closed
+
+    def _expire(self):
+        """Close windows that no event can join any more (for input in rough time order)."""
+        closed = []
+        while self.open:
+            student_id, window = next(iter(self.open.items()))
+            if not self._closes_before(window, self.watermark):
+                break
+            closed.append(self._close(student_id))
+        return closed
+
+    def close_all(self):
+        return [self._close(student_id) for student_id in list(self.open)]
+
+
+def closed_windows(events, tracker):
+    """Feature rows of windows as they close; whatever is still open closes at the end."""
+    for event in events:
+        for window in tracker.process(event):
+            yield window.row()
+    for window in tracker.close_all():
+        yield window.row()
+
+
+def batches(rows, batch_size):
+    iterator = iter(rows)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def score_windows(rows, models=None):
+    """Score a batch of window rows with the active model. Returns a DataFrame of windows, features and results."""
+    from model_registry import get_model_manager
+
+    models = models or get_model_manager()
+    loaded = models.current()
+    frame = pd.DataFrame(rows, columns=[*window_columns, *features])
+    with get_metrics().span("ingest.score"):
+        scores, _ = models.predict(frame[loaded.predictor.feature_names].to_numpy(dtype=np.float32), loaded)
+        rules = apply_rules(frame[features], scores)
+    frame["predicted_score"] = scores.astype(float)
+    for column in score_columns[1:-1]:
+        frame[column] = rules[column].to_numpy()
+    frame["model_version"] = loaded.version
+    return frame
+
+
+def history_rows(scored):
+    """Prediction-store rows for scored windows, timestamped at the window's end."""
+    return scored.rename(columns={"window_end": "timestamp"}).to_dict("records")
+
+
+class _OutputWriter:
+    """Appends scored batches to a .csv or .parquet file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.extension = os.path.splitext(path)[1].lower()
+        if self.extension not in (".csv", ".parquet"):
+            raise ValueError(f"Unsupported output format '{self.extension}'. Use .csv or .parquet")
+        self.rows_written = 0
+        self._parquet_writer = None
+
+    def write(self, frame):
+        if self.extension == ".csv":
+            frame.to_csv(self.path, mode="w" if self.rows_written == 0 else "a", header=self.rows_written == 0, index=False)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self._parquet_writer.write_table(table)
+        self.rows_written += len(frame)
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+
+def ingest_events(events, output_path=None, tracker=None, batch_size=DEFAULT_BATCH_SIZE, models=None, store=None):
+    """Stream events into scored windows, written to output_path and/or logged to store.
+
+    Returns a stats dict: events_read, events_skipped, windows, batches, peak_open_windows, seconds.
+    """
+    tracker = tracker or WindowTracker()
+    writer = _OutputWriter(output_path) if output_path else None
+    metrics = get_metrics()
+    started = time.perf_counter()
+    windows = batch_count = 0
+    try:
+        for batch in batches(closed_windows(events, tracker), batch_size):
+            scored = score_windows(batch, models)
+            if writer is not None:
+                writer.write(scored)
+            if store is not None:
+                for row in history_rows(scored):
+                    store.append(row)
+            windows += len(scored)
+            batch_count += 1
+            metrics.increment("ingest.windows", len(scored))
+    finally:
+        if writer is not None:
+            writer.close()
+    metrics.increment("ingest.events", tracker.events_read)
+    return {"events_read": tracker.events_read, "events_skipped": tracker.events_skipped, "windows": windows,
+            "batches": batch_count, "peak_open_windows": tracker.peak_open, "seconds": time.perf_counter() - started}
+
+
+def sample_events(n_students=1000, events_per_student=200, seed=0, day="2025-06-02", group_size=500):
+    """Synthetic, time-ordered event stream for a school day (for demos and benchmarks).
+
+    Students work in groups, one class period after another, so only one group's events
+    are generated at a time.
+    """
+    from student_rules import grade_options, subject_options
+
+    rng = np.random.default_rng(seed)
+    day_start = datetime.fromisoformat(f"{day} 08:00:00").timestamp()
+    for group_start in range(0, n_students, group_size):
+        period_start = day_start + (group_start // group_size) * 3600
+        group = []
+        for n in range(group_start, min(group_start + group_size, n_students)):
+            student_id = f"S{n:05d}"
+            grade, subject = rng.choice(grade_options), rng.choice(subject_options)
+            skill = rng.random()
+            timestamp = period_start + rng.integers(0, 300)
+            problem = 0
+            for i in range(events_per_student):
+                timestamp += float(rng.exponential(10)) + 1
+                if i == 0 or rng.random() < 0.2:
+                    problem += 1
+                    action = "start"
+                else:
+                    action = "hint" if rng.random() > skill else "attempt"
+                group.append({
+                    "student_id": student_id, "timestamp": _format_timestamp(timestamp), "grade": grade,
+                    "subject": subject, "action": action, "problem_id": f"P{problem}",
+                    "correct": int(rng.random() < skill) if action == "attempt" else None,
+                    "bottom_hint": int(rng.random() < 0.2) if action == "hint" else None,
+                    "concentrating": round(float(rng.random() * skill), 3),
+                    "frustrated": round(float(rng.random() * (1 - skill)), 3),
+                    "confused": round(float(rng.random() * 0.5), 3),
+                    "bored": round(float(rng.random() * 0.3), 3)
+                })
+        group.sort(key=lambda event: event["timestamp"])
+        yield from group
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute features from raw event logs and score them as windows close.")
+    parser.add_argument("input", help="Event log (.jsonl or .csv)")
+    parser.add_argument("output", nargs="?", help="Scored windows (.csv or .parquet)")
+    parser.add_argument("--window", choices=["session", "day"], default="session", help="When a student's window closes")
+    parser.add_argument("--session-gap", type=float, default=DEFAULT_SESSION_GAP / 60, help="Minutes of inactivity that end a session")
+    parser.add_argument("--idle-seconds", type=float, default=DEFAULT_IDLE_SECONDS, help="Longer gaps do not count as active time")
+    parser.add_argument("--max-open", type=int, default=DEFAULT_MAX_OPEN, help="Open windows kept in memory")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Windows per predict call")
+    parser.add_argument("--log", action="store_true", help="Also log each scored window to the prediction store")
+    args = parser.parse_args(argv)
+
+    if not args.output and not args.log:
+        parser.error("give an output file, --log, or both")
+    store = None
+    if args.log:
+        from prediction_store import get_prediction_store
+
+        store = get_prediction_store()
+    tracker = WindowTracker(args.window, args.session_gap * 60, args.idle_seconds, args.max_open)
+    try:
+        stats = ingest_events(read_events(args.input), args.output, tracker, args.batch_size, store=store)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+    finally:
+        if store is not None and hasattr(store, "flush"):
+            store.flush()
+
+    print(f"✅ {stats['events_read']} events → {stats['windows']} scored windows in {stats['seconds']:.1f}s "
+          f"({stats['events_skipped']} events skipped, at most {stats['peak_open_windows']} windows open)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
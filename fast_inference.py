@@ -0,0 +1,88 @@
+# fast_inference.py
+# Low-overhead inference for the XGBRegressor in student_model.pkl.
+# The booster is pulled out of the sklearn wrapper once, and rows are passed to
+# Booster.inplace_predict as a float32 NumPy array in model.feature_names_in_ order,
+# so a single prediction never builds a DataFrame.
+#
+# Check that it matches the sklearn path with:
+#   python fast_inference.py
+
+import sys
+import time
+
+import numpy as np
+
+from batch_scoring import DEFAULT_MODEL_PATH, get_model_features, load_model
+
+
+class FastPredictor:
+    """Wraps the model's booster for direct float32 array prediction."""
+
+    def __init__(self, model):
+        self.model = model
+        self.booster = model.get_booster()
+        self.feature_names = get_model_features(model)
+        self._feature_index = {name: i for i, name in enumerate(self.feature_names)}
+        # Match XGBRegressor.predict: use the best iteration when early stopping was used
+        try:
+            self.iteration_range = (0, model.best_iteration + 1)
+        except AttributeError:
+            self.iteration_range = (0, 0)
+
+    @classmethod
+    def from_path(cls, model_path=DEFAULT_MODEL_PATH):
+        return cls(load_model(model_path))
+
+    def prepare_row(self, user_data):
+        """Build a (1, n_features) float32 array from a feature dict. Returns (row, missing features)."""
+        row = np.zeros((1, len(self.feature_names)), dtype=np.float32)
+        missing_features = []
+        for feature, i in self._feature_index.items():
+            if feature in user_data:
+                row[0, i] = user_data[feature]
+            else:
+                missing_features.append(feature)
+        return row, missing_features
+
+    def predict(self, rows):
+        """Predict a 2-D float32 array whose columns are in feature_names order."""
+        rows = np.ascontiguousarray(rows, dtype=np.float32)
+        return self.booster.inplace_predict(rows, iteration_range=self.iteration_range)
+
+    def predict_one(self, user_data):
+        """Predict one student from a feature dict (missing features count as 0.0)."""
+        row, _ = self.prepare_row(user_data)
+        return self.predict(row)[0]
+
+
+def verify_against_model(predictor, n_rows=5000, seed=0, tolerance=1e-5):
+    """Compare FastPredictor with model.predict(DataFrame). Returns (ok, max_abs_diff)."""
+    from vectorized_rules import sample_features
+
+    sample = sample_features(n_rows, np.random.default_rng(seed))[predictor.feature_names]
+    expected = predictor.model.predict(sample.astype("float32"))
+    actual = predictor.predict(sample.to_numpy(dtype=np.float32))
+    single = np.array([predictor.predict_one(row) for row in sample.head(100).to_dict("records")])
+    max_diff = max(float(np.max(np.abs(expected - actual))), float(np.max(np.abs(expected[:100] - single))))
+    return max_diff <= tolerance, max_diff
+
+
+def _time_per_call(fn, repeat=200):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+if __name__ == "__main__":
+    import pandas as pd
+
+    predictor = FastPredictor.from_path()
+    ok, max_diff = verify_against_model(predictor)
+    print(("✅" if ok else "❌") + f" Max difference vs model.predict: {max_diff:.2e}")
+
+    user_data = {feature: 0.5 for feature in predictor.feature_names}
+    dataframe_us = _time_per_call(lambda: predictor.model.predict(pd.DataFrame([user_data], columns=predictor.feature_names)))
+    fast_us = _time_per_call(lambda: predictor.predict_one(user_data))
+    print(f"Single row: DataFrame + predict {dataframe_us:.0f} µs, FastPredictor {fast_us:.0f} µs")
+    sys.exit(0 if ok else 1)
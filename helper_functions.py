@@ -1,26 +1,30 @@
 # helper_functions.py
 
-import google.generativeai as genai
-import pandas as pd
 import os
 import streamlit as st
 
-# Configure the API key
+from llm_client import get_connection_manager, set_api_key
+from metrics import get_metrics
+from quiz_cache import get_quiz_cache, make_cache_key
+from question_bank import get_question_bank
+from question_bank_warmup import get_bank_refiller
+from quiz_schema import render_quiz_markdown
+from syllabus_index import get_syllabus_index
+
+# Configure the API key (google.generativeai itself is imported and configured with it
+# on the first model call, see llm_client)
 try:
     # First, try to get from Streamlit secrets (for deployed apps)
     if hasattr(st, 'secrets') and 'GEMINI_API_KEY' in st.secrets:
         api_key = st.secrets['GEMINI_API_KEY']
-        genai.configure(api_key=api_key)
         print("✅ API configured from Streamlit secrets")
     # Then try environment variable (consistent naming)
     elif os.getenv('GEMINI_API_KEY'):
         api_key = os.getenv('GEMINI_API_KEY')
-        genai.configure(api_key=api_key)
         print("✅ API configured from environment variable")
     # Fallback to GOOGLE_API_KEY if that's what you prefer
     elif os.getenv('GOOGLE_API_KEY'):
         api_key = os.getenv('GOOGLE_API_KEY')
-        genai.configure(api_key=api_key)
         print("✅ API configured from GOOGLE_API_KEY environment variable")
     else:
         print("❌ Warning: No API key found. Set GEMINI_API_KEY environment variable or Streamlit secret.")
@@ -28,169 +32,41 @@ try:
 except Exception as e:
     print(f"❌ Error configuring Google AI: {e}")
     api_key = None
+set_api_key(api_key)
 
 
 # Test function to verify API is working
-def test_api_connection():
-    """Test if the API is properly configured and working"""
+def test_api_connection(force=False):
+    """Test if the API is properly configured and working (cached, see llm_client)"""
     try:
-        if not api_key:
-            return False, "No API key configured"
-        
-        # Try different model names that are available in v1beta
-        model_names = [
-            "gemini-1.5-flash",
-            "gemini-1.5-pro", 
-            "gemini-2.0-flash-exp",
-            "models/gemini-1.5-flash",
-            "models/gemini-1.5-pro"
-        ]
-        
-        for model_name in model_names:
-            try:
-                model = genai.GenerativeModel(model_name)
-                response = model.generate_content("Say 'API test successful' if you can read this.")
-                
-                if response and response.text:
-                    return True, f"API connection successful using {model_name}"
-            except Exception as e:
-                continue  # Try next model
-        
-        return False, "No working model found. All models failed."
-            
+        with get_metrics().span("llm.check_connection"):
+            return get_connection_manager(api_key_configured=bool(api_key)).check_connection(force=force)
     except Exception as e:
         return False, f"API test failed: {str(e)}"
 
 
-# Your existing helper functions...
-
-def categorize_student_performance(correctness_score):
-    if correctness_score < 0.3:
-        return (0, "Poor", "Needs immediate intervention and support", "🆘")
-    elif correctness_score < 0.45:
-        return (1, "Weak", "Requires additional practice and guidance", "⚠️")
-    elif correctness_score < 0.6:
-        return (2, "Below Average", "Shows potential but needs improvement", "📈")
-    elif correctness_score < 0.75:
-        return (3, "Average", "Solid understanding with room to grow", "✅")
-    elif correctness_score < 0.9:
-        return (4, "Strong", "Excellent performance and comprehension", "🌟")
-    else:
-        return (5, "Outstanding", "Exceptional mastery of the material", "🏆")
-
-def recommend_learning_material(category_number):
-    recommendations = {
-        0: "🔹 Basics tutorial video + guided beginner-level exercises.",
-        1: "🔸 Visual explanation content + step-by-step practice problems.",
-        2: "🔹 Practice exercises with hints enabled + instant feedback.",
-        3: "✅ Standard module content + end-of-lesson quiz.",
-        4: "🌟 Advanced challenge problems + peer group discussion tasks.",
-        5: "🏆 Project-based learning module + opportunity to mentor peers."
-    }
-    return recommendations.get(category_number, "📘 Keep learning and practicing regularly.")
-
-def generate_feedback_message(category_number):
-    feedback = {
-        0: "It's okay to struggle — the key is to keep going. Let's review the basics together.",
-        1: "You're making progress. Focus on the foundation, and don't hesitate to seek help.",
-        2: "You've got potential. A little more consistent effort will go a long way!",
-        3: "Nice work! You're on track — just refine your skills step by step.",
-        4: "Great job! You've developed a solid understanding. Keep challenging yourself.",
-        5: "Outstanding! You've truly mastered the topic. Consider exploring advanced material or helping peers."
-    }
-    return feedback.get(category_number, "Keep pushing forward — every step counts!")
-
-def generate_learner_profile(features):
-    duration = features['duration']
-    attempt_count = features['attempt_count']
-    concentrating = features['Average_confidence(CONCENTRATING)']
-    frustrated = features['Average_confidence(FRUSTRATED)']
-    confused = features['Average_confidence(CONFUSED)']
-    bottom_hint = features['bottom_hint']
-    confidence_balance = features['confidence_balance']
-    efficiency = features['efficiency_indicator']
-    hint_count = features['hint_count']
-    hint_dependency = features['hint_dependency']
-    
-    if (duration < 1800 and attempt_count < 3 and concentrating < 0.5 and frustrated > 0.3):
-        return "Fast but Careless 🐇"
-    
-    if (duration > 1800 and hint_count < 5 and concentrating > 0.6 and efficiency > 0.6):
-        return "Slow and Careful 🐢"
-    
-    if (hint_count > 6 and confused > 0.3 and bottom_hint > 5 and confidence_balance < 0.4):
-        return "Confused Learner 🤔"
-    
-    if (concentrating > 0.6 and confidence_balance > 0.6 and hint_dependency < 0.3 and efficiency > 0.6):
-        return "Focused Performer 🎯"
-    
-    return "General Learner"
-
-def generate_combined_recommendation(category, learner_profile):
-    if category == "Poor":
-        if "Confused Learner" in learner_profile:
-            return "🔁 Start with a short concept video, then move to guided practice with step-by-step hints."
-        elif "Slow and Careful" in learner_profile:
-            return "🧩 Try scaffolded exercises with feedback after each step to build confidence."
-        else:
-            return "📘 Begin with foundational videos and low-difficulty exercises."
-
-    elif category == "Weak":
-        if "Confused Learner" in learner_profile:
-            return "🎥 Rewatch key concepts and then try practice problems with hints enabled."
-        elif "Fast but Careless" in learner_profile:
-            return "⏳ Try slower-paced problems with explanations after each question."
-        else:
-            return "📝 Use interactive lessons followed by short quizzes with explanations."
-
-    elif category == "Below Average":
-        if "Fast but Careless" in learner_profile:
-            return "💡 Focus on accuracy. Try untimed quizzes with instant feedback."
-        elif "Focused Performer" in learner_profile:
-            return "📚 Review summaries, then solve medium-difficulty problems."
-        else:
-            return "🛠 Practice mid-level problems with hints disabled, and reflect after each one."
+def cached_api_status():
+    """(is_working, message) of the last API test while it is fresh, or None if it needs a new test."""
+    return get_connection_manager(api_key_configured=bool(api_key)).cached_status()
 
-    elif category == "Average":
-        if "Focused Performer" in learner_profile:
-            return "🎯 Challenge yourself with tougher problems or skip ahead modules."
-        elif "Slow and Careful" in learner_profile:
-            return "📖 Review notes, then solve a mixed-difficulty quiz to reinforce learning."
-        else:
-            return "🚀 Stay on track with standard lessons and end-of-module quizzes."
 
-    elif category == "Strong":
-        return "🏆 Try optional challenge activities, explore related topics, or help peers."
-
-    elif category == "Outstanding":
-        return "🌟 You're doing amazing! Dive into advanced modules or explore new areas beyond the curriculum."
-
-    return "📚 Keep practicing and exploring. Consistency is key!"
-
-def map_difficulty(pred_score, category):
-    if category in ["Below Average", "Poor", "Weak"] or pred_score < 0.5:
-        return "easy"
-    elif pred_score < 0.8:
-        return "medium"
-    else:
-        return "hard"
+# Rule-based helpers live in student_rules so they can be used without Streamlit or Gemini
+from student_rules import (
+    categorize_student_performance,
+    recommend_learning_material,
+    generate_feedback_message,
+    generate_learner_profile,
+    generate_combined_recommendation,
+    map_difficulty
+)
 
-def load_syllabus_data():
-    syllabus_df = {}
-    try:
-        if os.path.exists("School_Syllabus_Classes1-12.xlsx"):
-            syllabus_df = {
-                "Class 10": pd.read_excel("School_Syllabus_Classes1-12.xlsx", sheet_name="Class 10 (Core Subjects)"),
-                "Class 11": pd.read_excel("School_Syllabus_Classes1-12.xlsx", sheet_name="Class 11 (Core)"),
-                "Class 12": pd.read_excel("School_Syllabus_Classes1-12.xlsx", sheet_name="Class 12 (Core)")
-            }
-        else:
-            print("Warning: School_Syllabus_Classes1-12.xlsx not found. Using fallback topics.")
-    except Exception as e:
-        print(f"Error loading syllabus: {e}")
-    return syllabus_df
+def syllabus_version():
+    """Identify the syllabus topics so caches built from them can be invalidated.
 
-syllabus_df = load_syllabus_data()
+    It is a hash of the parsed topics, so touching or checking out the workbook again
+    does not change it.
+    """
+    return get_syllabus_index().version()
 
 def get_topics_for(grade, subject):
     if isinstance(grade, str) and "Grade" in grade:
@@ -201,14 +77,11 @@ def get_topics_for(grade, subject):
     else:
         grade_num = grade
     
-    if grade_num >= 10 and syllabus_df:
-        try:
-            df = syllabus_df[f"Class {grade_num}"]
-            row = df[df["Subject"].str.contains(subject, case=False)]
-            if not row.empty:
-                return row.iloc[0]["Topics"]
-        except Exception as e:
-            print(f"Error accessing syllabus for Grade {grade_num} {subject}: {e}")
+    if isinstance(grade_num, int) and grade_num >= 10:
+        # O(1) after the first lookup; the workbook is parsed lazily and cached on disk
+        topics = get_syllabus_index().topics_for(grade_num, subject)
+        if topics is not None:
+            return topics
     
     fallback_topics = {
         "Math": f"Basic arithmetic, patterns, geometry fundamentals, number operations for Grade {grade_num}",
@@ -218,17 +91,19 @@ def get_topics_for(grade, subject):
     }
     return fallback_topics.get(subject, f"Fundamental concepts of {subject} in {grade}")
 
-def generate_quiz(grade, subject, difficulty, num_q=5):
-    """Generate a multiple-choice quiz using the LLM with proper error handling."""
-    try:
-        # Check if API is configured by testing it
-        is_working, message = test_api_connection()
-        if not is_working:
-            return f"❌ Error: API not working properly. {message}"
-        
+# Models tried for quiz generation, in order
+quiz_model_names = [
+    "gemini-1.5-flash",
+    "gemini-1.5-pro",
+    "gemini-2.0-flash-exp"
+]
+
+def build_quiz_prompt(grade, subject, difficulty, num_q=5, topics=None):
+    """Build the quiz prompt; it depends only on these inputs and the syllabus topics."""
+    if topics is None:
         topics = get_topics_for(grade, subject)
-        
-        prompt = f"""
+    
+    return f"""
 You are an experienced teacher creating a {difficulty} level multiple-choice quiz for {grade} {subject}. 
 
 Based on these curriculum topics: {topics}
@@ -251,26 +126,140 @@ D) Option D
 
 Please generate the complete quiz now:
 """
+
+def _get_bank():
+    """The question bank, emptied first if it was filled from another syllabus (None if off)."""
+    question_bank = get_question_bank()
+    if question_bank is not None:
+        question_bank.ensure_syllabus_version(syllabus_version())
+    return question_bank
+
+def _bank_quiz(question_bank, grade, subject, difficulty, num_q):
+    """Assemble a complete quiz from the question bank, or return None if it is short."""
+    if question_bank is None or question_bank.count(grade, subject, difficulty) < num_q:
+        return None
+    return render_quiz_markdown(question_bank.take(grade, subject, difficulty, num_q))
+
+def _refill_bank_later(grade, subject, difficulty):
+    """Let the background refiller top this context up if serving it left the bank low."""
+    refiller = get_bank_refiller()
+    if refiller is not None:
+        refiller.request(grade, subject, difficulty)
+
+def generate_quiz(grade, subject, difficulty, num_q=5, use_cache=True):
+    """Generate a multiple-choice quiz using the LLM with proper error handling.
+    
+    With use_cache, a quiz is served from the quiz cache (whole quizzes for these exact
+    topics) first, then assembled from the question bank, and only the questions the bank
+    is missing are generated. Serving a context also asks the background refiller to top
+    its questions up (see question_bank_warmup). Without use_cache neither store is read
+    or written.
+    """
+    try:
+        topics = get_topics_for(grade, subject)
+        
+        # Serve a cached variant for this grade/subject/difficulty if we have one
+        quiz_cache = get_quiz_cache() if use_cache else None
+        if quiz_cache is not None:
+            quiz_cache.ensure_syllabus_version(syllabus_version())
+            cache_key = make_cache_key(grade, subject, difficulty, num_q, topics)
+            cached_quiz = quiz_cache.get(cache_key)
+            if cached_quiz:
+                get_metrics().increment("quiz.served", source="cache")
+                _refill_bank_later(grade, subject, difficulty)
+                return cached_quiz
+        
+        # Otherwise a fresh combination of stored questions, without calling the LLM
+        question_bank = _get_bank() if use_cache else None
+        bank_quiz = _bank_quiz(question_bank, grade, subject, difficulty, num_q)
+        if bank_quiz:
+            get_metrics().increment("quiz.served", source="bank")
+            _refill_bank_later(grade, subject, difficulty)
+            return bank_quiz
         
-        # Try different available models
-        model_names = [
-            "gemini-1.5-flash",
-            "gemini-1.5-pro",
-            "gemini-2.0-flash-exp"
-        ]
+        # Check if API is configured (uses the cached probe result)
+        is_working, message = test_api_connection()
+        if not is_working:
+            return f"❌ Error: API not working properly. {message}"
         
-        for model_name in model_names:
-            try:
-                model = genai.GenerativeModel(model_name)  
-                response = model.generate_content(prompt)
-                
-                if response and response.text:
-                    return response.text
-                    
-            except Exception as model_error:
-                continue  # Try next model
+        manager = get_connection_manager(api_key_configured=bool(api_key))
+        if question_bank is not None and question_bank.count(grade, subject, difficulty) > 0:
+            # Top up the stored questions with just the missing ones
+            def generate_missing(missing):
+                prompt = build_quiz_prompt(grade, subject, difficulty, missing, topics)
+                return manager.generate_content(prompt, quiz_model_names)[0]
+            
+            questions = question_bank.assemble_quiz(grade, subject, difficulty, num_q, generate_missing)
+            if len(questions) == num_q:
+                get_metrics().increment("quiz.served", source="bank_topup")
+                _refill_bank_later(grade, subject, difficulty)
+                return render_quiz_markdown(questions)
+        
+        prompt = build_quiz_prompt(grade, subject, difficulty, num_q, topics)
+        
+        # Try different available models, starting with the last one that worked
+        quiz_text, _ = manager.generate_content(prompt, quiz_model_names)
+        if quiz_text:
+            if question_bank is not None:
+                question_bank.add_quiz_text(grade, subject, difficulty, quiz_text)
+            if quiz_cache is not None:
+                quiz_cache.put(cache_key, quiz_text)
+            get_metrics().increment("quiz.served", source="llm")
+            if use_cache:
+                _refill_bank_later(grade, subject, difficulty)
+            return quiz_text
         
         return "❌ Error: All available models failed to generate response."
             
     except Exception as e:
-        return f"❌ Error generating quiz: {str(e)}\n\nPlease check:\n1. Your API key is set correctly\n2. You have internet connection\n3. The API key has proper permissions"
\ No newline at end of file
+        return f"❌ Error generating quiz: {str(e)}\n\nPlease check:\n1. Your API key is set correctly\n2. You have internet connection\n3. The API key has proper permissions"
+
+def generate_quiz_stream(grade, subject, difficulty, num_q=5, use_cache=True):
+    """Like generate_quiz, but yields the quiz text in chunks as the model produces them."""
+    chunks = []
+    try:
+        topics = get_topics_for(grade, subject)
+        
+        # Cached and bank quizzes are already complete, so they go out in one chunk
+        quiz_cache = get_quiz_cache() if use_cache else None
+        if quiz_cache is not None:
+            quiz_cache.ensure_syllabus_version(syllabus_version())
+            cache_key = make_cache_key(grade, subject, difficulty, num_q, topics)
+            cached_quiz = quiz_cache.get(cache_key)
+            if cached_quiz:
+                get_metrics().increment("quiz.served", source="cache")
+                _refill_bank_later(grade, subject, difficulty)
+                yield cached_quiz
+                return
+        
+        question_bank = _get_bank() if use_cache else None
+        bank_quiz = _bank_quiz(question_bank, grade, subject, difficulty, num_q)
+        if bank_quiz:
+            get_metrics().increment("quiz.served", source="bank")
+            _refill_bank_later(grade, subject, difficulty)
+            yield bank_quiz
+            return
+        
+        is_working, message = test_api_connection()
+        if not is_working:
+            yield f"❌ Error: API not working properly. {message}"
+            return
+        
+        prompt = build_quiz_prompt(grade, subject, difficulty, num_q, topics)
+        manager = get_connection_manager(api_key_configured=bool(api_key))
+        
+        for chunk in manager.stream_content(prompt, quiz_model_names):
+            chunks.append(chunk)
+            yield chunk
+        
+        if question_bank is not None:
+            question_bank.add_quiz_text(grade, subject, difficulty, "".join(chunks))
+        if quiz_cache is not None:
+            quiz_cache.put(cache_key, "".join(chunks))
+        get_metrics().increment("quiz.served", source="llm")
+        if use_cache:
+            _refill_bank_later(grade, subject, difficulty)
+            
+    except Exception as e:
+        # If part of the quiz was already shown, put the error below it
+        yield ("\n\n" if chunks else "") + f"❌ Error generating quiz: {str(e)}"
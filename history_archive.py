@@ -0,0 +1,326 @@
+# history_archive.py
+# Read-optimized Parquet archive of the prediction history.
+#
+# Compaction copies rows from the live prediction store into Hive-style partitions:
+#   history_archive/date=2025-06/part-....parquet              (monthly, the default)
+#   history_archive/date=2025-06-01/part-....parquet           (--granularity day)
+#   history_archive/date=2025-06/subject=Math/part-....parquet (--by-subject)
+# Each partition is one file sorted by student_id and timestamp and written in small row
+# groups, so the min/max statistics let a per-student query skip most of every file, and
+# a date-range query only opens the partitions in range. Queries read only the columns
+# they need.
+#
+# _manifest.json lists the committed part files and the live-store cursor they cover.
+# New parts are written under temporary names and only renamed into place after the
+# manifest naming them has been saved, so readers never see a half-written compaction and
+# an interrupted one is completed on the next run.
+#
+# Once the archive exists, get_prediction_store() serves the Progress and Dashboard
+# sections from it plus the rows logged since the last compaction. The live store keeps
+# every row, so deleting the archive directory simply switches back to it.
+#
+# Usage:
+#   python history_archive.py compact [--root history_archive] [--by-subject] [--granularity day]
+#   python history_archive.py query --student S001 [--start 2025-06-01] [--end 2025-06-30]
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from urllib.parse import quote
+
+import pandas as pd
+
+from history_schema import (arrow_to_rows, concat_history, conform_arrow, history_arrow_schema, history_columns,
+                            history_frame, rows_to_arrow)
+from metrics import get_metrics
+from prediction_store import normalize_row
+
+DEFAULT_ARCHIVE_PATH = "history_archive"
+MANIFEST_NAME = "_manifest.json"
+ROW_GROUP_SIZE = 1000
+UNKNOWN_DATE = "unknown"
+DEFAULT_GRANULARITY = "month"
+
+
+def _row_period(row, length):
+    """'YYYY-MM' (length 7) or 'YYYY-MM-DD' (length 10) of the row's timestamp."""
+    timestamp = row.get("timestamp")
+    return timestamp[:length] if isinstance(timestamp, str) and len(timestamp) >= 10 else UNKNOWN_DATE
+
+
+def _cursor_to_json(cursor):
+    return list(cursor) if isinstance(cursor, tuple) else cursor
+
+
+def _cursor_from_json(value):
+    return tuple(value) if isinstance(value, list) else value
+
+
+class HistoryArchive:
+    """Date-partitioned Parquet copy of the prediction history with pushdown queries."""
+
+    def __init__(self, root=DEFAULT_ARCHIVE_PATH):
+        self.root = root
+        self._lock = threading.Lock()
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.root, MANIFEST_NAME)
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {"version": 0, "cursor": None, "parts": []}
+        manifest["cursor"] = _cursor_from_json(manifest.get("cursor"))
+        return manifest
+
+    def _save_manifest(self, manifest):
+        os.makedirs(self.root, exist_ok=True)
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({**manifest, "cursor": _cursor_to_json(manifest["cursor"])}, f, indent=1)
+        os.replace(temp_path, self.manifest_path)
+
+    def _finish_pending(self, manifest):
+        """Rename parts whose manifest entry was saved before a crash interrupted the renames."""
+        for part in manifest["parts"]:
+            path = os.path.join(self.root, part["path"])
+            if not os.path.exists(path) and os.path.exists(f"{path}.tmp"):
+                os.replace(f"{path}.tmp", path)
+
+    def exists(self):
+        return os.path.exists(self.manifest_path)
+
+    def version(self):
+        return self.load_manifest()["version"]
+
+    def compact(self, store, by_subject=False, granularity=DEFAULT_GRANULARITY):
+        """Merge rows written to store since the last compaction into the partitions.
+
+        Each touched partition is rewritten as a single sorted file, so partitions never
+        accumulate small files. Files replaced by this run are deleted on the next run,
+        which leaves readers holding the previous manifest time to finish.
+        by_subject and granularity ('month' or 'day') only apply to a new archive.
+        Returns the number of rows archived.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        with self._lock, get_metrics().span("archive.compact"):
+            manifest = self.load_manifest()
+            self._finish_pending(manifest)
+            self._remove_files(manifest.get("retired", []))
+            manifest["retired"] = []
+            rows, cursor, reset = store.rows_since(manifest["cursor"])
+            if reset or not manifest["parts"]:
+                # New archive, or the live store was replaced: start again from its contents
+                manifest = {"version": manifest["version"], "cursor": None, "parts": [],
+                            "retired": [part["path"] for part in manifest["parts"]],
+                            "by_subject": by_subject, "granularity": granularity}
+            if not rows:
+                return 0
+
+            length = 7 if manifest["granularity"] == "month" else 10
+            new_rows = {}
+            for row in map(normalize_row, rows):
+                key = (_row_period(row, length), row["subject"] if manifest["by_subject"] else None)
+                new_rows.setdefault(key, []).append(row)
+
+            batch_id = f"{time.time_ns():020d}"
+            parts = {(part["date"], part["subject"]): part for part in manifest["parts"]}
+            for (period, subject), part_rows in new_rows.items():
+                table = rows_to_arrow(part_rows)
+                previous = parts.get((period, subject))
+                if previous is not None:
+                    # Conformed, as parts written before a column was added lack it
+                    existing = conform_arrow(pq.ParquetFile(os.path.join(self.root, previous["path"])).read())
+                    table = pa.concat_tables([existing, table]).unify_dictionaries()
+                    manifest["retired"].append(previous["path"])
+                # Sorted by student so row-group statistics can skip other students;
+                # the sort is stable, so equal (student, timestamp) rows keep write order
+                table = table.sort_by([("student_id", "ascending"), ("timestamp", "ascending")])
+                directory = f"date={period}"
+                if manifest["by_subject"]:
+                    directory += f"/subject={quote(subject or 'unknown', safe='')}"
+                relative_path = f"{directory}/part-{batch_id}.parquet"
+                os.makedirs(os.path.join(self.root, directory), exist_ok=True)
+                pq.write_table(table, os.path.join(self.root, relative_path) + ".tmp",
+                               row_group_size=ROW_GROUP_SIZE, write_statistics=True)
+                parts[(period, subject)] = {"path": relative_path, "date": period, "subject": subject,
+                                            "rows": table.num_rows}
+
+            manifest.update(version=manifest["version"] + 1, cursor=cursor,
+                            parts=sorted(parts.values(), key=lambda part: part["path"]))
+            self._save_manifest(manifest)
+            self._finish_pending(manifest)
+            get_metrics().increment("archive.rows_compacted", len(rows))
+            return len(rows)
+
+    def _remove_files(self, relative_paths):
+        for relative_path in relative_paths:
+            try:
+                os.remove(os.path.join(self.root, relative_path))
+            except OSError:
+                pass
+
+    def _part_paths(self, manifest, start_date=None, end_date=None):
+        paths = []
+        for part in manifest["parts"]:
+            period = part["date"]
+            # Partition pruning: only open the periods that overlap the range
+            if period == UNKNOWN_DATE:
+                if start_date or end_date:
+                    continue
+            elif (start_date and period < start_date[:len(period)]) or (end_date and period > end_date[:len(period)]):
+                continue
+            paths.append(os.path.join(self.root, part["path"]))
+        return paths
+
+    def query(self, student_id=None, start_date=None, end_date=None, columns=None, manifest=None):
+        """Rows matching the filters as a typed DataFrame (history_columns order).
+
+        Dates are 'YYYY-MM-DD' strings and inclusive. Filters are pushed down to the
+        Parquet reader, which skips row groups whose statistics cannot match.
+        """
+        import pyarrow.dataset as ds
+
+        manifest = manifest or self.load_manifest()
+        paths = self._part_paths(manifest, start_date, end_date)
+        columns = list(columns or history_columns)
+        if not paths:
+            return history_frame([])[columns]
+
+        expression = None
+        conditions = []
+        if student_id is not None:
+            conditions.append(ds.field("student_id") == student_id)
+        if start_date:
+            conditions.append(ds.field("timestamp") >= pd.Timestamp(start_date).to_pydatetime())
+        if end_date:
+            conditions.append(ds.field("timestamp") < (pd.Timestamp(end_date) + pd.Timedelta(days=1)).to_pydatetime())
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+
+        with get_metrics().span("archive.query", student=student_id is not None):
+            dataset = ds.dataset(paths, schema=history_arrow_schema(), format="parquet")
+            table = dataset.to_table(columns=columns, filter=expression)
+        return concat_history([table.to_pandas()])[columns]
+
+    def iter_rows(self, columns=None, manifest=None):
+        """All archived rows as dicts, in compaction order."""
+        import pyarrow.parquet as pq
+
+        manifest = manifest or self.load_manifest()
+        for part in manifest["parts"]:
+            # ParquetFile, not read_table: the date=/subject= directories are not data columns
+            table = pq.ParquetFile(os.path.join(self.root, part["path"])).read(columns=columns)
+            yield from arrow_to_rows(table if columns else conform_arrow(table))
+
+
+class ArchivedPredictionStore:
+    """Prediction store view that answers history queries from the archive plus the live tail.
+
+    Writes go to the live store. Rows the archive has not caught up with yet are read from
+    the live store through its rows_since cursor.
+    """
+
+    def __init__(self, live_store, archive):
+        self.live_store = live_store
+        self.archive = archive
+        self.path = getattr(live_store, "path", None)
+
+    def append(self, row, wait=False):
+        self.live_store.append(row, wait=wait)
+
+    def append_many(self, rows):
+        for row in rows:
+            self.live_store.append(row)
+
+    def version(self):
+        return (self.archive.version(), self.live_store.version())
+
+    def _tail(self, manifest):
+        rows, _, reset = self.live_store.rows_since(manifest["cursor"])
+        return rows, reset
+
+    def student_history(self, student_id, start_date=None, end_date=None):
+        manifest = self.archive.load_manifest()
+        tail, reset = self._tail(manifest)
+        if reset:
+            return self.live_store.student_history(student_id)
+        archived = self.archive.query(student_id, start_date, end_date, manifest=manifest)
+        recent = history_frame([row for row in tail if row.get("student_id") == student_id])
+        if start_date:
+            recent = recent[recent["timestamp"] >= pd.Timestamp(start_date)]
+        if end_date:
+            recent = recent[recent["timestamp"] < pd.Timestamp(end_date) + pd.Timedelta(days=1)]
+        return concat_history([archived, recent]).sort_values("timestamp", kind="stable").reset_index(drop=True)
+
+    def load_all(self):
+        manifest = self.archive.load_manifest()
+        tail, reset = self._tail(manifest)
+        if reset:
+            return self.live_store.load_all()
+        frames = [self.archive.query(manifest=manifest), history_frame(tail)]
+        return concat_history(frames).sort_values("timestamp", kind="stable").reset_index(drop=True)
+
+    def latest_by_student(self):
+        df = self.load_all().dropna(subset=["timestamp"])
+        return df.sort_values("timestamp", ascending=False, kind="stable").drop_duplicates("student_id", keep="first")
+
+    def count(self):
+        return len(self.load_all())
+
+    def rows_since(self, cursor=None):
+        """Like the live store's rows_since; a fresh reader gets the archive plus the live tail."""
+        if cursor is not None:
+            return self.live_store.rows_since(cursor)
+        manifest = self.archive.load_manifest()
+        tail, cursor, reset = self.live_store.rows_since(manifest["cursor"])
+        if reset:
+            return self.live_store.rows_since(None)
+        return list(self.archive.iter_rows(manifest=manifest)) + tail, cursor, False
+
+
+def main(argv=None):
+    from prediction_store import get_prediction_store
+
+    parser = argparse.ArgumentParser(description="Compact the prediction log into a Parquet archive, or query it.")
+    parser.add_argument("command", choices=["compact", "query"])
+    parser.add_argument("--root", default=os.getenv("HISTORY_ARCHIVE_PATH", DEFAULT_ARCHIVE_PATH))
+    parser.add_argument("--by-subject", action="store_true", help="Also partition by subject (new archive only)")
+    parser.add_argument("--granularity", choices=["month", "day"], default=DEFAULT_GRANULARITY,
+                        help="Date partition size (new archive only)")
+    parser.add_argument("--student", help="Student ID to query")
+    parser.add_argument("--start", help="First date to include, YYYY-MM-DD")
+    parser.add_argument("--end", help="Last date to include, YYYY-MM-DD")
+    args = parser.parse_args(argv)
+
+    archive = HistoryArchive(args.root)
+    store = get_prediction_store()
+    live_store = store.live_store if isinstance(store, ArchivedPredictionStore) else store
+    if args.command == "compact":
+        archived = archive.compact(live_store, by_subject=args.by_subject, granularity=args.granularity)
+        print(f"✅ Archived {archived} new rows into {args.root}")
+        return 0
+
+    for value in (args.start, args.end):
+        if value:
+            try:
+                datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                print(f"❌ Invalid date '{value}', use YYYY-MM-DD")
+                return 1
+    result = archive.query(args.student, args.start, args.end)
+    print(result.to_string(index=False) if not result.empty else "No matching rows.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+# history_schema.py
+# Explicit column types for the prediction history, shared by every store and the archive.
+#   - grade, subject, category, learner_profile: categoricals (labels are stored once, rows
+#     hold small integer codes)
+#   - the 15 behavior features and predicted_score: float32
+#   - timestamp: datetime64
+#   - model_version: categorical (the registry version that made the prediction)
+# Applying the schema to a frame never needs type inference, and a large history takes a
+# fraction of the memory of the default float64/object frame.
+#
+# Compare memory use on synthetic data with:
+#   python history_schema.py
+
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from student_rules import features, grade_options, subject_options
+from vectorized_rules import category_table, default_profile, profile_labels
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Column order of a logged prediction
+history_columns = ["student_id", "timestamp", "grade", "subject", *features, "predicted_score", "category",
+                   "learner_profile", "model_version"]
+
+numeric_columns = [*features, "predicted_score"]
+
+# Labels the app can produce; values outside these lists (e.g. older labels) are kept too
+known_labels = {
+    "grade": grade_options,
+    "subject": subject_options,
+    "category": [row[1] for row in category_table],
+    "learner_profile": [*profile_labels, default_profile],
+    "model_version": []
+}
+label_columns = list(known_labels)
+
+
+def _label_dtype(column, values):
+    observed = pd.unique(values.dropna())
+    extra = sorted(str(value) for value in observed if value not in known_labels[column])
+    return pd.CategoricalDtype([*known_labels[column], *extra])
+
+
+def apply_history_schema(df):
+    """Return df with the history dtypes; missing columns are added as empty ones."""
+    df = df.reindex(columns=history_columns)
+    typed = {}
+    for column in history_columns:
+        values = df[column]
+        if column in numeric_columns:
+            if values.dtype != np.float32:
+                values = pd.to_numeric(values, errors="coerce").astype(np.float32)
+        elif column == "timestamp":
+            if not pd.api.types.is_datetime64_any_dtype(values):
+                values = pd.to_datetime(values, format=TIMESTAMP_FORMAT, errors="coerce")
+            if values.dtype != "datetime64[ns]":
+                values = values.astype("datetime64[ns]")
+        elif column in known_labels:
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype(object).where(values.notna(), None).astype(_label_dtype(column, values))
+        else:
+            values = values.astype(object).where(values.notna(), None)
+        typed[column] = values
+    return pd.DataFrame(typed, index=df.index)
+
+
+def history_frame(rows):
+    """Typed history DataFrame from row dicts or tuples in history_columns order."""
+    return apply_history_schema(pd.DataFrame(rows, columns=history_columns))
+
+
+def concat_history(frames):
+    """Concatenate typed frames; categoricals with different label sets are merged, not turned into object."""
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return history_frame([])
+    with warnings.catch_warnings():
+        # All-NA columns change pandas' inferred concat dtype; the schema is re-applied anyway
+        warnings.simplefilter("ignore", FutureWarning)
+        combined = pd.concat(frames, ignore_index=True)
+    return apply_history_schema(combined)
+
+
+# read_csv arguments that parse a history CSV without inference
+csv_dtypes = {
+    "student_id": "string",
+    **{column: np.float32 for column in numeric_columns},
+    **{column: "category" for column in label_columns}
+}
+
+
+def read_history_csv(path):
+    """Read a CSV written with history_columns as its header, using the history dtypes."""
+    df = pd.read_csv(path, dtype=csv_dtypes, encoding="utf-8", on_bad_lines="skip")
+    df["student_id"] = df["student_id"].astype(object).where(df["student_id"].notna(), None)
+    return apply_history_schema(df)
+
+
+def history_arrow_schema():
+    """Arrow schema used by Parquet segments and the history archive."""
+    import pyarrow as pa
+
+    fields = []
+    for column in history_columns:
+        if column in numeric_columns:
+            fields.append((column, pa.float32()))
+        elif column == "timestamp":
+            fields.append((column, pa.timestamp("ms")))  # Parquet has no seconds unit
+        elif column in known_labels:
+            fields.append((column, pa.dictionary(pa.int32(), pa.string())))
+        else:
+            fields.append((column, pa.string()))
+    return pa.schema(fields)
+
+
+def conform_arrow(table):
+    """Cast an Arrow table to history_arrow_schema; columns it was written without become nulls."""
+    import pyarrow as pa
+
+    schema = history_arrow_schema()
+    columns = [table.column(field.name).cast(field.type) if field.name in table.column_names
+               else pa.nulls(table.num_rows, field.type) for field in schema]
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def rows_to_arrow(rows):
+    """Arrow table in history_arrow_schema from normalized row dicts."""
+    import pyarrow as pa
+
+    frame = history_frame(rows)
+    frame["timestamp"] = frame["timestamp"].astype("datetime64[ms]")
+    return pa.Table.from_pandas(frame, schema=history_arrow_schema(), preserve_index=False)
+
+
+def arrow_to_rows(table):
+    """Row dicts with plain Python values (timestamps as TIMESTAMP_FORMAT strings, as the stores return them)."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    names = table.column_names  # Built anew on every access
+    columns = []
+    for name, column in zip(names, table.columns):
+        if name == "timestamp":
+            # Whole seconds; strftime's %S would add the fraction of a ms timestamp
+            column = pc.strftime(column.cast(pa.timestamp("s")), format=TIMESTAMP_FORMAT)
+        elif name in known_labels:
+            column = column.cast(pa.string())
+        values = column.to_numpy(zero_copy_only=False)
+        if name in numeric_columns:
+            # float32 -> Python float; missing values become None like the SQLite store returns
+            values = values.astype(float).tolist()
+            if column.null_count:
+                values = [None if value != value else value for value in values]
+        else:
+            values = values.tolist()
+        columns.append(values)
+    return [dict(zip(names, values)) for values in zip(*columns)]
+
+
+def _untyped_frame(n_rows, rng):
+    from vectorized_rules import apply_rules, sample_features
+
+    feature_df = sample_features(n_rows, rng)
+    scores = rng.random(n_rows)
+    rules = apply_rules(feature_df, scores)
+    df = pd.DataFrame({
+        "student_id": [f"S{n:05d}" for n in rng.integers(0, 5000, n_rows)],
+        "timestamp": pd.Timestamp("2025-01-01").strftime(TIMESTAMP_FORMAT),
+        "grade": rng.choice(grade_options, n_rows),
+        "subject": rng.choice(subject_options, n_rows)
+    })
+    df = pd.concat([df, feature_df.astype(float)], axis=1)
+    df["predicted_score"] = scores
+    df["category"] = rules["category"].to_numpy()
+    df["learner_profile"] = rules["learner_profile"].to_numpy()
+    df["model_version"] = "student_model.pkl@bench"
+    return df[history_columns]
+
+
+if __name__ == "__main__":
+    untyped = _untyped_frame(200_000, np.random.default_rng(0))
+    typed = apply_history_schema(untyped)
+    before = untyped.memory_usage(deep=True).sum()
+    after = typed.memory_usage(deep=True).sum()
+    print(f"200,000 rows: {before / 1e6:.1f} MB untyped, {after / 1e6:.1f} MB typed ({before / after:.1f}x smaller)")
+    sys.exit(0)
@@ -0,0 +1,289 @@
+# llm_client.py
+# Shared Gemini connection state: probe once, remember the working model for a while,
+# reuse GenerativeModel instances, and only probe again after a failure.
+# A fake client is included so quiz generation can be exercised offline.
+# google.generativeai is only imported (and configured with the key passed to
+# set_api_key) when the first model is needed, so importing the app stays fast.
+
+import threading
+import time
+
+from metrics import get_metrics
+
+# Model names to probe, in order of preference
+probe_model_names = [
+    "gemini-1.5-flash",
+    "gemini-1.5-pro",
+    "gemini-2.0-flash-exp",
+    "models/gemini-1.5-flash",
+    "models/gemini-1.5-pro"
+]
+
+PROBE_PROMPT = "Say 'API test successful' if you can read this."
+DEFAULT_TTL_SECONDS = 600
+DEFAULT_FAILURE_TTL_SECONDS = 30
+
+
+class LLMConnectionManager:
+    """Caches the result of the API probe and the model instances used for generation."""
+
+    def __init__(self, client, probe_models=None, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 failure_ttl_seconds=DEFAULT_FAILURE_TTL_SECONDS, api_key_configured=True):
+        # client is anything with a GenerativeModel(model_name) factory, e.g. the genai module
+        self.client = client
+        self.probe_models = list(probe_models or probe_model_names)
+        self.ttl_seconds = ttl_seconds
+        self.failure_ttl_seconds = failure_ttl_seconds
+        self.api_key_configured = api_key_configured
+        self.working_model_name = None
+        self.last_status = None
+        self.last_checked = 0.0
+        self.probe_count = 0
+        self._models = {}
+        self._lock = threading.RLock()
+        self._probing = False
+        self._probe_finished = threading.Condition(self._lock)
+
+    def get_model(self, model_name):
+        """Return a cached GenerativeModel instance for model_name."""
+        with self._lock:
+            if model_name not in self._models:
+                self._models[model_name] = self.client.GenerativeModel(model_name)
+            return self._models[model_name]
+
+    def cached_status(self):
+        """The last probe result while it is fresh, else None. Never calls the API."""
+        with self._lock:
+            if not self.api_key_configured:
+                return False, "No API key configured"
+            return self.last_status if self._status_is_fresh() else None
+
+    def _status_is_fresh(self):
+        if self.last_status is None:
+            return False
+        ttl = self.ttl_seconds if self.last_status[0] else self.failure_ttl_seconds
+        return time.monotonic() - self.last_checked < ttl
+
+    def _record_status(self, is_working, message, model_name=None):
+        self.working_model_name = model_name if is_working else None
+        self.last_status = (is_working, message)
+        self.last_checked = time.monotonic()
+        return self.last_status
+
+    def check_connection(self, force=False):
+        """Return (is_working, message), probing the API only when the cached result is stale.
+
+        The probe runs outside the lock, so get_model and ordered_models never wait on the
+        network. Only one probe runs at a time; other callers wait for its result.
+        """
+        with self._lock:
+            if not self.api_key_configured:
+                return False, "No API key configured"
+            if not force and self._status_is_fresh():
+                return self.last_status
+            if self._probing:
+                while self._probing:
+                    self._probe_finished.wait()
+                return self.last_status
+            self._probing = True
+            self.probe_count += 1
+
+        status = (False, "No working model found. All models failed.", None)
+        try:
+            with get_metrics().span("llm.probe"):
+                for model_name in self.probe_models:
+                    try:
+                        response = self.call_model(model_name, PROBE_PROMPT, call="probe")
+                        if response and response.text:
+                            status = (True, f"API connection successful using {model_name}", model_name)
+                            break
+                    except Exception:
+                        continue  # Try next model
+        finally:
+            with self._lock:
+                self._probing = False
+                result = self._record_status(*status)
+                self._probe_finished.notify_all()
+        return result
+
+    def invalidate(self):
+        """Forget the cached probe result so the next check probes again."""
+        with self._lock:
+            self.working_model_name = None
+            self.last_status = None
+            self.last_checked = 0.0
+
+    def ordered_models(self, model_names):
+        """Put the last known working model first, followed by the other candidates."""
+        with self._lock:
+            working = self.working_model_name
+        if working is None:
+            return list(model_names)
+        return [working] + [name for name in model_names if name != working]
+
+    def call_model(self, model_name, prompt, call, **kwargs):
+        """One generate_content call, timed per model; failures are counted by exception type."""
+        metrics = get_metrics()
+        start = time.perf_counter()
+        try:
+            response = self.get_model(model_name).generate_content(prompt, **kwargs)
+        except Exception as e:
+            metrics.observe("llm.call", time.perf_counter() - start, model=model_name, call=call, outcome="error")
+            metrics.increment("llm.failures", model=model_name, call=call, reason=type(e).__name__)
+            raise
+        metrics.observe("llm.call", time.perf_counter() - start, model=model_name, call=call, outcome="ok")
+        return response
+
+    def generate_content(self, prompt, model_names):
+        """Send prompt to the first model that answers. Returns (text, model_name) or (None, None)."""
+        for attempt, model_name in enumerate(self.ordered_models(model_names)):
+            if attempt:
+                get_metrics().increment("llm.fallbacks", model=model_name, call="generate")
+            try:
+                response = self.call_model(model_name, prompt, call="generate")
+                if response and response.text:
+                    self.record_success(model_name)
+                    return response.text, model_name
+            except Exception:
+                self.record_failure(model_name)
+                continue  # Try next model
+        return None, None
+
+    def stream_content(self, prompt, model_names):
+        """Yield text chunks from the first model that starts answering.
+
+        Models are only switched before the first chunk arrives; a failure after that
+        is raised to the caller, who has already shown part of the answer.
+        """
+        metrics = get_metrics()
+        for attempt, model_name in enumerate(self.ordered_models(model_names)):
+            if attempt:
+                metrics.increment("llm.fallbacks", model=model_name, call="stream")
+            start = time.perf_counter()
+            try:
+                response = self.call_model(model_name, prompt, call="stream", stream=True)
+            except Exception:
+                self.record_failure(model_name)
+                continue  # Try next model
+            try:
+                chunks = iter(response)
+                first_chunk = next(chunks)
+            except Exception as e:
+                # Streaming errors usually surface on the first chunk, not on the call itself
+                metrics.increment("llm.failures", model=model_name, call="stream", reason=type(e).__name__)
+                self.record_failure(model_name)
+                continue  # Try next model
+
+            metrics.observe("llm.first_chunk", time.perf_counter() - start, model=model_name)
+            yield first_chunk.text
+            for chunk in chunks:
+                if chunk.text:
+                    yield chunk.text
+            metrics.observe("llm.stream", time.perf_counter() - start, model=model_name)
+            self.record_success(model_name)
+            return
+        raise RuntimeError("All available models failed to generate response.")
+
+    def record_success(self, model_name):
+        """A real answer is as good as a probe: refresh the cached status."""
+        with self._lock:
+            self._record_status(True, f"API connection successful using {model_name}", model_name)
+
+    def record_failure(self, model_name):
+        """Drop the cached status if the model we relied on stops answering."""
+        with self._lock:
+            if model_name == self.working_model_name:
+                self.invalidate()
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    def __init__(self, client, model_name):
+        self.client = client
+        self.model_name = model_name
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.client.calls.append((self.model_name, prompt))
+        if self.model_name in self.client.failing_models:
+            raise RuntimeError(f"Fake failure for {self.model_name}")
+        if callable(self.client.response):
+            text = self.client.response(prompt, self.model_name)
+        else:
+            text = self.client.response
+        if stream:
+            return self._stream(text)
+        return FakeResponse(text)
+
+    def _stream(self, text):
+        # Like the SDK's stream=True response: an iterable of partial responses
+        size = self.client.chunk_size
+        for start in range(0, len(text), size):
+            if self.client.chunk_delay:
+                time.sleep(self.client.chunk_delay)
+            yield FakeResponse(text[start:start + size])
+
+
+class FakeLLMClient:
+    """Offline stand-in for google.generativeai that records every call and supports stream=True."""
+
+    def __init__(self, response="**Question 1:** What is 2 + 2?\nA) 3\nB) 4\nC) 5\nD) 6\n**Correct Answer:** B",
+                 failing_models=None, chunk_size=20, chunk_delay=0.0):
+        # response is a fixed string or a callable(prompt, model_name) -> str
+        self.response = response
+        self.failing_models = set(failing_models or [])
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.calls = []
+
+    def GenerativeModel(self, model_name):
+        return FakeGenerativeModel(self, model_name)
+
+
+class GenAIClient:
+    """google.generativeai, imported and configured on the first GenerativeModel() call."""
+
+    def __init__(self):
+        self._genai = None
+        self._lock = threading.Lock()
+
+    def GenerativeModel(self, model_name):
+        with self._lock:
+            if self._genai is None:
+                import google.generativeai as genai
+
+                if _api_key:
+                    genai.configure(api_key=_api_key)
+                self._genai = genai
+        return self._genai.GenerativeModel(model_name)
+
+
+_api_key = None
+_connection_manager = None
+_manager_lock = threading.Lock()
+
+
+def set_api_key(api_key):
+    """Key that google.generativeai is configured with when it is first used."""
+    global _api_key
+    _api_key = api_key
+
+
+def get_connection_manager(api_key_configured=True):
+    """Return the process-wide connection manager, creating it for google.generativeai on first use."""
+    global _connection_manager
+    with _manager_lock:
+        if _connection_manager is None:
+            _connection_manager = LLMConnectionManager(GenAIClient(), api_key_configured=api_key_configured)
+        return _connection_manager
+
+
+def set_llm_client(client, **manager_options):
+    """Replace the process-wide client, e.g. with FakeLLMClient() for offline runs."""
+    global _connection_manager
+    with _manager_lock:
+        _connection_manager = LLMConnectionManager(client, **manager_options)
+        return _connection_manager
@@ -0,0 +1,245 @@
+# metrics.py
+# In-process timing and counter metrics for the hot paths: model prediction, prediction
+# log I/O, the API probe and the per-model Gemini calls. Metrics are aggregated in memory
+# (count / total / max per name and labels) and pushed to pluggable sinks on flush().
+#
+# Sinks are chosen with METRICS_SINKS, a comma-separated list of:
+#   log                    -> one line per metric through the `lms.metrics` logger
+#   prometheus:<path>      -> Prometheus text exposition format, rewritten on each flush
+#   file:<path>            -> one JSON snapshot per line appended to <path>, at most every
+#                             METRICS_FILE_INTERVAL seconds (default 60) and only if it changed
+# e.g. METRICS_SINKS="log,prometheus:metrics.prom"
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+METRIC_PREFIX = "lms_"
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items() if value is not None))
+
+
+class Metrics:
+    """Thread-safe registry of counters and timers keyed by (name, labels)."""
+
+    def __init__(self, sinks=None):
+        self.sinks = list(sinks or [])
+        self._counters = {}
+        self._timers = {}  # key -> [count, total_seconds, max_seconds]
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def increment(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            stats = self._timers.setdefault(key, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+
+    @contextmanager
+    def span(self, name, **labels):
+        """Time the block as `name`. Failures are timed too and counted in `<name>.errors` by exception type."""
+        start = time.perf_counter()
+        try:
+            yield labels
+        except BaseException as e:
+            # Merged so that a caller's own outcome or reason label cannot hide the original error
+            self.observe(name, time.perf_counter() - start, **{**labels, "outcome": "error"})
+            self.increment(f"{name}.errors", **{**labels, "reason": type(e).__name__})
+            raise
+        # The block may add labels (e.g. the model that answered) through the yielded dict
+        self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        """List of dicts, one per metric series, sorted by name."""
+        with self._lock:
+            counters = dict(self._counters)
+            timers = {key: list(stats) for key, stats in self._timers.items()}
+        series = [{"name": name, "type": "counter", "labels": dict(labels), "value": value}
+                  for (name, labels), value in counters.items()]
+        series += [{"name": name, "type": "timer", "labels": dict(labels), "count": count,
+                    "total_seconds": total, "max_seconds": max_seconds}
+                   for (name, labels), (count, total, max_seconds) in timers.items()]
+        return sorted(series, key=lambda item: (item["name"], sorted(item["labels"].items())))
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+            self.started_at = time.time()
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def flush(self):
+        """Send the current snapshot to every sink. A failing sink never breaks the caller."""
+        series = self.snapshot()
+        for sink in self.sinks:
+            try:
+                sink.emit(series)
+            except Exception as e:
+                logging.getLogger("lms.metrics").warning(f"Metrics sink {type(sink).__name__} failed: {e}")
+
+
+def summary_rows(series):
+    """Flatten a snapshot into display rows (timers in milliseconds), e.g. for a debug table."""
+    rows = []
+    for item in series:
+        labels = ", ".join(f"{name}={value}" for name, value in item["labels"].items())
+        if item["type"] == "counter":
+            rows.append({"metric": item["name"], "labels": labels, "count": item["value"],
+                         "mean_ms": None, "max_ms": None, "total_ms": None})
+        else:
+            rows.append({"metric": item["name"], "labels": labels, "count": item["count"],
+                         "mean_ms": round(item["total_seconds"] / item["count"] * 1000, 3),
+                         "max_ms": round(item["max_seconds"] * 1000, 3),
+                         "total_ms": round(item["total_seconds"] * 1000, 3)})
+    return rows
+
+
+class LogSink:
+    """Writes one line per metric series to a logger (to stderr unless logging is configured)."""
+
+    def __init__(self, logger_name="lms.metrics", level=logging.INFO):
+        self.logger = logging.getLogger(logger_name)
+        self.level = level
+        if not self.logger.handlers:
+            # Without a handler only WARNING and above would reach the last-resort handler
+            handler = logging.StreamHandler()
+            handler.setLevel(level)
+            self.logger.addHandler(handler)
+            self.logger.setLevel(level)
+            self.logger.propagate = False
+
+    def emit(self, series):
+        for item in series:
+            labels = ",".join(f"{name}={value}" for name, value in item["labels"].items())
+            if item["type"] == "counter":
+                self.logger.log(self.level, f"{item['name']}{{{labels}}} {item['value']}")
+            else:
+                mean_ms = item["total_seconds"] / item["count"] * 1000
+                self.logger.log(self.level, f"{item['name']}{{{labels}}} count={item['count']} "
+                                            f"mean={mean_ms:.2f}ms max={item['max_seconds'] * 1000:.2f}ms")
+
+
+def _prometheus_name(name):
+    return METRIC_PREFIX + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _prometheus_labels(labels):
+    if not labels:
+        return ""
+    escaped = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        escaped.append(f'{name}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def render_prometheus(series):
+    """Render a snapshot in the Prometheus text exposition format.
+
+    Timers become summaries (<name>_seconds_count / _sum) plus a <name>_seconds_max gauge.
+    """
+    families = {}
+    for item in series:
+        labels = _prometheus_labels(item["labels"])
+        base = _prometheus_name(item["name"])
+        if item["type"] == "counter":
+            families.setdefault((f"{base}_total", "counter"), []).append(f"{base}_total{labels} {item['value']}")
+        else:
+            samples = families.setdefault((f"{base}_seconds", "summary"), [])
+            samples.append(f"{base}_seconds_count{labels} {item['count']}")
+            samples.append(f"{base}_seconds_sum{labels} {item['total_seconds']:.6f}")
+            families.setdefault((f"{base}_seconds_max", "gauge"), []).append(
+                f"{base}_seconds_max{labels} {item['max_seconds']:.6f}")
+    lines = []
+    for (name, metric_type), samples in families.items():
+        lines.append(f"# TYPE {name} {metric_type}")
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+class PrometheusFileSink:
+    """Rewrites a .prom file (e.g. for the node_exporter textfile collector) on every flush."""
+
+    def __init__(self, path="metrics.prom"):
+        self.path = path
+
+    def emit(self, series):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(render_prometheus(series))
+        os.replace(temp_path, self.path)
+
+
+class JSONFileSink:
+    """Appends a JSON snapshot to a local file, at most every `interval` seconds and only if it changed.
+
+    flush() runs on every Streamlit rerun, so writing each snapshot would grow the file
+    with mostly duplicate data.
+    """
+
+    def __init__(self, path="metrics.jsonl", interval=None):
+        self.path = path
+        self.interval = interval if interval is not None else float(os.getenv("METRICS_FILE_INTERVAL", "60"))
+        self._last_written = None
+        self._last_series = None
+
+    def emit(self, series):
+        now = time.monotonic()
+        if series == self._last_series:
+            return
+        if self._last_written is not None and now - self._last_written < self.interval:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"time": time.time(), "series": series}) + "\n")
+        self._last_written = now
+        self._last_series = series
+
+
+def sinks_from_spec(spec):
+    """Build sinks from a METRICS_SINKS string such as "log,prometheus:metrics.prom"."""
+    sinks = []
+    for entry in filter(None, (part.strip() for part in (spec or "").split(","))):
+        kind, _, path = entry.partition(":")
+        if kind == "log":
+            sinks.append(LogSink())
+        elif kind == "prometheus":
+            sinks.append(PrometheusFileSink(path or "metrics.prom"))
+        elif kind == "file":
+            sinks.append(JSONFileSink(path or "metrics.jsonl"))
+        else:
+            print(f"Warning: unknown metrics sink '{entry}' ignored")
+    return sinks
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Return the process-wide registry, with sinks taken from METRICS_SINKS."""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = Metrics(sinks_from_spec(os.getenv("METRICS_SINKS", "")))
+        return _metrics
+
+
+def set_metrics(metrics):
+    global _metrics
+    with _metrics_lock:
+        _metrics = metrics
@@ -0,0 +1,453 @@
+# model_registry.py
+# Versioned model artifacts, and hot reload of the active model without restarting the app.
+#
+#   model_registry/
+#     v001/model.pkl
+#     v001/metadata.json   {version, sha256, feature_names, trained_at, registered_at, source, notes}
+#     v002/...
+#     _active.json         {"active": "v002", "previous": "v001", "shadow": null}
+#
+# register() copies a model pickle into a new version directory (built under a temporary
+# name and renamed into place), and activate() / rollback() / set_shadow() rewrite
+# _active.json atomically. Every ModelManager notices the change on its next refresh(),
+# loads the new model on a background thread while the current one keeps serving, and
+# then swaps it in; a request that already picked up a model finishes with it.
+# The previously active model stays loaded, so rolling back does not load anything.
+# A shadow model is scored on a background thread after the active model has answered,
+# so A/B comparisons never add to the request latency.
+#
+# Without a registry, student_model.pkl is served as before, versioned by its checksum.
+#
+# Usage:
+#   python model_registry.py register new_model.pkl [--trained-at 2025-06-01] [--notes "..."] [--activate]
+#   python model_registry.py list
+#   python model_registry.py activate v002
+#   python model_registry.py rollback
+#   python model_registry.py shadow v003          # "off" stops shadow scoring
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from batch_scoring import DEFAULT_MODEL_PATH, get_model_features, load_model
+from metrics import get_metrics
+
+DEFAULT_REGISTRY_PATH = os.getenv("MODEL_REGISTRY_PATH", "model_registry")
+DEFAULT_CHECK_INTERVAL = float(os.getenv("MODEL_CHECK_INTERVAL", "2"))
+POINTER_NAME = "_active.json"
+MODEL_FILE = "model.pkl"
+METADATA_FILE = "metadata.json"
+
+
+def file_checksum(path):
+    """SHA-256 of a file, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_json(path, data):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1)
+    os.replace(temp_path, path)
+
+
+class ModelRegistry:
+    """Directory of immutable model versions plus a pointer to the active one."""
+
+    def __init__(self, root=DEFAULT_REGISTRY_PATH):
+        self.root = root
+
+    @property
+    def pointer_path(self):
+        return os.path.join(self.root, POINTER_NAME)
+
+    def exists(self):
+        return os.path.exists(self.pointer_path)
+
+    def model_path(self, version):
+        return os.path.join(self.root, version, MODEL_FILE)
+
+    def metadata(self, version):
+        with open(os.path.join(self.root, version, METADATA_FILE), encoding="utf-8") as f:
+            return json.load(f)
+
+    def versions(self):
+        """Metadata of every registered version, oldest first."""
+        if not os.path.isdir(self.root):
+            return []
+        names = sorted(name for name in os.listdir(self.root)
+                       if os.path.exists(os.path.join(self.root, name, METADATA_FILE)))
+        return [self.metadata(name) for name in names]
+
+    def register(self, model_path, trained_at=None, notes=None):
+        """Copy a model pickle into the registry as the next version. Returns its metadata.
+
+        The model is loaded once to record feature_names_in_. trained_at defaults to the
+        file's modification time.
+        """
+        model = load_model(model_path)
+        metadata = {
+            "sha256": file_checksum(model_path),
+            "feature_names": get_model_features(model),
+            "trained_at": trained_at or datetime.fromtimestamp(os.path.getmtime(model_path)).isoformat(timespec="seconds"),
+            "registered_at": datetime.now().isoformat(timespec="seconds"),
+            "source": os.path.abspath(model_path),
+            "notes": notes
+        }
+        os.makedirs(self.root, exist_ok=True)
+        temp_dir = os.path.join(self.root, f".register-{os.getpid()}-{time.time_ns()}")
+        os.makedirs(temp_dir)
+        try:
+            shutil.copyfile(model_path, os.path.join(temp_dir, MODEL_FILE))
+            while True:
+                numbers = [int(name[1:]) for name in os.listdir(self.root) if name[:1] == "v" and name[1:].isdigit()]
+                version = f"v{max(numbers, default=0) + 1:03d}"
+                metadata["version"] = version
+                _write_json(os.path.join(temp_dir, METADATA_FILE), metadata)
+                try:
+                    # Fails if another process took this version number first
+                    os.rename(temp_dir, os.path.join(self.root, version))
+                    return metadata
+                except OSError:
+                    if not os.path.exists(os.path.join(self.root, version)):
+                        raise
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def pointer(self):
+        try:
+            with open(self.pointer_path, encoding="utf-8") as f:
+                pointer = json.load(f)
+        except (OSError, ValueError):
+            pointer = {}
+        return {"active": pointer.get("active"), "previous": pointer.get("previous"), "shadow": pointer.get("shadow")}
+
+    def pointer_stamp(self):
+        """Changes whenever the pointer is rewritten, or None if there is no pointer."""
+        try:
+            stat = os.stat(self.pointer_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def _check_version(self, version):
+        if version is not None and not os.path.exists(self.model_path(version)):
+            raise ValueError(f"Model version '{version}' is not registered")
+
+    def activate(self, version):
+        self._check_version(version)
+        pointer = self.pointer()
+        if pointer["active"] != version:
+            pointer["previous"], pointer["active"] = pointer["active"], version
+        if pointer["shadow"] == version:
+            pointer["shadow"] = None
+        _write_json(self.pointer_path, pointer)
+        return pointer
+
+    def rollback(self):
+        """Make the previous version active again (and the current one previous)."""
+        pointer = self.pointer()
+        if pointer["previous"] is None:
+            raise ValueError("There is no previous model version to roll back to")
+        return self.activate(pointer["previous"])
+
+    def set_shadow(self, version):
+        """Score `version` alongside the active model (None to stop)."""
+        self._check_version(version)
+        pointer = self.pointer()
+        pointer["shadow"] = version
+        _write_json(self.pointer_path, pointer)
+        return pointer
+
+    def load(self, version):
+        """Load a version after checking its checksum and feature names against the metadata."""
+        metadata = self.metadata(version)
+        model_path = self.model_path(version)
+        if file_checksum(model_path) != metadata["sha256"]:
+            raise ValueError(f"Checksum mismatch for model version '{version}'")
+        model = load_model(model_path)
+        if get_model_features(model) != metadata["feature_names"]:
+            raise ValueError(f"Feature names of model version '{version}' do not match its metadata")
+        return model, metadata
+
+
+class LoadedModel:
+    """One model version ready to predict. Requests hold on to the instance they started with."""
+
+    def __init__(self, version, predictor, metadata):
+        self.version = version
+        self.predictor = predictor
+        self.metadata = metadata
+
+
+def fallback_version(model_path):
+    """Version label of a model file served outside the registry, e.g. 'student_model.pkl@5671006b'."""
+    return f"{os.path.basename(model_path)}@{file_checksum(model_path)[:8]}"
+
+
+def load_version(version, registry=None, fallback_path=DEFAULT_MODEL_PATH):
+    """Load one pinned version without a ModelManager (a fallback_version label loads fallback_path)."""
+    from fast_inference import FastPredictor
+
+    with get_metrics().span("model.load", version=version):
+        if "@" in version:
+            checksum = file_checksum(fallback_path)
+            if version != f"{os.path.basename(fallback_path)}@{checksum[:8]}":
+                raise ValueError(f"'{fallback_path}' is no longer model version '{version}'")
+            model = load_model(fallback_path)
+            metadata = {"version": version, "sha256": checksum, "feature_names": get_model_features(model),
+                        "source": os.path.abspath(fallback_path)}
+        else:
+            registry = registry if registry is not None else ModelRegistry()
+            model, metadata = registry.load(version)
+    return LoadedModel(version, FastPredictor(model), metadata)
+
+
+class ModelManager:
+    """Serves the registry's active model and swaps in a newly activated one without a restart.
+
+    current() is safe to call from any thread: a swap replaces one reference, and a newly
+    activated model is loaded on a background thread before it happens. A request only
+    waits for a load when no model is being served yet.
+    """
+
+    def __init__(self, registry=None, fallback_path=DEFAULT_MODEL_PATH, check_interval=DEFAULT_CHECK_INTERVAL):
+        self.registry = registry if registry is not None else ModelRegistry()
+        self.fallback_path = fallback_path
+        self.check_interval = check_interval
+        self.last_error = None
+        self.shadow_stats = {}  # shadow version -> comparison totals
+        self._current = None
+        self._previous = None
+        self._shadow = None
+        self._stamp = None
+        self._checked = None
+        self._reload_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._shadow_pool = None
+        self._switcher = None  # Thread loading a newly activated version
+
+    def _load(self, version):
+        return load_version(version, self.registry)
+
+    def _load_fallback(self):
+        return load_version(fallback_version(self.fallback_path), fallback_path=self.fallback_path)
+
+    def _loaded(self, version):
+        """A version that is already in memory, or a freshly loaded one."""
+        for loaded in (self._current, self._previous, self._shadow):
+            if loaded is not None and loaded.version == version:
+                return loaded
+        return self._load(version)
+
+    def refresh(self, force=False, wait=False):
+        """Pick up registry changes; checks at most every check_interval seconds.
+
+        A changed pointer is loaded on a background thread while the current model keeps
+        serving. Only the first load (nothing to serve yet) or wait=True blocks the caller.
+        Returns True if a new version was swapped in before returning.
+        """
+        now = time.monotonic()
+        if not force and self._checked is not None and now - self._checked < self.check_interval:
+            return False
+        self._checked = now
+        if self._current is not None and self.registry.pointer_stamp() == self._stamp:
+            return False
+        if self._current is None or wait:
+            return self._switch()
+        with self._stats_lock:
+            if self._switcher is None or not self._switcher.is_alive():
+                self._switcher = threading.Thread(target=self._switch, name="model-switch", daemon=True)
+                self._switcher.start()
+        return False
+
+    def _switch(self):
+        """Load what the pointer names and swap it in. Returns True on a swap."""
+        with self._reload_lock:
+            stamp = self.registry.pointer_stamp()
+            if self._current is not None and stamp == self._stamp:
+                return False  # Another thread has switched already
+            pointer = self.registry.pointer() if stamp is not None else {"active": None, "shadow": None}
+            swapped = False
+            try:
+                if pointer["active"] is None:
+                    if self._current is None:
+                        self._current = self._load_fallback()
+                elif self._current is None or pointer["active"] != self._current.version:
+                    loaded = self._loaded(pointer["active"])
+                    # The outgoing model stays in memory for an instant rollback
+                    self._previous, self._current = self._current, loaded
+                    swapped = True
+                    get_metrics().increment("model.swaps", version=loaded.version)
+                shadow = pointer["shadow"]
+                self._shadow = self._loaded(shadow) if shadow and shadow != self._current.version else None
+            except Exception as e:
+                # Keep serving what we have; a broken version is retried on the next pointer change
+                self.last_error = e
+                print(f"Warning: could not switch model version: {e}")
+                if self._current is None:
+                    raise
+            self._stamp = stamp
+            return swapped
+
+    def current(self):
+        """The LoadedModel to use for one request (the first call loads it on the calling thread)."""
+        # Until a model is in, always check instead of waiting out check_interval
+        self.refresh(force=self._current is None)
+        return self._current
+
+    @property
+    def version(self):
+        """Version being served, without checking the registry."""
+        return self._current.version if self._current is not None else None
+
+    @property
+    def previous(self):
+        return self._previous
+
+    @property
+    def shadow(self):
+        return self._shadow
+
+    def activate(self, version):
+        """Activate a version and wait until this manager serves it."""
+        self.registry.activate(version)
+        return self.refresh(force=True, wait=True)
+
+    def rollback(self):
+        self.registry.rollback()
+        return self.refresh(force=True, wait=True)
+
+    def predict(self, rows, loaded=None):
+        """Score a float32 array in the active model's feature order. Returns (scores, LoadedModel).
+
+        If a shadow model is set, it scores the same rows afterwards on a background thread.
+        """
+        loaded = loaded or self.current()
+        scores = loaded.predictor.predict(rows)
+        shadow = self._shadow
+        if shadow is not None:
+            self._shadow_executor().submit(self._score_shadow, shadow, loaded, np.array(rows, dtype=np.float32), scores)
+        return scores, loaded
+
+    def _shadow_executor(self):
+        if self._shadow_pool is None:
+            with self._stats_lock:
+                if self._shadow_pool is None:
+                    self._shadow_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow-score")
+        return self._shadow_pool
+
+    def _score_shadow(self, shadow, active, rows, scores):
+        from vectorized_rules import categorize_scores
+
+        try:
+            if shadow.predictor.feature_names != active.predictor.feature_names:
+                order = [active.predictor.feature_names.index(name) for name in shadow.predictor.feature_names]
+                rows = rows[:, order]
+            with get_metrics().span("model.shadow", version=shadow.version):
+                shadow_scores = shadow.predictor.predict(rows)
+        except Exception as e:
+            get_metrics().increment("model.shadow.errors", version=shadow.version, reason=type(e).__name__)
+            return
+        diffs = np.abs(np.asarray(shadow_scores, dtype=np.float64) - np.asarray(scores, dtype=np.float64))
+        changed = int(np.sum(categorize_scores(shadow_scores)[0] != categorize_scores(scores)[0]))
+        with self._stats_lock:
+            stats = self.shadow_stats.setdefault(shadow.version, {
+                "active_version": active.version, "rows": 0, "total_abs_diff": 0.0, "max_abs_diff": 0.0,
+                "category_changes": 0})
+            stats["rows"] += len(diffs)
+            stats["total_abs_diff"] += float(diffs.sum())
+            stats["max_abs_diff"] = max(stats["max_abs_diff"], float(diffs.max(initial=0.0)))
+            stats["category_changes"] += changed
+        get_metrics().increment("model.shadow.rows", len(diffs), version=shadow.version)
+        get_metrics().increment("model.shadow.category_changes", changed, version=shadow.version)
+
+    def wait_for_shadow(self):
+        """Block until queued shadow scoring has finished (for tests and reports)."""
+        if self._shadow_pool is not None:
+            self._shadow_pool.submit(lambda: None).result()
+
+
+_model_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_model_manager():
+    """Return the process-wide manager for MODEL_REGISTRY_PATH (falling back to MODEL_PATH)."""
+    global _model_manager
+    with _manager_lock:
+        if _model_manager is None:
+            _model_manager = ModelManager(ModelRegistry(DEFAULT_REGISTRY_PATH),
+                                          fallback_path=os.getenv("MODEL_PATH", DEFAULT_MODEL_PATH))
+        return _model_manager
+
+
+def set_model_manager(manager):
+    global _model_manager
+    with _manager_lock:
+        _model_manager = manager
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage versioned model artifacts.")
+    parser.add_argument("--root", default=DEFAULT_REGISTRY_PATH, help="Registry directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    register = commands.add_parser("register", help="Add a model pickle as a new version")
+    register.add_argument("model_path")
+    register.add_argument("--trained-at", help="Training date (default: the file's modification time)")
+    register.add_argument("--notes")
+    register.add_argument("--activate", action="store_true", help="Make it the active version")
+    commands.add_parser("list", help="Show registered versions")
+    activate = commands.add_parser("activate", help="Make a version active")
+    activate.add_argument("version")
+    commands.add_parser("rollback", help="Reactivate the previous version")
+    shadow = commands.add_parser("shadow", help="Score a version alongside the active one")
+    shadow.add_argument("version", help='Version to shadow, or "off"')
+    args = parser.parse_args(argv)
+
+    registry = ModelRegistry(args.root)
+    try:
+        if args.command == "register":
+            metadata = registry.register(args.model_path, args.trained_at, args.notes)
+            print(f"✅ Registered {metadata['version']} ({metadata['sha256'][:12]}, {len(metadata['feature_names'])} features)")
+            if args.activate or registry.pointer()["active"] is None:
+                registry.activate(metadata["version"])
+                print(f"✅ {metadata['version']} is now active")
+        elif args.command == "list":
+            pointer = registry.pointer()
+            for metadata in registry.versions():
+                version = metadata["version"]
+                role = {pointer["active"]: "active", pointer["previous"]: "previous", pointer["shadow"]: "shadow"}.get(version, "")
+                print(f"{version:6s} {role:9s} trained {metadata['trained_at']}  sha256 {metadata['sha256'][:12]}  "
+                      f"{metadata.get('notes') or ''}")
+        elif args.command == "activate":
+            registry.activate(args.version)
+            print(f"✅ {args.version} is now active")
+        elif args.command == "rollback":
+            pointer = registry.rollback()
+            print(f"✅ Rolled back to {pointer['active']}")
+        elif args.command == "shadow":
+            version = None if args.version == "off" else args.version
+            registry.set_shadow(version)
+            print(f"✅ Shadow scoring {'stopped' if version is None else 'with ' + version}")
+    except (FileNotFoundError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
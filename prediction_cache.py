@@ -0,0 +1,146 @@
+# prediction_cache.py
+# Memoized predictions for feature vectors that are scored again and again (the same
+# student re-submitting identical inputs, the slider defaults). One entry holds the
+# predicted score and everything the rule chain derives from it: category, description,
+# emoji, learner profile, combined recommendation, learning material and feedback.
+#
+# The key is the model version plus all 15 student features of user_data (not just the
+# ones the model takes: the learner profile uses the others too), rounded to
+# PREDICTION_CACHE_DECIMALS places so inputs that differ only by float noise share an entry. Entries are kept in
+# least-recently-used order up to PREDICTION_CACHE_SIZE (0 turns memoization off). The
+# cache empties itself when the model manager serves another version. A cached answer
+# skips the shadow model, if one is set.
+#
+# Hits and misses are counted on the instance and in metrics (prediction_cache.hits /
+# prediction_cache.misses).
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from metrics import get_metrics
+from student_rules import (
+    categorize_student_performance,
+    features,
+    generate_combined_recommendation,
+    generate_feedback_message,
+    generate_learner_profile,
+    recommend_learning_material,
+)
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_SIZE", "4096"))
+DEFAULT_DECIMALS = int(os.getenv("PREDICTION_CACHE_DECIMALS", "6"))
+
+
+def score_student(user_data, row, models, loaded):
+    """Predict one student and run the rule chain. Returns the result dict the app displays."""
+    scores, _ = models.predict(row, loaded)
+    predicted_score = scores[0]
+    learner_profile = generate_learner_profile(user_data)
+    cat_num, cat_name, desc, emoji = categorize_student_performance(predicted_score)
+    return {
+        "predicted_score": predicted_score,
+        "cat_num": cat_num,
+        "cat_name": cat_name,
+        "description": desc,
+        "emoji": emoji,
+        "learner_profile": learner_profile,
+        "combined_recommendation": generate_combined_recommendation(cat_name, learner_profile),
+        "learning_material": recommend_learning_material(cat_num),
+        "feedback": generate_feedback_message(cat_num),
+    }
+
+
+class PredictionCache:
+    """Bounded LRU of prediction results keyed by (model version, quantized feature row)."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, decimals=DEFAULT_DECIMALS):
+        self.max_entries = max_entries
+        self.decimals = decimals
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def make_key(self, user_data, version):
+        """(version, bytes of every feature in user_data rounded to `decimals` places as float32).
+
+        Features missing from user_data count as NaN.
+        """
+        values = [user_data.get(name, np.nan) for name in features]
+        quantized = np.round(np.asarray(values, dtype=np.float64), self.decimals).astype(np.float32)
+        # -0.0 and 0.0 must share a key
+        return version, (quantized + np.float32(0.0)).tobytes()
+
+    def _check_version(self, version):
+        # Called with the lock held
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+
+    def predict(self, user_data, row, models, loaded=None):
+        """Cached score_student. Returns (result dict, hit).
+
+        row is the (1, n_features) float32 input for `loaded` (default: models.current()).
+        """
+        loaded = loaded or models.current()
+        key = self.make_key(user_data, loaded.version)
+        with self._lock:
+            # Forget everything once the manager has moved on to another version
+            self._check_version(models.version)
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        get_metrics().increment("prediction_cache.hits" if result is not None else "prediction_cache.misses")
+        if result is not None:
+            return dict(result), True
+
+        result = score_student(user_data, row, models, loaded)
+        if self.max_entries > 0:
+            with self._lock:
+                # A run still holding the previous model does not refill the cache with it
+                if loaded.version == self._version:
+                    self._entries[key] = result
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+        return dict(result), False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._entries), "max_entries": self.max_entries, "hits": self.hits,
+                    "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0,
+                    "invalidations": self.invalidations, "model_version": self._version}
+
+
+_prediction_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_prediction_cache():
+    """Return the process-wide prediction cache."""
+    global _prediction_cache
+    with _cache_lock:
+        if _prediction_cache is None:
+            _prediction_cache = PredictionCache()
+        return _prediction_cache
+
+
+def set_prediction_cache(cache):
+    global _prediction_cache
+    with _cache_lock:
+        _prediction_cache = cache
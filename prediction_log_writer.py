@@ -0,0 +1,276 @@
+# prediction_log_writer.py
+# Concurrency-safe writer for the CSV prediction log (PREDICTION_STORE=csv).
+# Rows are queued and written in batches by a single background thread per process, and
+# every batch is written under an exclusive lock on <log>.lock, so several app processes
+# can share one log without interleaving rows or racing on the header.
+#
+# When the log grows past max_bytes (or still has an older header) it is rotated
+# into an immutable Parquet segment in <log>_segments/. Rotation is crash-safe: the CSV is
+# first renamed to <log>.rotating, the segment is written to a temporary file and renamed
+# into place, and only then is the .rotating file removed. An interrupted rotation is
+# finished by the next writer; the segment name is derived from the .rotating file, so a
+# rotation is never applied twice.
+#
+# Compact the current log by hand with:
+#   python prediction_log_writer.py compact prediction_log.csv
+
+import atexit
+import csv
+import glob
+import hashlib
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from history_schema import apply_history_schema, arrow_to_rows, conform_arrow, history_columns, rows_to_arrow
+from metrics import get_metrics
+from prediction_store import normalize_row, read_csv_rows
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_FLUSH_INTERVAL = 0.5
+DEFAULT_MAX_BYTES = int(os.getenv("PREDICTION_LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+
+# Queue markers: write what has been collected now / write and stop
+_FLUSH = object()
+_STOP = object()
+
+
+@contextmanager
+def file_lock(log_path):
+    """Exclusive lock on <log_path>.lock, held across processes for the duration of the block."""
+    with open(f"{log_path}.lock", "a+") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def segments_dir(log_path):
+    return f"{os.path.splitext(log_path)[0]}_segments"
+
+
+def list_segments(log_path):
+    """Segment files of a log, oldest first."""
+    return sorted(glob.glob(os.path.join(segments_dir(log_path), "segment-*.parquet")))
+
+
+def segment_generation(log_path):
+    """Identifies the set of segments; changes on every rotation."""
+    segments = list_segments(log_path)
+    return os.path.basename(segments[-1]) if segments else ""
+
+
+def read_segment_rows(segment_path):
+    import pyarrow.parquet as pq
+
+    return arrow_to_rows(conform_arrow(pq.read_table(segment_path)))
+
+
+def read_segment_frame(segment_path):
+    import pyarrow.parquet as pq
+
+    return apply_history_schema(pq.read_table(segment_path).to_pandas())
+
+
+def header_is_current(log_path):
+    """True if the log is missing/empty or its header matches history_columns."""
+    if not os.path.exists(log_path) or os.path.getsize(log_path) == 0:
+        return True
+    with open(log_path, newline="", encoding="utf-8") as f:
+        return next(csv.reader(f), None) == history_columns
+
+
+def _write_segment(log_path, rotating_path):
+    import pyarrow.parquet as pq
+
+    stat = os.stat(rotating_path)
+    identity = hashlib.sha1(f"{stat.st_ino}-{stat.st_size}-{stat.st_mtime_ns}".encode()).hexdigest()[:10]
+    # Names sort by the time of the last write to the rotated log
+    segment_path = os.path.join(segments_dir(log_path), f"segment-{stat.st_mtime_ns:020d}-{identity}.parquet")
+    if not os.path.exists(segment_path):
+        os.makedirs(segments_dir(log_path), exist_ok=True)
+        rows = [normalize_row(row) for row in read_csv_rows(rotating_path)]
+        temp_path = f"{segment_path}.tmp"
+        pq.write_table(rows_to_arrow(rows), temp_path)
+        os.replace(temp_path, segment_path)
+    os.remove(rotating_path)
+    return segment_path
+
+
+def finish_pending_rotation(log_path):
+    """Complete a rotation interrupted by a crash. Call with the file lock held."""
+    rotating_path = f"{log_path}.rotating"
+    if os.path.exists(rotating_path):
+        return _write_segment(log_path, rotating_path)
+    return None
+
+
+def rotate_log(log_path):
+    """Move the current CSV log into a new Parquet segment. Call with the file lock held.
+
+    Returns the segment path, or None if there was nothing to rotate.
+    """
+    finish_pending_rotation(log_path)
+    if not os.path.exists(log_path) or os.path.getsize(log_path) == 0:
+        return None
+    with get_metrics().span("store.rotate", backend="csv"):
+        rotating_path = f"{log_path}.rotating"
+        os.replace(log_path, rotating_path)
+        return _write_segment(log_path, rotating_path)
+
+
+class QueuedRow:
+    """A row waiting for the writer thread; wait() returns once its batch is on disk."""
+
+    def __init__(self, row):
+        self.row = row
+        self.error = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        """Block until the row is written. Raises the batch's error if it could not be."""
+        if not self._done.wait(timeout):
+            raise TimeoutError("The prediction log writer did not write the row in time")
+        if self.error is not None:
+            raise self.error
+
+
+class PredictionLogWriter:
+    """Single background writer that appends queued rows to the CSV log in batches."""
+
+    def __init__(self, log_path, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 max_bytes=DEFAULT_MAX_BYTES):
+        self.log_path = log_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rows_written = 0
+        self.last_error = None
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="prediction-log-writer", daemon=True)
+                self._thread.start()
+
+    def write(self, row, flush=False):
+        """Queue one prediction row; it is on disk after the next flush (at most flush_interval later).
+
+        With flush=True the batch holding it is written right away. Returns a QueuedRow to
+        wait on.
+        """
+        self._ensure_started()
+        queued = QueuedRow(normalize_row(row))
+        self._queue.put(queued)
+        if flush:
+            self._queue.put(_FLUSH)
+        return queued
+
+    def flush(self):
+        """Write queued rows now and block until they are on disk."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_FLUSH)
+            self._queue.join()
+
+    def close(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while batch[-1] not in (_FLUSH, _STOP) and len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            queued = [item for item in batch if item is not _FLUSH and item is not _STOP]
+            try:
+                if queued:
+                    self.write_batch([item.row for item in queued])
+            except Exception as e:
+                self.last_error = e
+                for item in queued:
+                    item.error = e
+                get_metrics().increment("store.write.errors", backend="csv", reason=type(e).__name__)
+                print(f"Warning: could not write {len(queued)} prediction rows to {self.log_path}: {e}")
+            finally:
+                for item in queued:
+                    item._done.set()
+                for _ in batch:
+                    self._queue.task_done()
+            if batch[-1] is _STOP:
+                return
+
+    def write_batch(self, rows):
+        """Append rows under the file lock, writing the header only to a new file."""
+        metrics = get_metrics()
+        with file_lock(self.log_path), metrics.span("store.write", backend="csv"):
+            finish_pending_rotation(self.log_path)
+            if not header_is_current(self.log_path):
+                # Older layout; start a fresh file rather than mixing row shapes
+                rotate_log(self.log_path)
+            with open(self.log_path, "a", newline="", encoding="utf-8") as f:
+                size_before = f.tell()
+                writer = csv.DictWriter(f, fieldnames=history_columns)
+                if size_before == 0:
+                    writer.writeheader()
+                writer.writerows(rows)
+                f.flush()
+                os.fsync(f.fileno())
+                size_after = f.tell()
+            if size_after > self.max_bytes:
+                rotate_log(self.log_path)
+        self.rows_written += len(rows)
+        metrics.increment("store.bytes_written", size_after - size_before, backend="csv")
+        metrics.increment("store.rows_written", len(rows), backend="csv")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) not in (1, 2) or argv[0] != "compact":
+        print("Usage: python prediction_log_writer.py compact [prediction_log.csv]")
+        return 2
+    log_path = argv[1] if len(argv) == 2 else "prediction_log.csv"
+    with file_lock(log_path):
+        segment_path = rotate_log(log_path)
+    if segment_path:
+        print(f"✅ Compacted {log_path} into {segment_path}")
+    else:
+        print(f"Nothing to compact in {log_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
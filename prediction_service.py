@@ -0,0 +1,250 @@
+# prediction_service.py
+# Lightweight ASGI prediction service for the LMS, separate from the Streamlit app.
+# The model is loaded once at startup and replaced without a restart when another
+# registry version is activated (see model_registry.py). Concurrent requests are
+# micro-batched: they wait up to MAX_WAIT_MS for company and are then scored with a
+# single predict call. No Streamlit and no Gemini key are needed.
+#
+# Run with:
+#   uvicorn prediction_service:app --host 0.0.0.0 --port 8000
+#
+# Endpoints:
+#   GET  /health          -> {"status": "ok", "model_loaded": true, "model_version": "v002", ...}
+#   POST /predict         {feature: value, ..., "student_id": "S001"} -> one result
+#   POST /predict/batch   {"students": [{...}, ...]} (or a bare list) -> {"results": [...]}
+
+import asyncio
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from batch_scoring import DEFAULT_MODEL_PATH
+from model_registry import ModelManager, ModelRegistry
+from student_rules import features
+from vectorized_rules import apply_rules
+
+MAX_BATCH_SIZE = int(os.getenv("PREDICT_MAX_BATCH_SIZE", "256"))
+MAX_WAIT_MS = float(os.getenv("PREDICT_MAX_WAIT_MS", "5"))
+
+result_columns = [
+    "predicted_score", "category_number", "category", "description", "emoji", "learner_profile",
+    "combined_recommendation", "learning_material", "feedback", "difficulty", "model_version"
+]
+
+
+class RequestError(Exception):
+    """Invalid request payload; reported to the client as 422."""
+
+
+def validate_student(payload):
+    """Check one student's JSON object and return (feature values, missing feature names)."""
+    if not isinstance(payload, dict):
+        raise RequestError("Each student must be a JSON object of feature values")
+    values = {}
+    missing = []
+    for feature in features:
+        if feature not in payload:
+            # Same default as the app uses for missing features
+            missing.append(feature)
+            values[feature] = 0.0
+            continue
+        value = payload[feature]
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise RequestError(f"Feature '{feature}' must be a number")
+        values[feature] = float(value)
+    return values, missing
+
+
+class MicroBatcher:
+    """Collects concurrent scoring requests and runs them through one predict call."""
+
+    def __init__(self, models, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        # A ModelManager; each batch is scored by the version that is active when it runs
+        self.models = models
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_ms / 1000.0
+        self.queue = asyncio.Queue()
+        self.batches_run = 0
+        self.rows_scored = 0
+        self._worker = None
+
+    def start(self):
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+
+    async def score(self, rows):
+        """Score a list of feature dicts; resolves once their batch has run."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((rows, future))
+        return await future
+
+    async def _collect(self):
+        pending = [await self.queue.get()]
+        size = len(pending[0][0])
+        deadline = asyncio.get_running_loop().time() + self.max_wait_seconds
+        while size < self.max_batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            pending.append(item)
+            size += len(item[0])
+        return pending
+
+    def _score_rows(self, rows):
+        loaded = self.models.current()
+        feature_names = loaded.predictor.feature_names
+        input_rows = np.array([[row[feature] for feature in feature_names] for row in rows], dtype=np.float32)
+        scores, _ = self.models.predict(input_rows, loaded)
+        rules = apply_rules(pd.DataFrame(input_rows, columns=feature_names), scores)
+        rules.insert(0, "predicted_score", scores.astype(float))
+        rules["model_version"] = loaded.version
+        return rules[result_columns].to_dict("records")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = await self._collect()
+            rows = [row for item_rows, _ in pending for row in item_rows]
+            try:
+                # predict releases the GIL; keep the event loop free while it runs
+                results = await loop.run_in_executor(None, self._score_rows, rows)
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches_run += 1
+            self.rows_scored += len(rows)
+            start = 0
+            for item_rows, future in pending:
+                if not future.done():
+                    future.set_result(results[start:start + len(item_rows)])
+                start += len(item_rows)
+
+
+def _to_json_value(value):
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+class PredictionService:
+    """Minimal ASGI application; no web framework required."""
+
+    def __init__(self, model_path=None, registry_path=None):
+        # model_path is served when the registry has no active version
+        self.model_path = model_path or os.getenv("MODEL_PATH", DEFAULT_MODEL_PATH)
+        self.registry_path = registry_path or os.getenv("MODEL_REGISTRY_PATH", "model_registry")
+        self.batcher = None
+
+    async def startup(self):
+        models = ModelManager(ModelRegistry(self.registry_path), fallback_path=self.model_path)
+        models.refresh(force=True)
+        self.batcher = MicroBatcher(models)
+        self.batcher.start()
+
+    async def shutdown(self):
+        if self.batcher is not None:
+            await self.batcher.stop()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            status, body = await self._handle_http(scope, receive)
+            await send({"type": "http.response.start", "status": status,
+                        "headers": [(b"content-type", b"application/json")]})
+            await send({"type": "http.response.body", "body": json.dumps(body, ensure_ascii=False).encode("utf-8")})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.startup()
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _read_json(self, receive):
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        try:
+            return json.loads(body or b"null")
+        except ValueError:
+            raise RequestError("Request body must be valid JSON")
+
+    async def _handle_http(self, scope, receive):
+        method, path = scope["method"], scope["path"].rstrip("/")
+        if self.batcher is None:
+            return 503, {"error": "Model not loaded"}
+        if path == "/health" and method == "GET":
+            return 200, {"status": "ok", "model_loaded": True, "model_version": self.batcher.models.version,
+                         "batches_run": self.batcher.batches_run, "rows_scored": self.batcher.rows_scored}
+        if path not in ("/predict", "/predict/batch"):
+            return 404, {"error": "Not found"}
+        if method != "POST":
+            return 405, {"error": "Use POST"}
+
+        try:
+            payload = await self._read_json(receive)
+            students = payload
+            if path == "/predict/batch":
+                if isinstance(payload, dict):
+                    students = payload.get("students")
+                if not isinstance(students, list) or not students:
+                    raise RequestError("Send a non-empty list of students")
+            else:
+                students = [payload]
+            validated = [validate_student(student) for student in students]
+        except RequestError as e:
+            return 422, {"error": str(e)}
+
+        try:
+            results = await self.batcher.score([values for values, _ in validated])
+        except Exception as e:
+            return 500, {"error": f"Prediction failed: {e}"}
+
+        responses = []
+        for student, (_, missing), result in zip(students, validated, results):
+            response = {column: _to_json_value(result[column]) for column in result_columns}
+            if "student_id" in student:
+                response["student_id"] = student["student_id"]
+            if missing:
+                response["missing_features"] = missing
+            responses.append(response)
+
+        if path == "/predict":
+            return 200, responses[0]
+        return 200, {"results": responses}
+
+
+app = PredictionService()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("prediction_service:app", host=os.getenv("HOST", "127.0.0.1"), port=int(os.getenv("PORT", "8000")))
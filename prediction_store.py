@@ -0,0 +1,378 @@
+# prediction_store.py
+# Storage for logged predictions. The SQLite backend (WAL mode, indexed on student_id and
+# timestamp) turns per-student history and dashboard queries into index lookups instead of
+# full scans of prediction_log.csv. The CSV backend keeps the old file format working.
+#
+# The first time the SQLite store opens it imports the existing prediction_log.csv once,
+# including rows written with the later grade/subject layout that pandas used to skip.
+
+import csv
+import os
+import sqlite3
+import threading
+
+from history_schema import TIMESTAMP_FORMAT, concat_history, history_columns, history_frame, read_history_csv
+from metrics import get_metrics
+from student_rules import features
+
+DEFAULT_CSV_PATH = "prediction_log.csv"
+DEFAULT_SQLITE_PATH = "prediction_log.sqlite3"
+
+_column_types = {
+    "student_id": "TEXT",
+    "timestamp": "TEXT",
+    "grade": "TEXT",
+    "subject": "TEXT",
+    **{feature: "REAL" for feature in features},
+    "predicted_score": "REAL",
+    "category": "TEXT",
+    "learner_profile": "TEXT",
+    "model_version": "TEXT"
+}
+
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def normalize_row(row):
+    """Return a dict with every history column, filling gaps the same way the app does."""
+    normalized = {}
+    for column in history_columns:
+        value = row.get(column)
+        if column in features or column == "predicted_score":
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                value = 0.0 if column in features else None
+        elif column == "timestamp" and hasattr(value, "strftime"):
+            value = value.strftime(TIMESTAMP_FORMAT)
+        elif value is not None:
+            # Empty CSV fields are missing values, not empty labels
+            value = str(value) if value != "" else None
+        normalized[column] = value
+    return normalized
+
+
+# Row layouts the app has written, by field count: before and after model_version was logged
+_row_layouts = {len(columns): columns for columns in (history_columns[:-1], history_columns)}
+
+
+def _parse_csv_line(values, header):
+    if len(values) == len(header):
+        return dict(zip(header, values))
+    layout = _row_layouts.get(len(values))
+    if layout is not None:
+        return dict(zip(layout, values))
+    return None
+
+
+def read_csv_rows(csv_path):
+    """Yield rows from a prediction CSV, tolerating the header/row layout drift.
+
+    Rows with as many fields as the header are read by the header. Rows with as many
+    fields as a later layout (with grade/subject, with model_version) were written by a
+    newer app and are read by that layout.
+    Anything else is skipped, like on_bad_lines='skip'.
+    """
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header:
+            return
+        for values in reader:
+            row = _parse_csv_line(values, header)
+            if row is not None:
+                yield row
+
+
+def read_csv_rows_since(csv_path, offset=0):
+    """Read only the complete lines appended after byte offset. Returns (rows, new_offset)."""
+    with open(csv_path, "rb") as f:
+        header_line = f.readline()
+        header = next(csv.reader([header_line.decode("utf-8")]), None)
+        if not header:
+            return [], 0
+        f.seek(max(offset, len(header_line)))
+        data = f.read()
+    # Leave a partially written last line for the next read
+    complete = data[:data.rfind(b"\n") + 1]
+    rows = []
+    for values in csv.reader(complete.decode("utf-8").splitlines()):
+        row = _parse_csv_line(values, header)
+        if row is not None:
+            rows.append(row)
+    return rows, max(offset, len(header_line)) + len(complete)
+
+
+class CSVPredictionStore:
+    """Append-only CSV log, as used before the SQLite store existed.
+
+    Writes go through a buffered PredictionLogWriter; rotated history lives in Parquet
+    segments next to the log and is read back together with the current CSV.
+    """
+
+    def __init__(self, path=DEFAULT_CSV_PATH, writer=None):
+        from prediction_log_writer import PredictionLogWriter
+
+        self.path = path
+        self.writer = writer or PredictionLogWriter(path)
+        self._frame_cache = (None, None)  # (version, parsed frame)
+
+    def version(self):
+        """Changes whenever the log is written or rotated, or None if there is no history."""
+        from prediction_log_writer import segment_generation
+
+        self.flush()
+        generation = segment_generation(self.path)
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return (generation, None) if generation else None
+        return (generation, stat.st_mtime_ns, stat.st_size)
+
+    def append(self, row, wait=False):
+        """Queue a row for the writer thread; with wait, block until it is on disk (raising if it failed)."""
+        queued = self.writer.write(row, flush=wait)
+        if wait:
+            queued.wait()
+
+    def flush(self):
+        """Write any buffered rows, so reads in this process see them."""
+        self.writer.flush()
+
+    def _read_rows(self, op):
+        from prediction_log_writer import file_lock, list_segments, read_segment_rows
+
+        metrics = get_metrics()
+        rows = []
+        # Under the lock so a rotation cannot move rows between the segments and the CSV mid-read
+        with file_lock(self.path), metrics.span("store.read", backend="csv", op=op):
+            generation = ""
+            for segment_path in list_segments(self.path):
+                rows.extend(read_segment_rows(segment_path))
+                generation = os.path.basename(segment_path)
+            offset = 0
+            if os.path.exists(self.path):
+                csv_rows, offset = read_csv_rows_since(self.path, 0)
+                rows.extend(csv_rows)
+                metrics.increment("store.bytes_read", offset, backend="csv")
+        metrics.increment("store.rows_read", len(rows), backend="csv")
+        return rows, (generation, offset)
+
+    def load_all(self):
+        version = self.version()
+        if version is None:
+            return history_frame([])
+        # Parse the history once per version; callers get a copy they are free to modify
+        cached_version, frame = self._frame_cache
+        if cached_version != version:
+            frame = self._read_frame()
+            self._frame_cache = (version, frame)
+        return frame.copy()
+
+    def _read_frame(self):
+        """The whole history as a typed frame, parsed column-wise without per-row dicts."""
+        from prediction_log_writer import file_lock, header_is_current, list_segments, read_segment_frame
+
+        metrics = get_metrics()
+        with file_lock(self.path), metrics.span("store.read", backend="csv", op="load_all"):
+            frames = [read_segment_frame(segment_path) for segment_path in list_segments(self.path)]
+            if os.path.exists(self.path):
+                if header_is_current(self.path):
+                    frames.append(read_history_csv(self.path))
+                else:
+                    frames.append(history_frame(list(read_csv_rows(self.path))))
+                metrics.increment("store.bytes_read", os.path.getsize(self.path), backend="csv")
+        frame = concat_history(frames)
+        metrics.increment("store.rows_read", len(frame), backend="csv")
+        return frame
+
+    def student_history(self, student_id):
+        df = self.load_all()
+        return df[df["student_id"] == student_id].sort_values("timestamp").reset_index(drop=True)
+
+    def latest_by_student(self):
+        df = self.load_all().dropna(subset=["timestamp"])
+        return df.sort_values("timestamp", ascending=False).drop_duplicates("student_id", keep="first")
+
+    def count(self):
+        return len(self.load_all())
+
+    def rows_since(self, cursor=None):
+        """Rows appended after cursor, a (segment generation, byte offset) pair.
+
+        Returns (rows, new_cursor, reset). After a rotation everything is read again with reset=True.
+        """
+        from prediction_log_writer import segment_generation
+
+        self.flush()
+        generation = segment_generation(self.path)
+        if cursor is None or cursor[0] != generation or not os.path.exists(self.path) \
+                or os.path.getsize(self.path) < cursor[1]:
+            rows, new_cursor = self._read_rows("rows_since")
+            return [normalize_row(row) for row in rows], new_cursor, cursor is not None
+        metrics = get_metrics()
+        with metrics.span("store.read", backend="csv", op="rows_since"):
+            rows, offset = read_csv_rows_since(self.path, cursor[1])
+        metrics.increment("store.bytes_read", offset - cursor[1], backend="csv")
+        metrics.increment("store.rows_read", len(rows), backend="csv")
+        return [normalize_row(row) for row in rows], (generation, offset), False
+
+    def iter_rows(self):
+        """Every stored row (segments first, then the current CSV), e.g. for migration."""
+        rows, _ = self._read_rows("iter_rows")
+        return iter(rows)
+
+
+class SQLitePredictionStore:
+    """Typed, indexed prediction history in an embedded SQLite database."""
+
+    def __init__(self, path=DEFAULT_SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._create_schema()
+
+    def _connect(self):
+        # One connection per thread; Streamlit serves sessions from several threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _create_schema(self):
+        columns_sql = ",\n".join(f"{_quote(column)} {_column_types[column]}" for column in history_columns)
+        conn = self._connect()
+        with conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS predictions (id INTEGER PRIMARY KEY, {columns_sql})")
+            # Databases created before a column was added (e.g. model_version) get it as NULLs
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(predictions)")}
+            for column in history_columns:
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE predictions ADD COLUMN {_quote(column)} {_column_types[column]}")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_predictions_student ON predictions (student_id, timestamp)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_predictions_timestamp ON predictions (timestamp)")
+            conn.execute("CREATE TABLE IF NOT EXISTS store_meta (name TEXT PRIMARY KEY, value TEXT)")
+
+    def _insert_sql(self):
+        column_list = ", ".join(_quote(column) for column in history_columns)
+        placeholders = ", ".join("?" for _ in history_columns)
+        return f"INSERT INTO predictions ({column_list}) VALUES ({placeholders})"
+
+    def append(self, row, wait=False):
+        # Written synchronously, so there is nothing to wait for
+        self.append_many([row])
+
+    def append_many(self, rows):
+        values = [[normalized[column] for column in history_columns] for normalized in map(normalize_row, rows)]
+        metrics = get_metrics()
+        conn = self._connect()
+        with metrics.span("store.write", backend="sqlite"), conn:
+            conn.executemany(self._insert_sql(), values)
+        metrics.increment("store.rows_written", len(values), backend="sqlite")
+
+    def _query(self, op, where_sql="", params=()):
+        column_list = ", ".join(_quote(column) for column in history_columns)
+        metrics = get_metrics()
+        with metrics.span("store.read", backend="sqlite", op=op):
+            rows = self._connect().execute(f"SELECT {column_list} FROM predictions {where_sql}", params).fetchall()
+        metrics.increment("store.rows_read", len(rows), backend="sqlite")
+        return history_frame(rows)
+
+    def load_all(self):
+        return self._query("load_all", "ORDER BY timestamp")
+
+    def student_history(self, student_id):
+        return self._query("student_history", "WHERE student_id = ? ORDER BY timestamp", (student_id,))
+
+    def latest_by_student(self):
+        # Latest row per student; ties on timestamp go to the row written last
+        return self._query("latest_by_student", """
+            WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (PARTITION BY student_id ORDER BY timestamp DESC, id DESC) AS rn
+                    FROM predictions
+                ) WHERE rn = 1
+            ) ORDER BY timestamp DESC""")
+
+    def count(self):
+        return self._connect().execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+    def version(self):
+        """Changes whenever rows are added: the last row id (the table is append-only)."""
+        return self._connect().execute("SELECT COALESCE(MAX(id), 0) FROM predictions").fetchone()[0]
+
+    def rows_since(self, cursor=None):
+        """Rows inserted after cursor (the last seen id). Returns (rows, new_cursor, reset)."""
+        conn = self._connect()
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM predictions").fetchone()[0]
+        reset = cursor is not None and last_id < cursor
+        start = 0 if reset or cursor is None else cursor
+        column_list = ", ".join(_quote(column) for column in history_columns)
+        metrics = get_metrics()
+        with metrics.span("store.read", backend="sqlite", op="rows_since"):
+            result = conn.execute(f"SELECT id, {column_list} FROM predictions WHERE id > ? AND id <= ? ORDER BY id",
+                                  (start, last_id)).fetchall()
+        metrics.increment("store.rows_read", len(result), backend="sqlite")
+        rows = [dict(zip(history_columns, values[1:])) for values in result]
+        return rows, last_id, reset
+
+    def get_meta(self, name):
+        row = self._connect().execute("SELECT value FROM store_meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, name, value):
+        conn = self._connect()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO store_meta (name, value) VALUES (?, ?)", (name, value))
+
+    def migrate_csv(self, csv_path=DEFAULT_CSV_PATH):
+        """Import an existing CSV log once. Returns the number of rows imported."""
+        if self.get_meta("migrated_csv") or not os.path.exists(csv_path):
+            return 0
+        rows = list(CSVPredictionStore(csv_path).iter_rows())
+        conn = self._connect()
+        with conn:
+            conn.executemany(self._insert_sql(), [[r[column] for column in history_columns] for r in map(normalize_row, rows)])
+            conn.execute("INSERT OR REPLACE INTO store_meta (name, value) VALUES (?, ?)",
+                         ("migrated_csv", os.path.abspath(csv_path)))
+        return len(rows)
+
+
+_prediction_store = None
+_store_lock = threading.Lock()
+
+
+def get_prediction_store():
+    """Return the process-wide store chosen by PREDICTION_STORE ('sqlite' by default, or 'csv').
+
+    Once a Parquet archive exists at HISTORY_ARCHIVE_PATH (see history_archive.py), history
+    queries are answered from it plus the rows logged since the last compaction.
+    """
+    global _prediction_store
+    with _store_lock:
+        if _prediction_store is None:
+            backend = os.getenv("PREDICTION_STORE", "sqlite").lower()
+            if backend == "csv":
+                store = CSVPredictionStore(os.getenv("PREDICTION_LOG_PATH", DEFAULT_CSV_PATH))
+            else:
+                store = SQLitePredictionStore(os.getenv("PREDICTION_DB_PATH", DEFAULT_SQLITE_PATH))
+                imported = store.migrate_csv(DEFAULT_CSV_PATH)
+                if imported:
+                    print(f"✅ Imported {imported} rows from {DEFAULT_CSV_PATH} into {store.path}")
+
+            from history_archive import DEFAULT_ARCHIVE_PATH, ArchivedPredictionStore, HistoryArchive
+
+            archive = HistoryArchive(os.getenv("HISTORY_ARCHIVE_PATH", DEFAULT_ARCHIVE_PATH))
+            _prediction_store = ArchivedPredictionStore(store, archive) if archive.exists() else store
+        return _prediction_store
+
+
+def set_prediction_store(store):
+    """Replace the process-wide store (e.g. with a temporary database)."""
+    global _prediction_store
+    with _store_lock:
+        _prediction_store = store
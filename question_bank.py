@@ -0,0 +1,160 @@
+# question_bank.py
+# SQLite store of individual validated quiz questions per (grade, subject, difficulty).
+# Questions are deduplicated by fingerprint, so the same question generated twice is
+# stored once. assemble_quiz() builds a new quiz from stored questions, preferring the
+# least-served ones, and only asks the LLM for the questions the bank is missing.
+# Like the quiz cache, the bank is emptied when the syllabus changes
+# (ensure_syllabus_version), so it never serves questions written for old topics.
+
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from quiz_schema import QuizQuestion, option_letters, parse_quiz
+
+DEFAULT_BANK_PATH = "question_bank.sqlite3"
+
+
+class QuestionBank:
+    """Deduplicated, validated questions that can be recombined into new quizzes."""
+
+    def __init__(self, path=DEFAULT_BANK_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS questions (
+                    id INTEGER PRIMARY KEY,
+                    grade TEXT NOT NULL,
+                    subject TEXT NOT NULL,
+                    difficulty TEXT NOT NULL,
+                    topic TEXT,
+                    question TEXT NOT NULL,
+                    option_a TEXT NOT NULL,
+                    option_b TEXT NOT NULL,
+                    option_c TEXT NOT NULL,
+                    option_d TEXT NOT NULL,
+                    correct TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    times_served INTEGER NOT NULL DEFAULT 0,
+                    UNIQUE (grade, subject, difficulty, fingerprint)
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_questions_context ON questions (grade, subject, difficulty, times_served)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def ensure_syllabus_version(self, version):
+        """Delete every stored question if they were generated from a different syllabus."""
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE name = 'syllabus_version'").fetchone()
+            if row is None or row[0] != version:
+                conn.execute("DELETE FROM questions")
+                conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('syllabus_version', ?)", (version,))
+
+    def add_questions(self, grade, subject, difficulty, questions):
+        """Store valid questions, skipping duplicates. Returns how many were new."""
+        rows = [
+            (grade, subject, difficulty, question.topic, question.question,
+             *(question.options[letter] for letter in option_letters),
+             question.correct, question.fingerprint(), time.time())
+            for question in questions if not question.validate()
+        ]
+        with self._lock, self._connect() as conn:
+            before = conn.total_changes
+            conn.executemany("""
+                INSERT OR IGNORE INTO questions (grade, subject, difficulty, topic, question,
+                    option_a, option_b, option_c, option_d, correct, fingerprint, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", rows)
+            return conn.total_changes - before
+
+    def add_quiz_text(self, grade, subject, difficulty, quiz_text, topic=None):
+        """Parse LLM quiz markdown and store its valid questions. Returns how many were new.
+
+        Questions without a topic of their own get `topic`; it stays NULL if that is None.
+        """
+        questions, _ = parse_quiz(quiz_text, difficulty, topic)
+        return self.add_questions(grade, subject, difficulty, questions)
+
+    def count(self, grade, subject, difficulty):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM questions WHERE grade = ? AND subject = ? AND difficulty = ?",
+                                (grade, subject, difficulty)).fetchone()[0]
+
+    def fresh_count(self, grade, subject, difficulty):
+        """Questions of a context that have never been served."""
+        with self._connect() as conn:
+            return conn.execute("""
+                SELECT COUNT(*) FROM questions
+                WHERE grade = ? AND subject = ? AND difficulty = ? AND times_served = 0""",
+                (grade, subject, difficulty)).fetchone()[0]
+
+    def context_counts(self):
+        """{(grade, subject, difficulty): (total, never served)} for every stored context."""
+        with self._connect() as conn:
+            rows = conn.execute("""
+                SELECT grade, subject, difficulty, COUNT(*), SUM(times_served = 0)
+                FROM questions GROUP BY grade, subject, difficulty""").fetchall()
+        return {(grade, subject, difficulty): (total, fresh) for grade, subject, difficulty, total, fresh in rows}
+
+    def take(self, grade, subject, difficulty, n):
+        """Pick up to n questions, least served first (random among equals), and mark them served."""
+        with self._lock, self._connect() as conn:
+            rows = conn.execute("""
+                SELECT id, topic, question, option_a, option_b, option_c, option_d, correct
+                FROM questions WHERE grade = ? AND subject = ? AND difficulty = ?
+                ORDER BY times_served, RANDOM() LIMIT ?""", (grade, subject, difficulty, n)).fetchall()
+            conn.executemany("UPDATE questions SET times_served = times_served + 1 WHERE id = ?",
+                             [(row[0],) for row in rows])
+        questions = [QuizQuestion(row[2], dict(zip(option_letters, row[3:7])), row[7], difficulty, row[1])
+                     for row in rows]
+        random.shuffle(questions)
+        return questions
+
+    def assemble_quiz(self, grade, subject, difficulty, num_q=5, generate_fn=None):
+        """Build a num_q quiz from the bank, generating only the missing questions.
+
+        generate_fn(missing_count) must return quiz markdown; it is called at most once.
+        Returns the list of QuizQuestion objects (fewer than num_q if generation fell short).
+        """
+        questions = self.take(grade, subject, difficulty, num_q)
+        missing = num_q - len(questions)
+        if missing > 0 and generate_fn is not None:
+            quiz_text = generate_fn(missing)
+            if quiz_text and not quiz_text.startswith("❌"):
+                new_questions, _ = parse_quiz(quiz_text, difficulty)
+                self.add_questions(grade, subject, difficulty, new_questions)
+                seen = {question.fingerprint() for question in questions}
+                for question in new_questions:
+                    if len(questions) < num_q and question.fingerprint() not in seen:
+                        questions.append(question)
+                        seen.add(question.fingerprint())
+        return questions
+
+
+_question_bank = None
+_bank_lock = threading.Lock()
+
+
+def get_question_bank():
+    """Return the process-wide question bank at QUESTION_BANK_PATH (or None if disabled with 'off')."""
+    global _question_bank
+    with _bank_lock:
+        if _question_bank is None:
+            path = os.getenv("QUESTION_BANK_PATH", DEFAULT_BANK_PATH)
+            if path == "off":
+                return None
+            _question_bank = QuestionBank(path)
+        return _question_bank
+
+
+def set_question_bank(bank):
+    global _question_bank
+    with _bank_lock:
+        _question_bank = bank
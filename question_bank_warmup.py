@@ -0,0 +1,273 @@
+# question_bank_warmup.py
+# Fill the question bank ahead of time for every quiz context the app can ask for:
+# 12 grades x 4 subjects x the 3 levels map_difficulty returns = 144 contexts.
+# Each context is topped up until it holds `depth` questions that were never served, using
+# the same prompt and syllabus topics as generate_quiz (through QuizGenerationService, so
+# rate limits, retries and model fallback apply). On a quiz cache miss, quizzes are then
+# assembled from the bank without calling the LLM; live generation is only needed when both
+# miss. (`python quiz_cache.py` pre-generates whole quizzes for the quiz cache instead, one
+# request at a time.) A bank filled from an older syllabus is emptied before warming.
+#
+# While the app runs, BankRefiller tops a context up in the background once its unserved
+# questions drop below QUESTION_BANK_REFILL_BELOW.
+#
+# Usage:
+#   python question_bank_warmup.py                          # all 144 contexts
+#   python question_bank_warmup.py --depth 30 --concurrency 8 --rpm 60
+#   python question_bank_warmup.py --grades "Grade 5" --subjects Math --difficulties easy
+#   python question_bank_warmup.py --status                 # show what the bank holds
+#   python question_bank_warmup.py --fake                   # offline run against FakeLLMClient
+
+import argparse
+import itertools
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from metrics import get_metrics
+from question_bank import DEFAULT_BANK_PATH, QuestionBank, get_question_bank
+from quiz_service import QuizGenerationService, QuizJob
+from student_rules import difficulty_levels, grade_options, subject_options
+
+DEFAULT_DEPTH = int(os.getenv("QUESTION_BANK_DEPTH", "20"))
+DEFAULT_REFILL_BELOW = int(os.getenv("QUESTION_BANK_REFILL_BELOW", "10"))
+DEFAULT_CONCURRENCY = int(os.getenv("QUESTION_BANK_CONCURRENCY", "4"))
+DEFAULT_QUESTIONS_PER_REQUEST = 10
+DEFAULT_MAX_ROUNDS = 3
+
+
+def quiz_contexts(grades=None, subjects=None, difficulties=None):
+    """Every (grade, subject, difficulty) combination, optionally restricted."""
+    return list(itertools.product(grades or grade_options, subjects or subject_options,
+                                  difficulties or difficulty_levels))
+
+
+def plan_jobs(bank, contexts, depth, questions_per_request=DEFAULT_QUESTIONS_PER_REQUEST):
+    """QuizJobs that would bring each context up to `depth` never-served questions."""
+    counts = bank.context_counts()
+    jobs = []
+    for context in contexts:
+        missing = depth - counts.get(context, (0, 0))[1]
+        while missing > 0:
+            num_q = min(questions_per_request, missing)
+            jobs.append(QuizJob(*context, num_q=num_q, job_id=context))
+            missing -= num_q
+    return jobs
+
+
+def warm_bank(bank, depth=DEFAULT_DEPTH, concurrency=DEFAULT_CONCURRENCY, contexts=None,
+              questions_per_request=DEFAULT_QUESTIONS_PER_REQUEST, max_rounds=DEFAULT_MAX_ROUNDS,
+              service=None, progress=None, source="warmup"):
+    """Generate questions until every context holds `depth` never-served ones.
+
+    Model answers overlap, so planning is repeated for up to max_rounds rounds, stopping
+    early when a round adds nothing new. progress(result, added) is called per request.
+    Returns a report dict: contexts, requests, failed, added, short (contexts still
+    below depth) and seconds.
+    """
+    from helper_functions import syllabus_version
+
+    bank.ensure_syllabus_version(syllabus_version())
+    contexts = list(contexts or quiz_contexts())
+    report = {"contexts": len(contexts), "requests": 0, "failed": 0, "added": 0, "short": [], "seconds": 0.0}
+    owns_service = service is None
+    if owns_service:
+        # Fresh questions are the point here, so the quiz cache is not consulted
+        service = QuizGenerationService(max_workers=concurrency, use_cache=False)
+    started = time.monotonic()
+    metrics = get_metrics()
+    try:
+        with metrics.span("bank.warmup", source=source):
+            for _ in range(max_rounds):
+                jobs = plan_jobs(bank, contexts, depth, questions_per_request)
+                if not jobs:
+                    break
+                added_this_round = 0
+                for future in as_completed([service.submit(job) for job in jobs]):
+                    result = future.result()
+                    added = 0
+                    report["requests"] += 1
+                    if result.ok:
+                        added = bank.add_quiz_text(*result.job.job_id, result.quiz_text)
+                    else:
+                        report["failed"] += 1
+                    added_this_round += added
+                    if progress is not None:
+                        progress(result, added)
+                report["added"] += added_this_round
+                metrics.increment("bank.questions_added", added_this_round, source=source)
+                if added_this_round == 0:
+                    break
+    finally:
+        if owns_service:
+            service.close()
+    counts = bank.context_counts()
+    report["short"] = [context for context in contexts if counts.get(context, (0, 0))[1] < depth]
+    report["seconds"] = time.monotonic() - started
+    return report
+
+
+class BankRefiller:
+    """Tops up contexts in the background, one at a time, when their unserved questions run low."""
+
+    def __init__(self, bank, depth=DEFAULT_DEPTH, refill_below=DEFAULT_REFILL_BELOW, service=None):
+        self.bank = bank
+        self.depth = depth
+        self.refill_below = refill_below
+        self.last_error = None
+        self._service = service
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bank-refill")
+
+    def request(self, grade, subject, difficulty):
+        """Schedule a check of this context. Returns a Future, or None if one is already queued.
+
+        Costs the caller nothing but a set lookup; counting and generation happen on the
+        refill thread.
+        """
+        context = (grade, subject, difficulty)
+        with self._lock:
+            if context in self._pending:
+                return None
+            self._pending.add(context)
+        return self._executor.submit(self._refill, context)
+
+    def _refill(self, context):
+        try:
+            if self.bank.fresh_count(*context) >= self.refill_below:
+                return None
+            if self._service is None:
+                self._service = QuizGenerationService(max_workers=1, use_cache=False)
+            is_working, _ = self._service.manager.check_connection()
+            if not is_working:
+                return None
+            get_metrics().increment("bank.refills")
+            return warm_bank(self.bank, self.depth, contexts=[context], service=self._service, source="refill")
+        except Exception as e:
+            self.last_error = e
+            print(f"Warning: could not refill the question bank for {context}: {e}")
+            return None
+        finally:
+            with self._lock:
+                self._pending.discard(context)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        if self._service is not None:
+            self._service.close()
+
+
+_bank_refiller = None
+_refiller_lock = threading.Lock()
+
+
+def get_bank_refiller():
+    """Return the process-wide refiller, or None if the bank is off or QUESTION_BANK_REFILL=off."""
+    global _bank_refiller
+    with _refiller_lock:
+        if _bank_refiller is None:
+            question_bank = get_question_bank()
+            if question_bank is None or os.getenv("QUESTION_BANK_REFILL", "on") == "off":
+                return None
+            _bank_refiller = BankRefiller(question_bank)
+        return _bank_refiller
+
+
+def set_bank_refiller(refiller):
+    global _bank_refiller
+    with _refiller_lock:
+        _bank_refiller = refiller
+
+
+_fake_counter = itertools.count(1)
+
+
+def _fake_quiz(prompt, model_name):
+    """Distinct, well-formed questions for offline runs (FakeLLMClient response callable)."""
+    match = re.search(r"quiz for (.+?)\.(?s:.*)generate (\d+) multiple-choice", prompt)
+    if match is None:
+        return "API test successful"  # The connection probe
+    context, num_q = match.group(1), int(match.group(2))
+    questions = []
+    for number in range(1, num_q + 1):
+        n = next(_fake_counter)
+        questions.append(f"**Question {number}:** Practice question {n} for {context}?\n"
+                         f"A) {n}\nB) {n + 1}\nC) {n + 2}\nD) {n + 3}\n**Correct Answer:** A")
+    return "\n\n".join(questions)
+
+
+def print_status(bank, contexts, depth):
+    counts = bank.context_counts()
+    ready = 0
+    for context in contexts:
+        total, fresh = counts.get(context, (0, 0))
+        ready += fresh >= depth
+        print(f"{'✅' if fresh >= depth else '⚠️'} {' / '.join(context):32s} {fresh:4d} unserved {total:5d} total")
+    print(f"{ready}/{len(contexts)} contexts hold at least {depth} unserved questions")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-generate quiz questions for every grade/subject/difficulty.")
+    parser.add_argument("--bank", default=os.getenv("QUESTION_BANK_PATH", DEFAULT_BANK_PATH), help="Question bank SQLite file")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH, help="Unserved questions to keep per context")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Parallel LLM requests")
+    parser.add_argument("--per-request", type=int, default=DEFAULT_QUESTIONS_PER_REQUEST, help="Questions asked for per LLM request")
+    parser.add_argument("--rpm", type=float, help="Requests per minute allowed per model")
+    parser.add_argument("--grades", nargs="*", choices=grade_options)
+    parser.add_argument("--subjects", nargs="*", choices=subject_options)
+    parser.add_argument("--difficulties", nargs="*", choices=difficulty_levels)
+    parser.add_argument("--status", action="store_true", help="Only report how full the bank is")
+    parser.add_argument("--fake", action="store_true", help="Use the offline FakeLLMClient instead of Gemini")
+    args = parser.parse_args(argv)
+
+    if args.bank == "off":
+        print("❌ QUESTION_BANK_PATH is 'off'; pass --bank to choose a bank file")
+        return 1
+    from helper_functions import syllabus_version
+
+    bank = QuestionBank(args.bank)
+    bank.ensure_syllabus_version(syllabus_version())
+    contexts = quiz_contexts(args.grades, args.subjects, args.difficulties)
+    if args.status:
+        print_status(bank, contexts, args.depth)
+        return 0
+
+    import llm_client
+    from helper_functions import api_key, quiz_model_names
+
+    if args.fake:
+        manager = llm_client.set_llm_client(llm_client.FakeLLMClient(response=_fake_quiz))
+    else:
+        manager = llm_client.get_connection_manager(api_key_configured=bool(api_key))
+    is_working, message = manager.check_connection()
+    if not is_working:
+        print(f"❌ API not working: {message}")
+        return 1
+
+    rate_limits = {name: args.rpm for name in quiz_model_names} if args.rpm else None
+    done = [0]
+
+    def progress(result, added):
+        done[0] += 1
+        grade, subject, difficulty = result.job.job_id
+        status = f"+{added}" if result.ok else f"❌ {result.error}"
+        print(f"[{done[0]}] {grade} / {subject} / {difficulty}: {status} ({result.latency_seconds:.1f}s)")
+
+    with QuizGenerationService(manager, max_workers=args.concurrency, rate_limits=rate_limits, use_cache=False) as service:
+        report = warm_bank(bank, args.depth, contexts=contexts, questions_per_request=args.per_request,
+                           service=service, progress=progress)
+
+    print(f"✅ {report['added']} questions added with {report['requests']} requests "
+          f"({report['failed']} failed) in {report['seconds']:.1f}s")
+    if report["short"]:
+        print(f"⚠️ {len(report['short'])} of {report['contexts']} contexts are still below {args.depth} unserved questions")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
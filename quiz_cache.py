@@ -0,0 +1,276 @@
+# quiz_cache.py
+# Cache of generated quizzes keyed by (grade, subject, difficulty, num_q, topics).
+# Each key keeps a small pool of variants so repeated requests can rotate between
+# different quizzes without calling the LLM. Entries expire by TTL, the least recently
+# used keys are evicted, and the whole cache is cleared when the syllabus changes.
+#
+# Warm every grade/subject/difficulty combination offline with:
+#   python quiz_cache.py --variants 3
+
+import argparse
+import hashlib
+import itertools
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_CACHE_PATH = "quiz_cache.sqlite3"
+DEFAULT_POOL_SIZE = 3
+DEFAULT_MAX_KEYS = 1000
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+
+def make_cache_key(grade, subject, difficulty, num_q, topics=""):
+    """Build the cache key. Topics are hashed in so a changed syllabus row never hits old quizzes."""
+    topics_hash = hashlib.sha1(str(topics).encode("utf-8")).hexdigest()[:12]
+    return f"{grade}|{subject}|{difficulty}|{num_q}|{topics_hash}"
+
+
+class MemoryQuizCacheBackend:
+    """In-process backend; an OrderedDict keeps keys in least-recently-used order."""
+
+    def __init__(self):
+        self._entries = OrderedDict()  # key -> list of (created_at, quiz_text)
+        self._meta = {}
+
+    def get_variants(self, key):
+        return list(self._entries.get(key, []))
+
+    def touch(self, key, now):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+
+    def add_variant(self, key, quiz_text, now, pool_size):
+        variants = self._entries.setdefault(key, [])
+        variants.append((now, quiz_text))
+        del variants[:-pool_size]
+        self._entries.move_to_end(key)
+
+    def evict(self, max_keys, expires_before):
+        for key in list(self._entries):
+            fresh = [variant for variant in self._entries[key] if variant[0] >= expires_before]
+            if fresh:
+                self._entries[key] = fresh
+            else:
+                del self._entries[key]
+        while len(self._entries) > max_keys:
+            self._entries.popitem(last=False)
+
+    def key_count(self):
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+
+    def get_meta(self, name):
+        return self._meta.get(name)
+
+    def set_meta(self, name, value):
+        self._meta[name] = value
+
+
+class SQLiteQuizCacheBackend:
+    """On-disk backend so the cache survives restarts and can be warmed offline."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS quiz_variants (
+                    cache_key TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    quiz_text TEXT NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_quiz_variants_key ON quiz_variants (cache_key)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS quiz_keys (
+                    cache_key TEXT PRIMARY KEY,
+                    last_access REAL NOT NULL
+                )""")
+            conn.execute("CREATE TABLE IF NOT EXISTS quiz_cache_meta (name TEXT PRIMARY KEY, value TEXT)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def get_variants(self, key):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT created_at, quiz_text FROM quiz_variants WHERE cache_key = ? ORDER BY rowid", (key,)
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def touch(self, key, now):
+        with self._connect() as conn:
+            conn.execute("UPDATE quiz_keys SET last_access = ? WHERE cache_key = ?", (now, key))
+
+    def add_variant(self, key, quiz_text, now, pool_size):
+        with self._connect() as conn:
+            conn.execute("INSERT INTO quiz_variants (cache_key, created_at, quiz_text) VALUES (?, ?, ?)",
+                         (key, now, quiz_text))
+            conn.execute("""
+                DELETE FROM quiz_variants WHERE cache_key = ? AND rowid NOT IN (
+                    SELECT rowid FROM quiz_variants WHERE cache_key = ? ORDER BY rowid DESC LIMIT ?
+                )""", (key, key, pool_size))
+            conn.execute("INSERT OR REPLACE INTO quiz_keys (cache_key, last_access) VALUES (?, ?)", (key, now))
+
+    def evict(self, max_keys, expires_before):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM quiz_variants WHERE created_at < ?", (expires_before,))
+            conn.execute("DELETE FROM quiz_keys WHERE cache_key NOT IN (SELECT cache_key FROM quiz_variants)")
+            conn.execute("""
+                DELETE FROM quiz_keys WHERE cache_key NOT IN (
+                    SELECT cache_key FROM quiz_keys ORDER BY last_access DESC LIMIT ?
+                )""", (max_keys,))
+            conn.execute("DELETE FROM quiz_variants WHERE cache_key NOT IN (SELECT cache_key FROM quiz_keys)")
+
+    def key_count(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM quiz_keys").fetchone()[0]
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM quiz_variants")
+            conn.execute("DELETE FROM quiz_keys")
+
+    def get_meta(self, name):
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM quiz_cache_meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, name, value):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO quiz_cache_meta (name, value) VALUES (?, ?)", (name, value))
+
+
+class QuizCache:
+    """Pool of quiz variants per key with LRU/TTL eviction, on top of a memory or SQLite backend."""
+
+    def __init__(self, backend=None, pool_size=DEFAULT_POOL_SIZE, max_keys=DEFAULT_MAX_KEYS,
+                 ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.backend = backend if backend is not None else MemoryQuizCacheBackend()
+        self.pool_size = pool_size
+        self.max_keys = max_keys
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._next_variant = {}
+        self._lock = threading.Lock()
+
+    def ensure_syllabus_version(self, version):
+        """Clear the cache if it was filled from a different syllabus."""
+        with self._lock:
+            if self.backend.get_meta("syllabus_version") != version:
+                self.backend.clear()
+                self._next_variant.clear()
+                self.backend.set_meta("syllabus_version", version)
+
+    def get(self, key):
+        """Return a cached quiz for key, rotating through the pool, or None on a miss."""
+        with self._lock:
+            now = time.time()
+            variants = [text for created_at, text in self.backend.get_variants(key)
+                        if now - created_at < self.ttl_seconds]
+            if not variants:
+                self.misses += 1
+                return None
+            self.hits += 1
+            index = self._next_variant.get(key, 0) % len(variants)
+            self._next_variant[key] = index + 1
+            self.backend.touch(key, now)
+            return variants[index]
+
+    def variant_count(self, key):
+        now = time.time()
+        return sum(1 for created_at, _ in self.backend.get_variants(key) if now - created_at < self.ttl_seconds)
+
+    def put(self, key, quiz_text):
+        """Add a quiz to the key's pool, dropping the oldest variant once the pool is full."""
+        with self._lock:
+            now = time.time()
+            self.backend.add_variant(key, quiz_text, now, self.pool_size)
+            self.backend.evict(self.max_keys, now - self.ttl_seconds)
+
+    def clear(self):
+        with self._lock:
+            self.backend.clear()
+            self._next_variant.clear()
+
+
+_quiz_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_quiz_cache():
+    """Return the process-wide quiz cache (SQLite at QUIZ_CACHE_PATH, or in memory if set to ':memory:')."""
+    global _quiz_cache
+    with _cache_lock:
+        if _quiz_cache is None:
+            path = os.getenv("QUIZ_CACHE_PATH", DEFAULT_CACHE_PATH)
+            try:
+                backend = MemoryQuizCacheBackend() if path == ":memory:" else SQLiteQuizCacheBackend(path)
+            except sqlite3.Error as e:
+                print(f"⚠️ Could not open quiz cache at {path}, using memory instead: {e}")
+                backend = MemoryQuizCacheBackend()
+            _quiz_cache = QuizCache(backend)
+        return _quiz_cache
+
+
+def set_quiz_cache(cache):
+    """Replace the process-wide quiz cache (None disables caching in generate_quiz)."""
+    global _quiz_cache
+    with _cache_lock:
+        _quiz_cache = cache
+
+
+def warm_cache(generate_fn, grades, subjects, difficulties, num_q=5, variants=DEFAULT_POOL_SIZE, cache=None):
+    """Fill the pool for every combination. generate_fn(grade, subject, difficulty, num_q) must bypass the cache."""
+    from helper_functions import get_topics_for, syllabus_version
+
+    cache = cache if cache is not None else get_quiz_cache()
+    cache.ensure_syllabus_version(syllabus_version())
+    generated = failed = 0
+    for grade, subject, difficulty in itertools.product(grades, subjects, difficulties):
+        key = make_cache_key(grade, subject, difficulty, num_q, get_topics_for(grade, subject))
+        for _ in range(max(variants - cache.variant_count(key), 0)):
+            quiz_text = generate_fn(grade, subject, difficulty, num_q)
+            if quiz_text.startswith("❌"):
+                failed += 1
+                print(f"❌ {grade} {subject} {difficulty}: {quiz_text}")
+                break
+            cache.put(key, quiz_text)
+            generated += 1
+    return generated, failed
+
+
+def main(argv=None):
+    from student_rules import grade_options, subject_options, difficulty_levels
+
+    parser = argparse.ArgumentParser(description="Pre-generate quizzes for every grade/subject/difficulty.")
+    parser.add_argument("--variants", type=int, default=DEFAULT_POOL_SIZE, help="Quizzes to keep per combination")
+    parser.add_argument("--num-q", type=int, default=5, help="Questions per quiz")
+    parser.add_argument("--grades", nargs="*", default=grade_options)
+    parser.add_argument("--subjects", nargs="*", default=subject_options)
+    parser.add_argument("--difficulties", nargs="*", default=difficulty_levels)
+    args = parser.parse_args(argv)
+
+    from helper_functions import generate_quiz
+
+    cache = get_quiz_cache()
+    cache.pool_size = max(cache.pool_size, args.variants)
+
+    def generate_uncached(grade, subject, difficulty, num_q):
+        return generate_quiz(grade, subject, difficulty, num_q, use_cache=False)
+
+    generated, failed = warm_cache(generate_uncached, args.grades, args.subjects, args.difficulties,
+                                   args.num_q, args.variants, cache)
+    print(f"✅ Generated {generated} quizzes ({failed} combinations failed)")
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
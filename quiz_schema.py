@@ -0,0 +1,127 @@
+# quiz_schema.py
+# Structured form of a multiple-choice quiz: a question, four options A-D, the correct
+# letter, a difficulty and a topic. parse_quiz() turns the LLM's markdown (the format
+# requested by build_quiz_prompt) into QuizQuestion objects and reports anything that
+# does not validate; render_quiz_markdown() turns questions back into that markdown.
+
+import hashlib
+import json
+import re
+
+option_letters = ["A", "B", "C", "D"]
+
+# **Question 3:** text   /   Question 3. text   /   3) text
+_question_re = re.compile(r"^\s*(?:\*\*)?\s*(?:Question\s*)?(\d+)\s*[:.)]\s*(?:\*\*)?\s*(.*)$", re.IGNORECASE)
+# A) text   /   A. text   /   (A) text   /   - A) text
+_option_re = re.compile(r"^\s*[-*]?\s*\(?([A-Da-d])[).:]\s*(.+?)\s*$")
+# **Correct Answer:** B   /   Answer: B) text
+_answer_re = re.compile(r"^\s*(?:\*\*)?\s*(?:Correct\s+)?Answer\s*:?\s*(?:\*\*)?\s*:?\s*\(?([A-Da-d])\b", re.IGNORECASE)
+
+
+def _normalize_text(text):
+    return re.sub(r"\s+", " ", text.replace("**", "")).strip()
+
+
+class QuizQuestion:
+    """One multiple-choice question with options keyed by letter."""
+
+    def __init__(self, question, options, correct, difficulty=None, topic=None):
+        self.question = question
+        self.options = dict(options)
+        self.correct = correct.upper() if correct else correct
+        self.difficulty = difficulty
+        self.topic = topic
+
+    def fingerprint(self):
+        """Stable id for deduplication: the normalized question text and options."""
+        text = _normalize_text(self.question).lower() + "|" + "|".join(
+            _normalize_text(self.options.get(letter, "")).lower() for letter in option_letters)
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def validate(self):
+        """Return a list of problems; empty if the question is usable."""
+        problems = []
+        if not self.question:
+            problems.append("missing question text")
+        missing = [letter for letter in option_letters if not self.options.get(letter)]
+        if missing:
+            problems.append(f"missing options {', '.join(missing)}")
+        elif len({_normalize_text(self.options[letter]).lower() for letter in option_letters}) < 4:
+            problems.append("duplicate options")
+        if self.correct not in option_letters:
+            problems.append("missing or invalid correct answer")
+        return problems
+
+    def to_dict(self):
+        return {
+            "question": self.question,
+            "options": {letter: self.options.get(letter) for letter in option_letters},
+            "correct": self.correct,
+            "difficulty": self.difficulty,
+            "topic": self.topic
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["question"], data["options"], data["correct"], data.get("difficulty"), data.get("topic"))
+
+
+def parse_quiz(text, difficulty=None, topic=None):
+    """Parse quiz markdown (or a JSON list of question dicts). Returns (questions, errors).
+
+    Only questions that pass validation are returned; the others are described in errors.
+    """
+    stripped = text.strip()
+    if stripped.startswith("["):
+        try:
+            questions = [QuizQuestion.from_dict(item) for item in json.loads(stripped)]
+            for question in questions:
+                question.difficulty = question.difficulty or difficulty
+                question.topic = question.topic or topic
+            return _keep_valid(questions)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            pass  # Fall back to the markdown parser
+
+    questions = []
+    current = None
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        answer_match = _answer_re.match(line)
+        if answer_match and current is not None:
+            current.correct = answer_match.group(1).upper()
+            continue
+        option_match = _option_re.match(line)
+        if option_match and current is not None:
+            current.options[option_match.group(1).upper()] = _normalize_text(option_match.group(2))
+            continue
+        question_match = _question_re.match(line)
+        if question_match:
+            current = QuizQuestion(_normalize_text(question_match.group(2)), {}, None, difficulty, topic)
+            questions.append(current)
+        elif current is not None and not current.options:
+            # Question text continued on the next line
+            current.question = _normalize_text(current.question + " " + line)
+    return _keep_valid(questions)
+
+
+def _keep_valid(questions):
+    valid, errors = [], []
+    for number, question in enumerate(questions, start=1):
+        problems = question.validate()
+        if problems:
+            errors.append(f"Question {number}: {'; '.join(problems)}")
+        else:
+            valid.append(question)
+    return valid, errors
+
+
+def render_quiz_markdown(questions):
+    """Render questions in the same markdown layout the LLM is asked to produce."""
+    blocks = []
+    for number, question in enumerate(questions, start=1):
+        lines = [f"**Question {number}:** {question.question}"]
+        lines += [f"{letter}) {question.options[letter]}" for letter in option_letters]
+        lines.append(f"**Correct Answer:** {question.correct}")
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
@@ -0,0 +1,208 @@
+# quiz_service.py
+# Concurrent quiz generation for many students at once (e.g. a dashboard cohort).
+# Jobs run on a bounded thread pool (the Gemini SDK is blocking), with per-model rate
+# limits, per-call timeouts, retries with exponential backoff, and an optional "hedged"
+# mode that also asks the next model if the first has not answered within hedge_after_ms.
+
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from llm_client import get_connection_manager
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_TIMEOUT_SECONDS = 60
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_BACKOFF_SECONDS = 1.0
+
+
+class RateLimiter:
+    """Token bucket allowing `rate_per_minute` calls per minute with bursts up to `burst`."""
+
+    def __init__(self, rate_per_minute, burst=None):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = burst if burst is not None else max(1, int(rate_per_minute // 60) or 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a call is allowed."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate_per_second)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_seconds = (1 - self.tokens) / self.rate_per_second
+            time.sleep(wait_seconds)
+
+
+class QuizJob:
+    """One quiz request; job_id lets callers match results back to students."""
+
+    def __init__(self, grade, subject, difficulty, num_q=5, job_id=None):
+        self.grade = grade
+        self.subject = subject
+        self.difficulty = difficulty
+        self.num_q = num_q
+        self.job_id = job_id
+
+
+class QuizResult:
+    def __init__(self, job, quiz_text=None, model_name=None, attempts=0, latency_seconds=0.0,
+                 from_cache=False, error=None):
+        self.job = job
+        self.quiz_text = quiz_text
+        self.model_name = model_name
+        self.attempts = attempts
+        self.latency_seconds = latency_seconds
+        self.from_cache = from_cache
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class QuizGenerationService:
+    """Runs quiz jobs concurrently against the shared LLM connection manager."""
+
+    def __init__(self, manager=None, model_names=None, max_workers=DEFAULT_MAX_WORKERS,
+                 timeout_seconds=DEFAULT_TIMEOUT_SECONDS, max_retries=DEFAULT_MAX_RETRIES,
+                 backoff_seconds=DEFAULT_BACKOFF_SECONDS, rate_limits=None, hedge_after_ms=None,
+                 use_cache=True):
+        from helper_functions import quiz_model_names
+
+        self.manager = manager if manager is not None else get_connection_manager()
+        self.model_names = list(model_names or quiz_model_names)
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.hedge_after_ms = hedge_after_ms
+        self.use_cache = use_cache
+        # rate_limits: {model_name: requests per minute}
+        self.rate_limiters = {name: RateLimiter(rpm) for name, rpm in (rate_limits or {}).items()}
+        self._jobs = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="quiz-job")
+        # Model calls run on their own pool so a job can stop waiting on a call that timed out
+        self._calls = ThreadPoolExecutor(max_workers=max_workers * 2, thread_name_prefix="quiz-call")
+
+    def close(self):
+        self._jobs.shutdown(wait=True)
+        self._calls.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def submit(self, job):
+        """Queue a QuizJob; returns a Future resolving to a QuizResult."""
+        return self._jobs.submit(self._run_job, job)
+
+    def generate_many(self, jobs):
+        """Run all jobs concurrently and return their results in the same order."""
+        futures = [self.submit(job) for job in jobs]
+        return [future.result() for future in futures]
+
+    def _call_model(self, model_name, prompt):
+        limiter = self.rate_limiters.get(model_name)
+        if limiter is not None:
+            limiter.acquire()
+        response = self.manager.call_model(model_name, prompt, call="service",
+                                           request_options={"timeout": self.timeout_seconds})
+        if not (response and response.text):
+            raise RuntimeError(f"Empty response from {model_name}")
+        return response.text, model_name
+
+    def _first_success(self, calls, deadline):
+        """Wait for the first successful call; returns (text, model_name) or raises the last error.
+
+        calls maps each future to its model name. Every failed or timed-out call is recorded
+        against the model that made it.
+        """
+        pending = set(calls)
+        last_error = TimeoutError("Model call timed out")
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result()
+                except Exception as e:
+                    self.manager.record_failure(calls[future])
+                    last_error = e
+        for future in pending:
+            self.manager.record_failure(calls[future])
+        raise last_error
+
+    def _attempt(self, prompt, model_name, backup_name, tried):
+        """One attempt on model_name, hedged onto backup_name if it is still pending after hedge_after_ms.
+
+        Every model called is appended to `tried`.
+        """
+        deadline = time.monotonic() + self.timeout_seconds
+        tried.append(model_name)
+        calls = {self._calls.submit(self._call_model, model_name, prompt): model_name}
+        if self.hedge_after_ms is not None and backup_name is not None:
+            done, _ = wait(calls, timeout=self.hedge_after_ms / 1000.0)
+            if not done:
+                # Only a slow primary is hedged; one that already failed is left to the caller's next model
+                tried.append(backup_name)
+                calls[self._calls.submit(self._call_model, backup_name, prompt)] = backup_name
+        return self._first_success(calls, deadline)
+
+    def _run_job(self, job):
+        from helper_functions import build_quiz_prompt, get_topics_for, syllabus_version
+        from quiz_cache import get_quiz_cache, make_cache_key
+
+        started = time.monotonic()
+        topics = get_topics_for(job.grade, job.subject)
+        quiz_cache = get_quiz_cache() if self.use_cache else None
+        if quiz_cache is not None:
+            quiz_cache.ensure_syllabus_version(syllabus_version())
+            cache_key = make_cache_key(job.grade, job.subject, job.difficulty, job.num_q, topics)
+            cached_quiz = quiz_cache.get(cache_key)
+            if cached_quiz:
+                return QuizResult(job, cached_quiz, latency_seconds=time.monotonic() - started, from_cache=True)
+
+        # Only a cache miss needs the API; the probe result is cached by the manager
+        is_working, message = self.manager.check_connection()
+        if not is_working:
+            return QuizResult(job, latency_seconds=time.monotonic() - started,
+                              error=f"API not working properly. {message}")
+
+        prompt = build_quiz_prompt(job.grade, job.subject, job.difficulty, job.num_q, topics)
+        attempts = 0
+        last_error = None
+        for retry in range(self.max_retries + 1):
+            models = self.manager.ordered_models(self.model_names)
+            tried = []
+            for index, model_name in enumerate(models):
+                if model_name in tried:
+                    continue  # Already called as the hedge of the previous model
+                backup_name = models[index + 1] if index + 1 < len(models) else None
+                calls_before = len(tried)
+                try:
+                    quiz_text, answered_by = self._attempt(prompt, model_name, backup_name, tried)
+                except Exception as e:
+                    last_error = e
+                    continue  # Try next model
+                finally:
+                    attempts += len(tried) - calls_before
+                self.manager.record_success(answered_by)
+                if quiz_cache is not None:
+                    quiz_cache.put(cache_key, quiz_text)
+                return QuizResult(job, quiz_text, answered_by, attempts, time.monotonic() - started)
+            if retry < self.max_retries:
+                # Exponential backoff with jitter before going through the models again
+                time.sleep(self.backoff_seconds * (2 ** retry) * (0.5 + random.random()))
+
+        return QuizResult(job, attempts=attempts, latency_seconds=time.monotonic() - started,
+                          error=f"All available models failed to generate response: {last_error}")
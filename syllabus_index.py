@@ -0,0 +1,148 @@
+# syllabus_index.py
+# Lazy (grade, subject) -> topics index over School_Syllabus_Classes1-12.xlsx.
+# The workbook is parsed once, on first use, for all sheets together. The result is
+# saved to a small JSON file tagged with the workbook's mtime, size and hash, so later
+# processes skip openpyxl entirely until the workbook changes. version() hashes the parsed
+# topics, so touching or re-saving the workbook without changing them keeps the version.
+
+import hashlib
+import json
+import os
+import threading
+
+DEFAULT_WORKBOOK_PATH = "School_Syllabus_Classes1-12.xlsx"
+DEFAULT_INDEX_PATH = "syllabus_index.json"
+INDEX_FORMAT_VERSION = 1
+
+# Sheet holding each class's core subjects
+syllabus_sheets = {
+    10: "Class 10 (Core Subjects)",
+    11: "Class 11 (Core)",
+    12: "Class 12 (Core)"
+}
+
+
+def _file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class SyllabusIndex:
+    """Topics per class, loaded from the JSON cache or the workbook on first lookup."""
+
+    def __init__(self, workbook_path=DEFAULT_WORKBOOK_PATH, index_path=DEFAULT_INDEX_PATH):
+        self.workbook_path = workbook_path
+        self.index_path = index_path
+        self._rows = None  # grade number -> [(subject cell, topics), ...] in sheet order
+        self._lookups = {}  # (grade number, subject lowercased) -> topics or None
+        self._loaded_signature = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.workbook_path)
+        except OSError:
+            return None
+        return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+    def _load_cached(self, signature):
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached.get("format") != INDEX_FORMAT_VERSION:
+            return None
+        source = cached.get("source", {})
+        if source.get("mtime_ns") == signature["mtime_ns"] and source.get("size") == signature["size"]:
+            return cached["rows"]
+        # The file was touched; keep the cache if the contents are unchanged
+        if source.get("sha1") and source.get("size") == signature["size"] and source["sha1"] == _file_hash(self.workbook_path):
+            self._save(cached["rows"], {**signature, "sha1": source["sha1"]})
+            return cached["rows"]
+        return None
+
+    def _save(self, rows, source):
+        temp_path = f"{self.index_path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"format": INDEX_FORMAT_VERSION, "source": source, "rows": rows}, f, ensure_ascii=False)
+            os.replace(temp_path, self.index_path)
+        except OSError as e:
+            print(f"Warning: could not write syllabus index cache: {e}")
+
+    def _parse_workbook(self):
+        import pandas as pd
+
+        # One pass over the workbook for every sheet we need
+        sheets = pd.read_excel(self.workbook_path, sheet_name=list(syllabus_sheets.values()))
+        rows = {}
+        for grade_num, sheet_name in syllabus_sheets.items():
+            df = sheets[sheet_name]
+            rows[str(grade_num)] = [
+                [str(subject), str(topics)]
+                for subject, topics in zip(df["Subject"], df["Topics"])
+                if isinstance(subject, str) and not pd.isna(topics)
+            ]
+        return rows
+
+    def _ensure_loaded(self):
+        signature = self._signature()
+        if self._rows is not None and signature == self._loaded_signature:
+            return
+        # First use, or the workbook changed since we loaded it
+        self._lookups.clear()
+        self._loaded_signature = signature
+        rows = {}
+        try:
+            if signature is not None:
+                rows = self._load_cached(signature)
+                if rows is None:
+                    rows = self._parse_workbook()
+                    self._save(rows, {**signature, "sha1": _file_hash(self.workbook_path)})
+            else:
+                print(f"Warning: {self.workbook_path} not found. Using fallback topics.")
+        except Exception as e:
+            print(f"Error loading syllabus: {e}")
+            rows = {}
+        self._rows = {int(grade_num): [tuple(row) for row in grade_rows] for grade_num, grade_rows in rows.items()}
+        topics_json = json.dumps(sorted(self._rows.items()), ensure_ascii=False)
+        self._version = hashlib.sha1(topics_json.encode("utf-8")).hexdigest() if self._rows else "fallback"
+
+    def topics_for(self, grade_num, subject):
+        """Topics of the first row whose Subject contains subject (case-insensitive), or None."""
+        key = (grade_num, subject.lower())
+        with self._lock:
+            self._ensure_loaded()
+            if key not in self._lookups:
+                self._lookups[key] = next(
+                    (topics for cell, topics in self._rows.get(grade_num, []) if key[1] in cell.lower()), None)
+            return self._lookups[key]
+
+    def version(self):
+        """Hash of the parsed topics ('fallback' without a workbook)."""
+        with self._lock:
+            self._ensure_loaded()
+            return self._version
+
+    def has_syllabus(self):
+        with self._lock:
+            self._ensure_loaded()
+            return bool(self._rows)
+
+
+_syllabus_index = None
+_index_lock = threading.Lock()
+
+
+def get_syllabus_index():
+    """Return the process-wide index; nothing is read from disk until the first lookup."""
+    global _syllabus_index
+    with _index_lock:
+        if _syllabus_index is None:
+            _syllabus_index = SyllabusIndex()
+        return _syllabus_index
@@ -0,0 +1,200 @@
+# vectorized_rules.py
+# NumPy/pandas versions of the rules in student_rules, for scoring whole arrays at once.
+# Every function returns exactly the labels the scalar version would return row by row;
+# run `python vectorized_rules.py` to check parity on random and boundary inputs.
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+from student_rules import (
+    features,
+    categorize_student_performance,
+    recommend_learning_material,
+    generate_feedback_message,
+    generate_learner_profile,
+    generate_combined_recommendation,
+    map_difficulty
+)
+
+# Lower bounds of categories 1..5; np.digitize gives bins[i-1] <= score < bins[i]
+score_bins = np.array([0.3, 0.45, 0.6, 0.75, 0.9])
+
+# (number, name, description, emoji) per category, taken from the scalar rules
+category_table = [categorize_student_performance(edge) for edge in (0.0, *score_bins)]
+
+profile_labels = [
+    "Fast but Careless 🐇",
+    "Slow and Careful 🐢",
+    "Confused Learner 🤔",
+    "Focused Performer 🎯"
+]
+default_profile = "General Learner"
+
+
+def _lookup_unique(values, scalar_fn):
+    """Apply a scalar label function once per distinct value and broadcast the result."""
+    codes, uniques = pd.factorize(pd.Series(values), use_na_sentinel=False)
+    labels = np.array([scalar_fn(value) for value in uniques], dtype=object)
+    return labels[codes]
+
+
+def _as_score_array(scores):
+    """Keep float32 model output as float32 so thresholds compare exactly like the scalar rules."""
+    scores = np.asarray(scores)
+    if not np.issubdtype(scores.dtype, np.floating):
+        scores = scores.astype("float64")
+    return scores
+
+
+def categorize_scores(scores):
+    """Vectorized categorize_student_performance. Returns (numbers, names, descriptions, emojis)."""
+    scores = _as_score_array(scores)
+    category_numbers = np.digitize(scores, score_bins.astype(scores.dtype))
+    table = np.array(category_table, dtype=object)
+    return (
+        category_numbers,
+        table[category_numbers, 1],
+        table[category_numbers, 2],
+        table[category_numbers, 3]
+    )
+
+
+def learner_profiles(feature_df):
+    """Vectorized generate_learner_profile over a DataFrame of behavior features."""
+    duration = feature_df['duration'].to_numpy()
+    attempt_count = feature_df['attempt_count'].to_numpy()
+    concentrating = feature_df['Average_confidence(CONCENTRATING)'].to_numpy()
+    frustrated = feature_df['Average_confidence(FRUSTRATED)'].to_numpy()
+    confused = feature_df['Average_confidence(CONFUSED)'].to_numpy()
+    bottom_hint = feature_df['bottom_hint'].to_numpy()
+    confidence_balance = feature_df['confidence_balance'].to_numpy()
+    efficiency = feature_df['efficiency_indicator'].to_numpy()
+    hint_count = feature_df['hint_count'].to_numpy()
+    hint_dependency = feature_df['hint_dependency'].to_numpy()
+
+    # Same order as the scalar rules: the first matching profile wins
+    conditions = [
+        (duration < 1800) & (attempt_count < 3) & (concentrating < 0.5) & (frustrated > 0.3),
+        (duration > 1800) & (hint_count < 5) & (concentrating > 0.6) & (efficiency > 0.6),
+        (hint_count > 6) & (confused > 0.3) & (bottom_hint > 5) & (confidence_balance < 0.4),
+        (concentrating > 0.6) & (confidence_balance > 0.6) & (hint_dependency < 0.3) & (efficiency > 0.6)
+    ]
+    return np.select(conditions, profile_labels, default=default_profile).astype(object)
+
+
+def combined_recommendations(categories, profiles):
+    """Vectorized generate_combined_recommendation over category and profile arrays."""
+    pairs = pd.DataFrame({"category": categories, "profile": profiles})
+    codes, uniques = pd.factorize(pd.MultiIndex.from_frame(pairs), use_na_sentinel=False)
+    labels = np.array([generate_combined_recommendation(category, profile) for category, profile in uniques], dtype=object)
+    return labels[codes]
+
+
+def map_difficulties(scores, categories):
+    """Vectorized map_difficulty over score and category arrays."""
+    scores = _as_score_array(scores)
+    easy = pd.Series(categories).isin(["Below Average", "Poor", "Weak"]).to_numpy() | (scores < 0.5)
+    return np.where(easy, "easy", np.where(scores < 0.8, "medium", "hard")).astype(object)
+
+
+def recommend_learning_materials(category_numbers):
+    """Vectorized recommend_learning_material over category numbers."""
+    return _lookup_unique(category_numbers, recommend_learning_material)
+
+
+def generate_feedback_messages(category_numbers):
+    """Vectorized generate_feedback_message over category numbers."""
+    return _lookup_unique(category_numbers, generate_feedback_message)
+
+
+def apply_rules(feature_df, scores):
+    """Run every rule over a batch and return the results as a DataFrame aligned to feature_df."""
+    category_numbers, category_names, descriptions, emojis = categorize_scores(scores)
+    profiles = learner_profiles(feature_df)
+    return pd.DataFrame({
+        "category_number": category_numbers,
+        "category": category_names,
+        "description": descriptions,
+        "emoji": emojis,
+        "learner_profile": profiles,
+        "combined_recommendation": combined_recommendations(category_names, profiles),
+        "learning_material": recommend_learning_materials(category_numbers),
+        "feedback": generate_feedback_messages(category_numbers),
+        "difficulty": map_difficulties(scores, category_names)
+    }, index=feature_df.index)
+
+
+def sample_features(n_rows, rng):
+    """Random feature rows mixed with the exact thresholds used by the profile rules."""
+    boundary_values = {
+        'duration': [1799, 1800, 1801],
+        'attempt_count': [2, 3, 4],
+        'hint_count': [4, 5, 6, 7],
+        'bottom_hint': [5, 6],
+        'Average_confidence(CONCENTRATING)': [0.5, 0.6],
+        'Average_confidence(FRUSTRATED)': [0.3],
+        'Average_confidence(CONFUSED)': [0.3],
+        'confidence_balance': [0.4, 0.6],
+        'efficiency_indicator': [0.6],
+        'hint_dependency': [0.3]
+    }
+    sample = {}
+    for feature in features:
+        if feature in ('duration', 'ms_first_response', 'response_speed'):
+            values = rng.integers(100, 3001, n_rows).astype("float64")
+        elif feature in ('hint_count', 'bottom_hint', 'attempt_count'):
+            values = rng.integers(0, 21, n_rows).astype("float64")
+        else:
+            values = rng.random(n_rows).round(2)
+        if feature in boundary_values:
+            use_boundary = rng.random(n_rows) < 0.3
+            values[use_boundary] = rng.choice(boundary_values[feature], use_boundary.sum())
+        sample[feature] = values
+    return pd.DataFrame(sample)
+
+
+def check_parity(n_rows=20000, seed=0, dtype="float32"):
+    """Compare every vectorized rule with its scalar version. Returns (ok, message)."""
+    rng = np.random.default_rng(seed)
+    feature_df = sample_features(n_rows, rng)
+    scores = rng.random(n_rows).astype(dtype)
+    # Hit every category and difficulty edge exactly, plus out-of-range and missing scores
+    edges = np.concatenate([score_bins, [0.5, 0.8], [-0.1, 1.2, np.nan]]).astype(dtype)
+    edges = np.concatenate([edges, np.nextafter(edges, edges.dtype.type(0))])
+    scores[:len(edges)] = edges
+
+    vectorized = apply_rules(feature_df, scores).to_dict("records")
+    records = feature_df.to_dict("records")
+    mismatches = []
+    for i, (row, score, actual) in enumerate(zip(records, scores, vectorized)):
+        cat_num, cat_name, desc, emoji = categorize_student_performance(score)
+        profile = generate_learner_profile(row)
+        expected = {
+            "category_number": cat_num,
+            "category": cat_name,
+            "description": desc,
+            "emoji": emoji,
+            "learner_profile": profile,
+            "combined_recommendation": generate_combined_recommendation(cat_name, profile),
+            "learning_material": recommend_learning_material(cat_num),
+            "feedback": generate_feedback_message(cat_num),
+            "difficulty": map_difficulty(score, cat_name)
+        }
+        for column, value in expected.items():
+            if actual[column] != value:
+                mismatches.append(f"row {i} {column}: expected {value!r}, got {actual[column]!r}")
+
+    if mismatches:
+        return False, f"{len(mismatches)} mismatches, first: {mismatches[0]}"
+    return True, f"All rules match the scalar versions on {n_rows} {dtype} rows"
+
+
+if __name__ == "__main__":
+    all_ok = True
+    for dtype in ("float32", "float64"):
+        ok, message = check_parity(dtype=dtype)
+        print(("✅ " if ok else "❌ ") + message)
+        all_ok = all_ok and ok
+    sys.exit(0 if all_ok else 1)